@@ -0,0 +1,80 @@
+"""Tickets/sec through POST /service_tickets (one per request) vs POST /service_tickets/bulk.
+
+Runs against a SQLite file so commits hit the disk like they would on a
+real database. Run from the repo root:
+
+    python -m benchmarks.bench_bulk_tickets --tickets 500
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from mech import create_app
+from mech.extensions import db
+from mech.models import Customer, Mechanic
+from mech.utils.util import encode_mechanic_token
+
+
+def ticket(i, customer_id):
+    return {
+        'vin': f'VIN{i:014d}',
+        'service_date': '2025-05-01',
+        'service_desc': f'Intake {i}',
+        'customer_id': customer_id
+    }
+
+
+def setup(db_path):
+    app = create_app('TestingConfig')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['BULK_MAX_ITEMS'] = 100000
+    with app.app_context():
+        db.create_all()
+        cust = Customer(name='Bench', email='bench@ex.com', phone='1', password='x')
+        mech = Mechanic(name='Bench', email='bench@ex.com', phone='1', salary=1, password='x')
+        db.session.add_all([cust, mech])
+        db.session.commit()
+        token = encode_mechanic_token(mech.id)
+        return app, cust.id, {'Authorization': f'Bearer {token}'}
+
+
+def run_single(client, headers, items):
+    for item in items:
+        resp = client.post('/service_tickets/', json=item, headers=headers)
+        assert resp.status_code == 201, resp.get_data(as_text=True)
+
+
+def run_bulk(client, headers, items):
+    resp = client.post('/service_tickets/bulk', json=items, headers=headers)
+    assert resp.status_code == 201, resp.get_data(as_text=True)
+
+
+def run_ndjson(client, headers, items):
+    body = '\n'.join(json.dumps(item) for item in items)
+    resp = client.post('/service_tickets/bulk', data=body, headers=headers,
+                       content_type='application/x-ndjson')
+    assert resp.status_code == 201, resp.get_data(as_text=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'mode':<12} {'tickets':>8} {'seconds':>9} {'tickets/s':>11}")
+    for name, fn in (('single', run_single), ('bulk json', run_bulk), ('bulk ndjson', run_ndjson)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app, customer_id, headers = setup(os.path.join(tmp, 'bench.db'))
+            items = [ticket(i, customer_id) for i in range(args.tickets)]
+            client = app.test_client()
+            started = time.perf_counter()
+            fn(client, headers, items)
+            elapsed = time.perf_counter() - started
+            with app.app_context():
+                db.engine.dispose()
+        print(f'{name:<12} {args.tickets:>8} {elapsed:>9.3f} {args.tickets / elapsed:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""SimpleCache vs FileSystemCache vs SharedMemoryCache: ops/sec and cross-worker misses.
+
+The first table is single-process get/set throughput on response-sized
+values. The second forks --workers processes that each read the same keys,
+filling on a miss, like gunicorn workers warming up: a private cache misses
+once per key per worker, a shared one once per key. Run from the repo root:
+
+    python -m benchmarks.bench_cache_backends --ops 20000 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from flask_caching.backends import SimpleCache, FileSystemCache
+from mech.utils.shm_cache import SharedMemoryCache
+
+VALUE = (b'{"tickets": [' + b'{"id": 1, "vin": "1HGCM82633A004352"}, ' * 30 + b']}', 'application/json')
+
+
+def backends(tmp):
+    return {
+        'SimpleCache': lambda: SimpleCache(threshold=100000),
+        'FileSystemCache': lambda: FileSystemCache(os.path.join(tmp, 'fs'), threshold=100000),
+        'SharedMemoryCache': lambda: SharedMemoryCache(os.path.join(tmp, 'shm'), buckets=2048, slot_size=4096)
+    }
+
+
+def throughput(cache, ops, keys):
+    started = time.perf_counter()
+    for i in range(ops):
+        cache.set(f'key:{i % keys}', VALUE)
+    set_rate = ops / (time.perf_counter() - started)
+    started = time.perf_counter()
+    for i in range(ops):
+        cache.get(f'key:{i % keys}')
+    get_rate = ops / (time.perf_counter() - started)
+    return set_rate, get_rate
+
+
+def _warm(make, keys, misses):
+    cache = make()
+    missed = 0
+    for i in range(keys):
+        if cache.get(f'warm:{i}') is None:
+            missed += 1
+            cache.set(f'warm:{i}', VALUE)
+    with misses.get_lock():
+        misses.value += missed
+
+
+def cold_misses(make, workers, keys):
+    ctx = multiprocessing.get_context('fork')
+    misses = ctx.Value('i', 0)
+    procs = [ctx.Process(target=_warm, args=(make, keys, misses)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    return misses.value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        makers = backends(tmp)
+        print(f"{'backend':<18} {'set/s':>10} {'get/s':>10}")
+        for name, make in makers.items():
+            set_rate, get_rate = throughput(make(), args.ops, args.keys)
+            print(f'{name:<18} {set_rate:>10.0f} {get_rate:>10.0f}')
+
+        print(f"\n{'backend':<18} {'misses':>10}  ({args.workers} workers x {args.keys} keys)")
+        for name, make in makers.items():
+            make().clear()
+            print(f'{name:<18} {cold_misses(make, args.workers, args.keys):>10}')
+
+
+if __name__ == '__main__':
+    main()
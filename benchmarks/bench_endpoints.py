@@ -0,0 +1,449 @@
+"""Latency, queries per request and peak RSS of every endpoint on a generated dataset.
+
+Each run starts from a fresh copy of a deterministic SQLite dataset. The
+dataset is built once per --scale/--seed by benchmarks.datagen and kept in
+--data-dir, so two runs of the same code see the same rows. Every route of
+the four blueprints is called --requests times with seeded arguments. The
+calls go either in-process through the Flask test client or over HTTP to a
+local gunicorn (--server gunicorn). The app runs BenchmarkConfig: the
+production config without the rate limit. Queries per request come from
+the X-Query-Count header. Authenticated calls run as mechanic 1. Deletes
+remove rows appended to the copy for that purpose, so no other scenario
+runs into a deleted row.
+
+Results go to --output as JSON. Every call is expected to answer 2xx; an
+endpoint that didn't is marked FAILED and makes the exit status 2, since
+its timings measure an error path. With --baseline, each endpoint's p95
+and queries per request are compared with an earlier run. The exit status
+is 1 if any of them got worse by more than --tolerance. Run from the repo
+root:
+
+    python -m benchmarks.bench_endpoints --scale 0.01 --requests 50 --output run.json
+    python -m benchmarks.bench_endpoints --scale 0.01 --requests 50 --baseline run.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+#### every authenticated scenario runs as this mechanic; it is never a delete target
+AUTH_MECHANIC = 1
+
+
+class Context:
+    """What the scenarios need to build requests: table sizes, auth headers and the ids they may touch."""
+
+    def __init__(self, app, sizes, targets, requests, seed):
+        self.app = app
+        self.sizes = sizes
+        self.targets = targets
+        self.requests = requests
+        self.seed = seed
+
+    def pick(self, rng, table):
+        #### generated rows only; the delete targets were appended after them
+        return rng.randint(1, self.sizes[table])
+
+    def reserved(self, table, i):
+        return self.targets[table] + i
+
+    def page(self, rng, table, per_page):
+        return rng.randint(1, max(1, self.sizes[table] // per_page))
+
+    def mechanic(self, mech_id):
+        from mech.utils.util import encode_mechanic_token
+        with self.app.app_context():
+            return {'Authorization': f'Bearer {encode_mechanic_token(mech_id)}'}
+
+    def auth(self):
+        return self.mechanic(AUTH_MECHANIC)
+
+    def customer(self, cust_id):
+        from mech.utils.util import encode_customer_token
+        with self.app.app_context():
+            return {'Authorization': f'Bearer {encode_customer_token(cust_id)}'}
+
+
+def _ticket(ctx, rng, i):
+    return {'vin': f'NEW{i:014d}', 'service_date': '2025-05-01', 'service_desc': 'bench',
+            'customer_id': ctx.pick(rng, 'customers')}
+
+
+#### each scenario builds request i as (method, path, json body, headers)
+
+def get_customers(ctx, rng, i):
+    return 'GET', f"/customers/?page={ctx.page(rng, 'customers', 20)}&per_page=20", None, {}
+
+
+def create_customer(ctx, rng, i):
+    return 'POST', '/customers/', {'name': 'New', 'email': f'new{i}@bench.test', 'phone': '1', 'password': 'bench'}, {}
+
+
+def customer_login(ctx, rng, i):
+    email = f"c{ctx.pick(rng, 'customers') - 1}@bench.test"
+    return 'POST', '/customers/login', {'email': email, 'password': 'bench'}, {}
+
+
+def update_customer(ctx, rng, i):
+    return 'PUT', f"/customers/{ctx.pick(rng, 'customers')}", {'phone': f'557-{i:07d}'}, {}
+
+
+def delete_current_customer(ctx, rng, i):
+    return 'DELETE', '/customers/', None, ctx.customer(ctx.reserved('customers', i))
+
+
+def get_mechanics(ctx, rng, i):
+    return 'GET', '/mechanics/', None, {}
+
+
+def get_mechanics_by_ticket_count(ctx, rng, i):
+    return 'GET', '/mechanics/ranked', None, ctx.auth()
+
+
+def create_mechanic(ctx, rng, i):
+    body = {'name': 'New', 'email': f'new{i}@bench.test', 'phone': '1', 'salary': 1, 'password': 'bench'}
+    return 'POST', '/mechanics/', body, {}
+
+
+def mechanic_login(ctx, rng, i):
+    email = f"m{ctx.pick(rng, 'mechanics') - 1}@bench.test"
+    return 'POST', '/mechanics/login', {'email': email, 'password': 'bench'}, {}
+
+
+def update_mechanic(ctx, rng, i):
+    mech_id = ctx.pick(rng, 'mechanics')
+    return 'PUT', f'/mechanics/{mech_id}', {'phone': f'558-{i:07d}'}, ctx.mechanic(mech_id)
+
+
+def assign_ticket(ctx, rng, i):
+    mech_id = ctx.pick(rng, 'mechanics')
+    return 'POST', f"/mechanics/{mech_id}/tickets/{ctx.pick(rng, 'tickets')}", None, ctx.mechanic(mech_id)
+
+
+def delete_mechanic(ctx, rng, i):
+    mech_id = ctx.reserved('mechanics', i)
+    return 'DELETE', f'/mechanics/{mech_id}', None, ctx.mechanic(mech_id)
+
+
+def get_tickets(ctx, rng, i):
+    return 'GET', f"/service_tickets/?page={ctx.page(rng, 'tickets', 20)}&per_page=20", None, {}
+
+
+def export_tickets(ctx, rng, i):
+    return 'GET', f"/service_tickets/export?customer_id={ctx.pick(rng, 'customers')}", None, ctx.auth()
+
+
+def create_ticket(ctx, rng, i):
+    return 'POST', '/service_tickets/', _ticket(ctx, rng, i), ctx.auth()
+
+
+def create_tickets_bulk(ctx, rng, i):
+    return 'POST', '/service_tickets/bulk', [_ticket(ctx, rng, i * 10 + j) for j in range(10)], ctx.auth()
+
+
+def update_ticket(ctx, rng, i):
+    return 'PUT', f"/service_tickets/{ctx.pick(rng, 'tickets')}", {'service_desc': f'Updated {i}'}, ctx.auth()
+
+
+def edit_ticket_mechanics(ctx, rng, i):
+    body = {'add_ids': [ctx.pick(rng, 'mechanics'), ctx.pick(rng, 'mechanics')],
+            'remove_ids': [ctx.pick(rng, 'mechanics')]}
+    return 'PUT', f"/service_tickets/{ctx.pick(rng, 'tickets')}/edit", body, ctx.auth()
+
+
+def delete_ticket(ctx, rng, i):
+    return 'DELETE', f"/service_tickets/{ctx.reserved('tickets', i)}", None, ctx.auth()
+
+
+def get_parts(ctx, rng, i):
+    return 'GET', f"/inventory/?page={ctx.page(rng, 'parts', 50)}&per_page=50", None, {}
+
+
+def create_part(ctx, rng, i):
+    return 'POST', '/inventory/', {'name': f'New {i}', 'price': 9.99}, ctx.auth()
+
+
+def update_part(ctx, rng, i):
+    return 'PUT', f"/inventory/{ctx.pick(rng, 'parts')}", {'price': round(rng.uniform(1, 500), 2)}, ctx.auth()
+
+
+def add_part_to_ticket(ctx, rng, i):
+    body = {'part_id': ctx.pick(rng, 'parts')}
+    return 'POST', f"/inventory/{ctx.pick(rng, 'tickets')}/add_part", body, ctx.auth()
+
+
+def delete_part(ctx, rng, i):
+    return 'DELETE', f"/inventory/{ctx.reserved('parts', i)}", None, ctx.auth()
+
+
+#### run order: reads, then writes, then deletes; deletes only touch the rows
+#### datagen.add_delete_targets appended, which nothing else picks
+SCENARIOS = {
+    'mechanics': [get_mechanics, get_mechanics_by_ticket_count, create_mechanic, mechanic_login,
+                  update_mechanic, assign_ticket, delete_mechanic],
+    'service_tickets': [get_tickets, export_tickets, create_ticket, create_tickets_bulk, update_ticket,
+                        edit_ticket_mechanics, delete_ticket],
+    'inventory': [get_parts, create_part, update_part, add_part_to_ticket, delete_part],
+    'customers': [get_customers, create_customer, customer_login, update_customer, delete_current_customer],
+}
+
+
+class TestClientTarget:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, body, headers):
+        resp = self.client.open(path, method=method, json=body, headers=headers)
+        resp.get_data()
+        return resp.status_code, resp.headers.get('X-Query-Count')
+
+    def peak_rss_kb(self):
+        return {'harness': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+    def close(self):
+        pass
+
+
+class GunicornTarget:
+    def __init__(self, workers, env):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{self.port}',
+             '--log-level', 'warning', 'mech:create_app("BenchmarkConfig")'],
+            cwd=REPO, env=env
+        )
+        self.conn = None
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                self.send('GET', '/metrics', None, {})
+                break
+            except OSError:
+                if time.monotonic() > deadline or self.proc.poll() is not None:
+                    self.close()
+                    raise SystemExit('gunicorn did not start')
+                time.sleep(0.2)
+
+    def send(self, method, path, body, headers):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        payload = json.dumps(body) if body is not None else None
+        headers = dict(headers, **({'Content-Type': 'application/json'} if payload else {}))
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            resp = self.conn.getresponse()
+            resp.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.conn = None
+            raise
+        return resp.status, resp.getheader('X-Query-Count')
+
+    def _pids(self):
+        pids = [self.proc.pid]
+        try:
+            with open(f'/proc/{self.proc.pid}/task/{self.proc.pid}/children') as f:
+                pids += [int(p) for p in f.read().split()]
+        except OSError:
+            pass
+        return pids
+
+    def peak_rss_kb(self):
+        peaks = {}
+        for pid in self._pids():
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('VmHWM:'):
+                            peaks['master' if pid == self.proc.pid else f'worker-{pid}'] = int(line.split()[1])
+            except OSError:
+                continue
+        return peaks
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.proc.terminate()
+        self.proc.wait(timeout=30)
+
+
+def summarize(latencies, queries, statuses):
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    counted = [q for q in queries if q is not None]
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'queries_per_request': round(statistics.fmean(counted), 2) if counted else None,
+        'statuses': {str(s): statuses.count(s) for s in sorted(set(statuses))},
+    }
+
+
+def run(target, ctx, only):
+    results = {}
+    for blueprint, fns in SCENARIOS.items():
+        for fn in fns:
+            endpoint = f'{blueprint}.{fn.__name__}'
+            if only and not any(o in endpoint for o in only):
+                continue
+            rng = random.Random(f'{ctx.seed}:{endpoint}')
+            calls = [fn(ctx, rng, i) for i in range(ctx.requests)]
+            latencies, queries, statuses = [], [], []
+            for method, path, body, headers in calls:
+                started = time.perf_counter()
+                status, count = target.send(method, path, body, headers)
+                latencies.append(time.perf_counter() - started)
+                statuses.append(status)
+                queries.append(int(count) if count is not None else None)
+            results[endpoint] = summarize(latencies, queries, statuses)
+            r = results[endpoint]
+            r['failed'] = sum(1 for s in statuses if not 200 <= s < 300)
+            print(f"{endpoint:<42} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                  f"{r['queries_per_request'] if r['queries_per_request'] is not None else '-':>6} "
+                  f"{','.join(r['statuses'])}{'  FAILED' if r['failed'] else ''}")
+    return results
+
+
+def failures(results):
+    """Endpoints that answered anything but 2xx; their timings measure the error path."""
+    return sorted(endpoint for endpoint, r in results.items() if r.get('failed'))
+
+
+def compare(current, baseline, tolerance):
+    """Lines describing each endpoint against the baseline, and whether anything regressed."""
+    lines, regressed = [], False
+    for endpoint, now in current['endpoints'].items():
+        before = baseline['endpoints'].get(endpoint)
+        if before is None:
+            lines.append(f'{endpoint:<42} new')
+            continue
+        if now.get('failed') or before.get('failed'):
+            lines.append(f'{endpoint:<42} not compared: non-2xx responses')
+            regressed = True
+            continue
+        change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        worse = change > tolerance
+        q_now, q_before = now['queries_per_request'], before['queries_per_request']
+        if q_now is not None and q_before is not None and q_now > q_before * (1 + tolerance):
+            worse = True
+        regressed |= worse
+        lines.append(f"{endpoint:<42} p95 {before['p95_ms']:>8.2f} -> {now['p95_ms']:>8.2f} ({change:+.0%})  "
+                     f"queries {q_before} -> {q_now}{'  REGRESSED' if worse else ''}")
+    return lines, regressed
+
+
+def dataset(args):
+    """Path of the template database for --scale/--seed, generated on first use."""
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = os.path.join(args.data_dir, f'bench-scale{args.scale}-seed{args.seed}.db')
+    if not os.path.exists(path):
+        from sqlalchemy import create_engine
+        from benchmarks.datagen import generate
+        print(f'generating {path} ...')
+        tmp = path + '.partial'
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        generate(create_engine(f'sqlite:///{tmp}'), args.scale, args.seed)
+        os.replace(tmp, path)
+    return path
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=0.01, help='1.0 is 100k customers, 1M tickets')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=50, help='per endpoint')
+    parser.add_argument('--server', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--only', nargs='*', help='run endpoints whose name contains any of these')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'mech-bench'))
+    parser.add_argument('--output', help='write the results here as JSON')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        #### BenchmarkConfig reads these when mech.config is first imported, so before anything imports mech
+        env = dict(os.environ, BENCH_DATABASE_URI=f'sqlite:///{db_path}',
+                   CACHE_SHARED_PATH=os.path.join(tmp, 'cache'), METRICS_DIR='', SECRET_KEY='benchmark secret')
+        os.environ.update(env)
+        shutil.copyfile(dataset(args), db_path)
+        from sqlalchemy import create_engine
+        from benchmarks.datagen import sizes_for, add_delete_targets
+        from mech import create_app
+        sizes = sizes_for(args.scale)
+        engine = create_engine(f'sqlite:///{db_path}')
+        targets = add_delete_targets(engine, args.requests)
+        engine.dispose()
+        app = create_app('BenchmarkConfig')
+        ctx = Context(app, sizes, targets, args.requests, args.seed)
+        target = TestClientTarget(app) if args.server == 'client' else GunicornTarget(args.workers, env)
+        print(f"{'endpoint':<42} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6} statuses")
+        try:
+            endpoints = run(target, ctx, args.only)
+            peak_rss = target.peak_rss_kb()
+        finally:
+            target.close()
+
+    results = {
+        'meta': {
+            'git': git_revision(),
+            'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'server': args.server,
+            'workers': args.workers if args.server == 'gunicorn' else None,
+            'scale': args.scale,
+            'seed': args.seed,
+            'sizes': sizes,
+            'requests': args.requests,
+        },
+        'peak_rss_kb': peak_rss,
+        'endpoints': endpoints,
+    }
+    print('peak RSS: ' + ', '.join(f'{k} {v / 1024:.0f} MB' for k, v in peak_rss.items()))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    failed = failures(endpoints)
+    if failed:
+        print(f"FAILED: non-2xx responses from {', '.join(failed)}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print('\n'.join(lines))
+        if regressed and not failed:
+            sys.exit(1)
+    if failed:
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
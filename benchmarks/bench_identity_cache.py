@@ -0,0 +1,102 @@
+"""Queries per request with and without the identity cache.
+
+Replays a mix of the routes that look rows up by id (create ticket, assign a
+mechanic, add a part, update a mechanic / part) against a seeded
+in-memory database, once with ``IDENTITY_CACHE = {}`` and once with the
+defaults, and prints the average statements and latency per request for
+each route. Run from the repo root:
+
+    python -m benchmarks.bench_identity_cache --rounds 200
+"""
+import argparse
+import time
+from collections import defaultdict
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from mech import create_app
+from mech.extensions import db, identity_cache
+from mech.models import Customer, Inventory, Mechanic
+from mech.utils.identity_cache import DEFAULT_LIMITS
+from mech.utils.sql_stats import QueryCounter
+
+N_ROWS = 20
+
+
+def seed():
+    db.session.execute(insert(Customer), [
+        {'name': f'C{i}', 'email': f'c{i}@ex.com', 'phone': '555', 'password': 'x'} for i in range(N_ROWS)
+    ])
+    db.session.execute(insert(Mechanic), [
+        {'name': f'M{i}', 'email': f'm{i}@ex.com', 'phone': '555', 'salary': 1,
+         'password': generate_password_hash('pw', method='pbkdf2:sha256:1000')}
+        for i in range(N_ROWS)
+    ])
+    #### the second half of the parts is only ever updated, so the reads keep their entries
+    db.session.execute(insert(Inventory), [{'name': f'P{i}', 'price': 1.0} for i in range(2 * N_ROWS)])
+    db.session.commit()
+
+
+def requests(round_no):
+    """(label, method, path, body) for one round; ids cycle through the seeded rows.
+
+    The logged-in mechanic updates their own row every tenth round, which
+    drops it from the cache once each time.
+    """
+    row = round_no % N_ROWS + 1
+    ticket = round_no + 1
+    batch = [
+        ('create ticket', 'POST', '/service_tickets/',
+         {'vin': f'VIN{round_no}', 'service_date': '2025-05-01', 'service_desc': 'bench', 'customer_id': row}),
+        ('assign mechanic', 'POST', f'/mechanics/1/tickets/{ticket}', None),
+        ('add part', 'POST', f'/inventory/{ticket}/add_part', {'part_id': row}),
+        ('update part', 'PUT', f'/inventory/{N_ROWS + row}', {'price': float(round_no)}),
+    ]
+    if round_no % 10 == 0:
+        batch.append(('update mechanic', 'PUT', '/mechanics/1', {'phone': str(round_no)}))
+    return batch
+
+
+def run(limits, rounds):
+    app = create_app('TestingConfig')
+    app.config['IDENTITY_CACHE'] = limits
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    identity_cache.init_app(app)
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        seed()
+    token = client.post('/mechanics/login', json={'email': 'm0@ex.com', 'password': 'pw'}).get_json()['auth_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    queries, elapsed, calls = defaultdict(int), defaultdict(float), defaultdict(int)
+    for round_no in range(rounds):
+        for label, method, path, body in requests(round_no):
+            with QueryCounter() as q:
+                started = time.perf_counter()
+                resp = client.open(path, method=method, json=body, headers=headers)
+                elapsed[label] += time.perf_counter() - started
+            assert resp.status_code < 300, (label, resp.status_code, resp.get_data(as_text=True))
+            queries[label] += q.count
+            calls[label] += 1
+    with app.app_context():
+        db.drop_all()
+    return {label: (queries[label] / calls[label], elapsed[label] / calls[label] * 1000) for label in calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    off = run({}, args.rounds)
+    on = run(DEFAULT_LIMITS, args.rounds)
+    print(f"{'route':<16} {'q/req off':>10} {'q/req on':>9} {'ms off':>7} {'ms on':>7}")
+    for label in off:
+        print(f'{label:<16} {off[label][0]:>10.2f} {on[label][0]:>9.2f} {off[label][1]:>7.2f} {on[label][1]:>7.2f}')
+    total_off = sum(q for q, _ in off.values()) / len(off)
+    total_on = sum(q for q, _ in on.values()) / len(on)
+    print(f"{'all':<16} {total_off:>10.2f} {total_on:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Queries and latency of the mechanic ranking as the mechanic table grows.
+
+Compares the old per-mechanic ``service_tickets.count()`` loop with the single
+GROUP BY in ``mech.utils.ranking``. Run from the repo root:
+
+    python -m benchmarks.bench_ranking
+"""
+import random
+import time
+from datetime import date, timedelta
+from sqlalchemy import insert
+from mech import create_app
+from mech.extensions import db
+from mech.models import Customer, Mechanic, ServiceTicket, service_mechanics
+from mech.utils.ranking import rank_mechanics
+from mech.utils.sql_stats import QueryCounter
+
+SIZES = (10, 100, 500, 1000)
+TICKETS_PER_MECHANIC = 5
+
+
+def seed(n_mechanics, rng):
+    db.session.execute(insert(Customer), [
+        {'name': 'Bench', 'email': 'bench@ex.com', 'phone': '555', 'password': 'x'}
+    ])
+    db.session.execute(insert(Mechanic), [
+        {'name': f'M{i}', 'email': f'm{i}@ex.com', 'phone': '555', 'salary': 1, 'password': 'x'}
+        for i in range(n_mechanics)
+    ])
+    n_tickets = n_mechanics * TICKETS_PER_MECHANIC
+    db.session.execute(insert(ServiceTicket), [
+        {'vin': 'VIN', 'service_date': date(2025, 1, 1) + timedelta(days=i % 365),
+         'service_desc': 'bench', 'customer_id': 1}
+        for i in range(n_tickets)
+    ])
+    db.session.execute(insert(service_mechanics), [
+        {'ticket_id': t + 1, 'mechanic_id': rng.randint(1, n_mechanics)}
+        for t in range(n_tickets)
+    ])
+    db.session.commit()
+
+
+def legacy_ranking():
+    ranked = [
+        {'id': m.id, 'name': m.name, 'ticket_count': m.service_tickets.count()}
+        for m in Mechanic.query.all()
+    ]
+    ranked.sort(key=lambda x: x['ticket_count'], reverse=True)
+    return ranked
+
+
+def measure(fn):
+    db.session.expunge_all()
+    with QueryCounter() as q:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+    return q.count, elapsed * 1000
+
+
+def main():
+    print(f"{'mechanics':>10} {'legacy q':>9} {'legacy ms':>10} {'ranked q':>9} {'ranked ms':>10}")
+    for n in SIZES:
+        app = create_app('TestingConfig')
+        with app.app_context():
+            db.create_all()
+            seed(n, random.Random(n))
+            legacy_q, legacy_ms = measure(legacy_ranking)
+            ranked_q, ranked_ms = measure(rank_mechanics)
+            db.drop_all()
+        print(f'{n:>10} {legacy_q:>9} {legacy_ms:>10.1f} {ranked_q:>9} {ranked_ms:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Latency and memory per request of the list routes' row read path against the ORM.
+
+Builds each list body twice on a generated dataset: once from ``Model.query``
+instances, as the routes used to, and once from the ``mech.utils.rows``
+DTOs they use now. The cases are a customers page, a tickets page with its
+customer and mechanics (the ORM side walks each ticket's relationships, the
+rows side loads them with ``load_ticket_row_relations``), the full mechanics
+list and a full catalog build.
+Both bodies are checked to be equal. Every call starts with an empty
+session, like a request. Latency is the median of --repeat calls and
+memory is the tracemalloc peak of one call. The dataset comes from
+benchmarks.datagen and is shared with bench_endpoints. Run from the repo
+root:
+
+    python -m benchmarks.bench_read_path --scale 0.1 --page 50
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+
+def cases(page, per_page):
+    from sqlalchemy import select
+    from mech.extensions import db
+    from mech.models import Customer, Inventory, Mechanic, ServiceTicket
+    from mech.utils.catalog import _serialize
+    from mech.utils.rows import (
+        CustomerRow, InventoryRow, MechanicRow, TicketRow, paginate_rows, load_ticket_row_relations
+    )
+    from mech.blueprints.customers.schemas import dump_customers
+    from mech.blueprints.service_tickets.schemas import dump_service_tickets
+
+    def mechanics_body(mechs):
+        return [{'id': m.id, 'name': m.name, 'email': m.email, 'phone': m.phone, 'salary': m.salary}
+                for m in mechs]
+
+    return [
+        (f'customers page {page}',
+         lambda: dump_customers(Customer.query.paginate(page=page, per_page=per_page, error_out=False).items),
+         lambda: dump_customers(paginate_rows(CustomerRow, page=page, per_page=per_page, error_out=False).items)),
+        (f'tickets page {page}',
+         lambda: dump_service_tickets(
+             ServiceTicket.query.paginate(page=page, per_page=per_page, error_out=False).items),
+         lambda: dump_service_tickets(load_ticket_row_relations(
+             paginate_rows(TicketRow, page=page, per_page=per_page, error_out=False).items))),
+        ('mechanics',
+         lambda: mechanics_body(Mechanic.query.all()),
+         lambda: mechanics_body(MechanicRow.load(MechanicRow.select()))),
+        ('catalog build',
+         lambda: [_serialize(p) for p in db.session.scalars(select(Inventory))],
+         lambda: [_serialize(p) for p in InventoryRow.load(InventoryRow.select())]),
+    ]
+
+
+def measure(fn, repeat):
+    from mech.extensions import db
+
+    def call():
+        try:
+            return fn()
+        finally:
+            db.session.remove()
+
+    body = call()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return body, statistics.median(timings) * 1000, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=0.1, help='1.0 is 100k customers, 1M tickets')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--page', type=int, default=50)
+    parser.add_argument('--per-page', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'mech-bench'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        #### BenchmarkConfig reads these when mech.config is first imported, so before anything imports mech
+        os.environ.update(BENCH_DATABASE_URI=f'sqlite:///{db_path}', CACHE_SHARED_PATH=os.path.join(tmp, 'cache'),
+                          METRICS_DIR='', SECRET_KEY='benchmark secret')
+        from benchmarks.bench_endpoints import dataset
+        shutil.copyfile(dataset(args), db_path)
+        from mech import create_app
+        app = create_app('BenchmarkConfig')
+        print(f"{'case':<20} {'orm ms':>8} {'rows ms':>8} {'speedup':>8} {'orm KiB':>9} {'rows KiB':>9}")
+        with app.app_context():
+            for name, orm, rows in cases(args.page, args.per_page):
+                orm_body, orm_ms, orm_kib = measure(orm, args.repeat)
+                rows_body, rows_ms, rows_kib = measure(rows, args.repeat)
+                assert orm_body == rows_body, name
+                print(f'{name:<20} {orm_ms:>8.2f} {rows_ms:>8.2f} {orm_ms / rows_ms:>7.1f}x '
+                      f'{orm_kib:>9.0f} {rows_kib:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
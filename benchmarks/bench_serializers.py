@@ -0,0 +1,82 @@
+"""Time per page of the compiled dump functions against marshmallow's ``dump``.
+
+Dumps the same --rows loaded rows through both, --repeat times, for
+customers, parts and tickets (with their customer and mechanics preloaded
+the way the list route does). The two outputs are checked to be equal.
+Run from the repo root:
+
+    python -m benchmarks.bench_serializers --rows 100
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from sqlalchemy import insert, select
+from mech import create_app
+from mech.extensions import db
+from mech.models import Customer, Inventory, Mechanic, ServiceTicket, service_mechanics
+from mech.utils.rows import TicketRow, load_ticket_row_relations
+from mech.blueprints.customers.schemas import customers_schema, dump_customers
+from mech.blueprints.inventory.schemas import inventories_schema, dump_inventories
+from mech.blueprints.service_tickets.schemas import service_tickets_schema, dump_service_tickets
+
+
+def seed(rows, rng):
+    db.session.execute(insert(Customer), [
+        {'name': f'Customer {i}', 'email': f'c{i}@ex.com', 'phone': f'555-{i:07d}', 'password': 'x'}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(Mechanic), [
+        {'name': f'Mechanic {i}', 'email': f'm{i}@ex.com', 'phone': '555', 'salary': 1, 'password': 'x'}
+        for i in range(20)
+    ])
+    db.session.execute(insert(Inventory), [
+        {'name': f'Part {i}', 'price': round(rng.uniform(1, 500), 2)} for i in range(rows)
+    ])
+    db.session.execute(insert(ServiceTicket), [
+        {'vin': f'VIN{i:014d}', 'service_date': date(2025, 1, 1) + timedelta(days=i % 365),
+         'service_desc': f'Service {i}', 'customer_id': rng.randint(1, rows)}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(service_mechanics), [
+        {'ticket_id': t + 1, 'mechanic_id': m}
+        for t in range(rows) for m in rng.sample(range(1, 21), rng.randint(1, 3))
+    ])
+    db.session.commit()
+
+
+def per_page_us(fn, rows, repeat):
+    fn(rows)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(rows)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app('TestingConfig')
+    with app.app_context():
+        db.create_all()
+        seed(args.rows, random.Random(0))
+        cases = [
+            ('customers', customers_schema, dump_customers, db.session.scalars(select(Customer)).all()),
+            ('parts', inventories_schema, dump_inventories, db.session.scalars(select(Inventory)).all()),
+            ('tickets', service_tickets_schema, dump_service_tickets,
+             load_ticket_row_relations(TicketRow.load(TicketRow.select()))),
+        ]
+        print(f"{'page of ' + str(args.rows):<16} {'marshmallow us':>15} {'compiled us':>12} {'speedup':>8}")
+        for name, schema, compiled, rows in cases:
+            assert compiled(rows) == schema.dump(rows), name
+            slow = per_page_us(schema.dump, rows, args.repeat)
+            fast = per_page_us(compiled, rows, args.repeat)
+            print(f'{name:<16} {slow:>15.0f} {fast:>12.0f} {slow / fast:>7.1f}x')
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Cold-start cost of ``create_app("ProductionConfig")``, measured with -X importtime.
+
+Each run is a fresh interpreter so nothing is already imported. Reports the
+median total import time, the median create_app() wall time and the modules
+with the highest self time. With --json the result is written out for
+tracking; with --baseline the run fails if it is more than --tolerance slower.
+
+    python -m benchmarks.bench_startup --runs 5 --json startup.json
+    python -m benchmarks.bench_startup --baseline startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SNIPPET = (
+    "import time; t = time.perf_counter(); "
+    "from mech import create_app; create_app('ProductionConfig'); "
+    "print('create_app_ms', (time.perf_counter() - t) * 1000)"
+)
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def run_once(env):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SNIPPET],
+        capture_output=True, text=True, env=env, check=True
+    )
+    self_us, top_level_us = {}, 0
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, module = match.groups()
+        self_us[module] = self_us.get(module, 0) + int(own)
+        if len(indent) == 1:
+            top_level_us += int(cumulative)
+    create_app_ms = float(proc.stdout.split()[-1])
+    return top_level_us / 1000, create_app_ms, self_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare against a previous --json result')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    imports, create_app, self_times = [], [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        #### a file database: in-memory SQLite gets a StaticPool, which refuses
+        #### ProductionConfig's pool sizes; and nothing of a running server's in /dev/shm is touched
+        env = dict(os.environ)
+        env.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+        env.setdefault('CACHE_SHARED_PATH', os.path.join(tmp, 'cache'))
+        env.setdefault('RATELIMIT_STORAGE_URI', f"sqlite:///{os.path.join(tmp, 'ratelimit.db')}")
+        env.setdefault('METRICS_DIR', '')
+        for _ in range(args.runs):
+            import_ms, app_ms, self_us = run_once(env)
+            imports.append(import_ms)
+            create_app.append(app_ms)
+            for module, us in self_us.items():
+                self_times.setdefault(module, []).append(us)
+
+    heaviest = sorted(
+        ((statistics.median(v) / 1000, m) for m, v in self_times.items()), reverse=True
+    )[:args.top]
+    result = {
+        'runs': args.runs,
+        'import_ms': statistics.median(imports),
+        'create_app_ms': statistics.median(create_app),
+        'modules_loaded': len(self_times),
+        'heaviest_modules_ms': {m: round(ms, 2) for ms, m in heaviest}
+    }
+
+    print(f"import time (median of {args.runs}): {result['import_ms']:.1f} ms")
+    print(f"create_app incl. imports:        {result['create_app_ms']:.1f} ms")
+    print(f"modules loaded:                  {result['modules_loaded']}")
+    for module, ms in result['heaviest_modules_ms'].items():
+        print(f'  {ms:8.2f} ms  {module}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline['create_app_ms'] * (1 + args.tolerance)
+        print(f"baseline create_app: {baseline['create_app_ms']:.1f} ms (limit {limit:.1f} ms)")
+        if result['create_app_ms'] > limit:
+            sys.exit('cold start regressed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Time per body of the compiled request loaders against marshmallow's ``load``.
+
+Loads a valid and an invalid body for each write endpoint's loader --repeat
+times through both, and checks that the results (or error messages) are
+equal. Run from the repo root:
+
+    python -m benchmarks.bench_validation --repeat 20000
+"""
+import argparse
+import time
+from marshmallow import ValidationError
+from mech import create_app
+from mech.blueprints.customers.schemas import load_customer, load_customer_update
+from mech.blueprints.inventory.schemas import load_inventory, load_inventory_update
+from mech.blueprints.mechanics.schemas import load_mechanic
+from mech.blueprints.service_tickets.schemas import load_service_ticket, load_ticket_mechanics_edit
+
+CASES = [
+    ('create_customer', load_customer,
+     {'name': 'Jane Doe', 'email': 'jane@example.com', 'phone': '555-555-1234', 'password': 'Password123'},
+     {'name': 'Jane Doe', 'email': 5, 'password': 'Password123', 'admin': True}),
+    ('update_customer', load_customer_update, {'phone': '999-999-9999'}, {'version': 2}),
+    ('create_part', load_inventory, {'name': 'Brake Pad', 'price': 9.99}, {'name': 'Brake Pad', 'price': 'cheap'}),
+    ('update_part', load_inventory_update, {'price': 12.99}, {'id': 5}),
+    ('create_mechanic', load_mechanic,
+     {'name': 'Joe', 'email': 'joe@example.com', 'phone': '555-1111', 'salary': 58000, 'password': 'pw'},
+     {'name': 'Joe', 'salary': '58k'}),
+    ('create_ticket', load_service_ticket,
+     {'vin': '1HGCM82633A004352', 'service_date': '2025-05-01', 'service_desc': 'Oil change', 'customer_id': 1},
+     {'vin': '1HGCM82633A004352X', 'service_date': '05/01/2025', 'customer_id': 1}),
+    ('edit_ticket_mechanics', load_ticket_mechanics_edit, {'add_ids': [2, 3], 'remove_ids': [1]}, {'add_ids': ['2']}),
+]
+
+
+def result(load, body):
+    try:
+        return load(body)
+    except ValidationError as e:
+        return e.messages
+
+
+def per_body_us(load, body, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            load(body)
+        except ValidationError:
+            pass
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    create_app('TestingConfig')
+    print(f"{'endpoint':<24} {'body':<8} {'marshmallow us':>15} {'compiled us':>12} {'speedup':>8}")
+    for name, compiled, valid, invalid in CASES:
+        def reference(body, compiled=compiled):
+            return compiled.schema.load(body, partial=compiled.partial)
+        for kind, body in (('valid', valid), ('invalid', invalid)):
+            assert result(compiled, body) == result(reference, body), (name, kind)
+            slow = per_body_us(reference, body, args.repeat)
+            fast = per_body_us(compiled, body, args.repeat)
+            print(f'{name:<24} {kind:<8} {slow:>15.2f} {fast:>12.2f} {slow / fast:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
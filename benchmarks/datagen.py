@@ -0,0 +1,131 @@
+"""Deterministic synthetic dataset for the benchmark suite.
+
+Fills an empty database with customers, mechanics, parts and tickets (each
+ticket linked to 1-3 mechanics and 0-2 parts) using batched Core inserts.
+The same --seed and --scale always produce the same rows. The full size is
+100k customers, 5k mechanics, 50k parts and 1M tickets; --scale shrinks
+every table by the same factor. Run from the repo root:
+
+    python -m benchmarks.datagen --db sqlite:///bench.db --scale 0.1
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from sqlalchemy import create_engine, func, insert, select
+from werkzeug.security import generate_password_hash
+from mech.extensions import db
+from mech.models import Customer, Inventory, Mechanic, ServiceTicket, service_mechanics, service_parts
+
+SIZES = {'customers': 100_000, 'mechanics': 5_000, 'parts': 50_000, 'tickets': 1_000_000}
+BATCH = 10_000
+PASSWORD = 'bench'
+#### cheap, so logins measure the route rather than the hash; logins rehash to the app's method
+PASSWORD_METHOD = 'pbkdf2:sha256:1000'
+
+
+def sizes_for(scale):
+    return {table: max(1, int(n * scale)) for table, n in SIZES.items()}
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(conn, table, rows):
+    for batch in _batches(rows):
+        conn.execute(insert(table), batch)
+
+
+def generate(engine, scale=1.0, seed=0):
+    """Create the schema on ``engine`` and fill it; returns the row counts."""
+    sizes = sizes_for(scale)
+    rng = random.Random(seed)
+    password = generate_password_hash(PASSWORD, method=PASSWORD_METHOD)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if conn.scalar(select(func.count()).select_from(Customer.__table__)):
+            raise SystemExit('database is not empty')
+        _insert(conn, Customer.__table__, (
+            {'name': f'Customer {i}', 'email': f'c{i}@bench.test', 'phone': f'555-{i:07d}', 'password': password}
+            for i in range(sizes['customers'])
+        ))
+        _insert(conn, Mechanic.__table__, (
+            {'name': f'Mechanic {i}', 'email': f'm{i}@bench.test', 'phone': f'556-{i:07d}',
+             'salary': rng.randrange(30_000, 90_000), 'password': password}
+            for i in range(sizes['mechanics'])
+        ))
+        _insert(conn, Inventory.__table__, (
+            {'name': f'Part {i}', 'price': round(rng.uniform(1, 500), 2)}
+            for i in range(sizes['parts'])
+        ))
+        start = date(2020, 1, 1)
+        _insert(conn, ServiceTicket.__table__, (
+            {'vin': f'VIN{i:014d}', 'service_date': start + timedelta(days=rng.randrange(2000)),
+             'service_desc': f'Service {i}', 'customer_id': rng.randrange(sizes['customers']) + 1}
+            for i in range(sizes['tickets'])
+        ))
+        _insert(conn, service_mechanics, (
+            {'ticket_id': t, 'mechanic_id': m}
+            for t in range(1, sizes['tickets'] + 1)
+            for m in rng.sample(range(1, sizes['mechanics'] + 1), min(sizes['mechanics'], rng.randint(1, 3)))
+        ))
+        _insert(conn, service_parts, (
+            {'ticket_id': t, 'part_id': p}
+            for t in range(1, sizes['tickets'] + 1)
+            for p in rng.sample(range(1, sizes['parts'] + 1), min(sizes['parts'], rng.randint(0, 2)))
+        ))
+    return sizes
+
+
+def add_delete_targets(engine, count):
+    """Append ``count`` unreferenced rows to each table for delete scenarios to remove.
+
+    The rows have no tickets, mechanics or parts attached, so deleting one
+    touches nothing else. Returns the first new id per table.
+    """
+    password = generate_password_hash(PASSWORD, method=PASSWORD_METHOD)
+    tables = {'customers': Customer, 'mechanics': Mechanic, 'parts': Inventory, 'tickets': ServiceTicket}
+    with engine.begin() as conn:
+        first = {name: conn.scalar(select(func.coalesce(func.max(model.id), 0))) + 1
+                 for name, model in tables.items()}
+        _insert(conn, Customer.__table__, (
+            {'name': f'Target {i}', 'email': f'target{i}@bench.test', 'phone': '555', 'password': password}
+            for i in range(count)
+        ))
+        _insert(conn, Mechanic.__table__, (
+            {'name': f'Target {i}', 'email': f'target{i}@bench.test', 'phone': '556', 'salary': 1,
+             'password': password}
+            for i in range(count)
+        ))
+        _insert(conn, Inventory.__table__, ({'name': f'Target {i}', 'price': 1.0} for i in range(count)))
+        #### customer 1 is never deleted, so these outlive the customer deletes
+        _insert(conn, ServiceTicket.__table__, (
+            {'vin': f'TARGET{i:011d}', 'service_date': date(2025, 1, 1), 'service_desc': 'delete me',
+             'customer_id': 1}
+            for i in range(count)
+        ))
+    return first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='SQLAlchemy URL of an empty database')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    sizes = generate(create_engine(args.db), args.scale, args.seed)
+    print(', '.join(f'{n} {table}' for table, n in sizes.items()) + f' in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
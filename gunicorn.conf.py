@@ -0,0 +1,41 @@
+"""Gunicorn settings, read from the working directory:
+
+    gunicorn 'mech:create_app()'
+
+The app is loaded once in the master and forked (preload_app), so workers
+share its imported code. Before any worker starts, the master clears what the
+previous run left on the host (mech.utils.warmup) for the config the workers
+will run. Each worker drops the pooled connections it inherited and warms up
+before it accepts a request.
+"""
+import ast
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def _app_config(server):
+    """The workers' config: the preloaded app's, else the class the app URI's factory call names."""
+    if server.cfg.preload_app:
+        return server.app.wsgi().config
+    from mech import config
+    name = 'ProductionConfig'
+    call = ast.parse(getattr(server.app, 'app_uri', '').partition(':')[2] or 'None', mode='eval').body
+    if isinstance(call, ast.Call) and call.args and isinstance(call.args[0], ast.Constant):
+        name = call.args[0].value
+    cls = getattr(config, name)
+    return {key: getattr(cls, key) for key in dir(cls) if key.isupper()}
+
+
+def on_starting(server):
+    from mech.extensions import warmup
+    steps = warmup.reset(_app_config(server))
+    server.log.info('cleared host state: %s', ', '.join(steps) or 'nothing')
+
+
+def post_worker_init(worker):
+    from mech.extensions import warmup
+    steps = warmup.warm(worker.wsgi)
+    worker.log.info('worker %s warmed up: %s', worker.pid, ', '.join(steps) or 'nothing')
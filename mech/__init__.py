@@ -1,15 +1,12 @@
-from flask import Flask, jsonify
-from flask_swagger import swagger
-from flask_swagger_ui import get_swaggerui_blueprint
+from flask import Flask
+import click
 import os
-import yaml
 
-from .blueprints.mechanics.routes import mechanics_bp
-from .blueprints.service_tickets.routes import service_tickets_bp
-from .blueprints.customers.routes import customers_bp
-from .blueprints.inventory.routes import inventory_bp
-from .extensions import db, ma, limiter, cache, migrate
+from .extensions import db, ma, limiter, cache, response_cache, read_router, identity_cache, token_cache, password_hasher, sql_stats, metrics, profiler, warmup, init_migrate
 from .config import DevelopmentConfig, TestingConfig, ProductionConfig
+from flask_limiter import RateLimitExceeded
+from .utils.ratelimit import rate_limited
+from .utils.swagger import LazySwaggerUI, spec_document, spec_response, write_spec
 
 def create_app(config_name="ProductionConfig"):
     app = Flask(__name__, static_folder="static")
@@ -18,43 +15,62 @@ def create_app(config_name="ProductionConfig"):
 
     ### Initialize Extensions #####
     db.init_app(app)
-    migrate.init_app(app, db)
+    warmup.init_app(app)
+    if app.config.get("MIGRATE_ENABLED", True):
+        init_migrate(app)
     ma.init_app(app)
     limiter.init_app(app)
+    app.register_error_handler(RateLimitExceeded, rate_limited)
     cache.init_app(app)
+    response_cache.init_app(app)
+    read_router.init_app(app)
+    identity_cache.init_app(app)
+    token_cache.init_app(app)
+    password_hasher.init_app(app)
+    sql_stats.init_app(app)
+    metrics.init_app(app)
+    limiter.exempt(metrics.view)
+    profiler.init_app(app)
 
     #### Register Blueprints ###
+    #### imported here so `import mech.config` or `mech.utils` doesn't load every route;
+    #### registering stays eager: Flask takes no blueprints after the first request
+    from .blueprints.mechanics.routes import mechanics_bp
+    from .blueprints.service_tickets.routes import service_tickets_bp
+    from .blueprints.customers.routes import customers_bp
+    from .blueprints.inventory.routes import inventory_bp
     app.register_blueprint(customers_bp,       url_prefix="/customers")
     app.register_blueprint(mechanics_bp,       url_prefix="/mechanics")
     app.register_blueprint(service_tickets_bp, url_prefix="/service_tickets")
     app.register_blueprint(inventory_bp,       url_prefix="/inventory")
 
+    if app.config.get("DOCS_ENABLED", True):
+        register_docs(app)
+
+    return app
+
+def register_docs(app):
+    """/swagger.json, /docs and `flask swagger-export`.
+
+    YAML and flask_swagger are only imported when the spec is first built:
+    on the first /swagger.json hit, or at startup with SWAGGER_PRECOMPUTE.
+    flask_swagger_ui waits for the first /docs hit (LazySwaggerUI).
+    """
     ####### Auto generate swagger.json #####
     @app.route("/swagger.json")
     def swagger_spec():
-        ##### Load static definitions ######
-        static_path = os.path.join(app.static_folder, "swagger.yaml")
-        with open(static_path, 'r') as f:
-            static_docs = yaml.safe_load(f)
+        return spec_response(app)
 
-        ##### Generate spec ####
-        spec = swagger(app)
-        spec["info"]["title"] = "MechAPI"
-        spec["info"]["version"] = "1.0.0"
-
-        ### Merge components.schemas into Swagger2 definitions #####
-        spec.setdefault("definitions", {}).update(
-            static_docs.get("components", {}).get("schemas", {})
-        )
-
-        return jsonify(spec)
+    @app.cli.command("swagger-export")
+    @click.argument("path", required=False)
+    def swagger_export(path):
+        """Write swagger.json (and swagger.json.gz) for SWAGGER_SPEC_FILE."""
+        path = path or app.config.get("SWAGGER_SPEC_FILE") or os.path.join(app.static_folder, "swagger.json")
+        doc = write_spec(app, path)
+        click.echo(f"Wrote {path} ({len(doc.body)} bytes, {len(doc.gzipped)} gzipped, etag {doc.etag})")
 
     ###### Serve Swagger UI ###
-    swagger_ui_bp = get_swaggerui_blueprint(
-        "/docs",
-        "/swagger.json",
-        config={"app_name": "MechAPI"}
-    )
-    app.register_blueprint(swagger_ui_bp, url_prefix="/docs")
+    app.wsgi_app = LazySwaggerUI(app.wsgi_app, "/docs", "/swagger.json", config={"app_name": "MechAPI"})
 
-    return app
+    if app.config.get("SWAGGER_PRECOMPUTE"):
+        spec_document(app)
@@ -1,17 +1,21 @@
 import base64, json
 from flask import Flask, Blueprint, request, jsonify, current_app
 from . import customers_bp
-from .schemas import customer_schema, customers_schema
+from .schemas import dump_customer, dump_customers, load_customer, load_customer_update, load_login
 from marshmallow import ValidationError
 from mech.models import Customer, db
 from sqlalchemy import select, delete
-from mech.extensions import cache
+from mech.extensions import identity_cache, password_hasher, response_cache
 from mech.utils.util import encode_customer_token, customer_required
-from werkzeug.security import generate_password_hash, check_password_hash
+from mech.utils.fast_load import validation_failed
+from mech.utils.pagination import keyset_paginate, cursor_meta, TOTAL_MODES
+from mech.utils.rows import CustomerRow, paginate_rows
+from mech.utils.versioning import (
+    etag_for, collection_etag, not_modified, precondition_failed, apply_updates, commit_versioned
+)
 import jwt
 from jwt import InvalidTokenError
 from mech.models import Customer, db
-from mech.utils.util import encode_customer_token, customer_required, token_required
 
 @customers_bp.route("/", methods=['POST'])
 def create_customer():
@@ -43,24 +47,26 @@ def create_customer():
             email: "jane@example.com"
             phone: "555-555-1234"
       400:
-        description: Validation error
+        description: Unknown, missing or invalid fields
         schema:
-          $ref: "#/definitions/ErrorResponse"
+          $ref: "#/definitions/ValidationErrorResponse"
         examples:
           application/json:
-            error: "Invalid input data"
+            error: "Invalid request body"
+            fields:
+              email: ["Missing data for required field."]
     """
     try:
-        customer_data = customer_schema.load(request.json)
+        customer_data = load_customer(request.json)
     except ValidationError as e:
-        return jsonify(e.messages), 400
+        return validation_failed(e)
 
-    new_customer = Customer(**customer_data)
-    customer_data['password'] = generate_password_hash(customer_data['password'])
+    customer_data['password'] = password_hasher.hash(customer_data['password'])
     new_customer = Customer(**customer_data)
     db.session.add(new_customer)
+    response_cache.invalidate('customers')
     db.session.commit()
-    return customer_schema.jsonify(new_customer), 201
+    return jsonify(dump_customer(new_customer)), 201
 
 @customers_bp.route("/login", methods=['POST'])
 def customer_login():
@@ -105,17 +111,26 @@ def customer_login():
           application/json:
             error: "Invalid credentials"
     """
-    data = request.get_json() or {}
-    email = data.get('email')
-    password = data.get('password')
+    try:
+        data = load_login(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
+    email = data['email']
+    password = data['password']
 
     if not email or not password:
         return jsonify({'message': 'Email & password required'}), 400
 
     cust = Customer.query.filter_by(email=email).first()
-    if not cust or not check_password_hash(cust.password, password):
+    if not cust or not password_hasher.verify(cust.password, password):
         return jsonify({'message': 'Invalid credentials'}), 401
 
+    if password_hasher.needs_rehash(cust.password):
+        cust.password = password_hasher.hash(password)
+        #### best effort: a concurrent login that rehashed first wins, and the
+        #### password is already verified, so the token is issued either way
+        commit_versioned()
+
     token = encode_customer_token(cust.id)
     return jsonify({
         'status': 'success',
@@ -124,6 +139,7 @@ def customer_login():
     }), 200
 
 @customers_bp.route("/", methods=['GET'])
+@response_cache.cached('customers')
 def get_customers():
     """
     List Customers
@@ -132,7 +148,10 @@ def get_customers():
     tags:
       - Customers
     summary: Retrieve a paginated list of customers
-    description: Returns customers along with pagination metadata.
+    description: >
+      Returns customers along with pagination metadata. Passing `cursor`
+      switches to keyset pagination ordered by id, and meta becomes a
+      CursorMeta block.
     parameters:
       - in: query
         name: page
@@ -146,6 +165,20 @@ def get_customers():
         required: false
         default: 10
         description: Number of customers per page
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: >
+          Switches to cursor pagination. Pass an empty value for the first
+          page, then meta.next / meta.prev from the previous response.
+      - in: query
+        name: total
+        type: string
+        enum: [none, exact, approx, counter]
+        required: false
+        default: none
+        description: Row total to include in cursor mode
     responses:
       200:
         description: A paginated list of customers
@@ -174,20 +207,36 @@ def get_customers():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    pagination = Customer.query.paginate(
-        page=page, per_page=per_page, error_out=False
-    )
-    items = pagination.items
-
-    return jsonify({
-        'customers': customers_schema.dump(items),
-        'meta': {
+    if 'cursor' in request.args:
+        total_mode = request.args.get('total', 'none')
+        if total_mode not in TOTAL_MODES:
+            return jsonify({'error': f"Invalid 'total', expected one of {', '.join(TOTAL_MODES)}"}), 400
+        try:
+            keyset = keyset_paginate(
+                CustomerRow.select(), [Customer.id],
+                cursor=request.args['cursor'] or None, per_page=per_page, load=CustomerRow.load
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        items = keyset.items
+        meta = cursor_meta(keyset, Customer, total_mode)
+    else:
+        pagination = paginate_rows(CustomerRow, page=page, per_page=per_page, error_out=False)
+        items = pagination.items
+        meta = {
             'page': pagination.page,
             'per_page': pagination.per_page,
             'total': pagination.total,
             'pages': pagination.pages
         }
-    }), 200
+
+    etag = collection_etag(items, meta=meta)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+    resp = jsonify({'customers': dump_customers(items), 'meta': meta})
+    resp.set_etag(etag)
+    return resp, 200
 
 @customers_bp.route("/<int:id>", methods=['PUT'])
 def update_customer(id):
@@ -200,6 +249,11 @@ def update_customer(id):
     summary: Update an existing customer
     description: Modify one or more fields of a customer record.
     parameters:
+      - in: header
+        name: If-Match
+        type: string
+        required: false
+        description: ETag from an earlier response; the update is refused with 412 if the resource changed since
       - in: path
         name: id
         required: true
@@ -221,6 +275,10 @@ def update_customer(id):
             name: "Jane Doe"
             email: "jane@newemail.com"
             phone: "999-999-9999"
+      400:
+        description: Unknown, read-only or invalid fields
+        schema:
+          $ref: "#/definitions/ValidationErrorResponse"
       404:
         description: Customer not found
         schema:
@@ -228,21 +286,45 @@ def update_customer(id):
         examples:
           application/json:
             error: "Customer not found"
+      409:
+        description: Another request updated the resource first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
-    customer = Customer.query.get(id)
+    try:
+        updates = load_customer_update(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
+
+    customer = identity_cache.get(Customer, id)
     if not customer:
         return jsonify({"error": "Customer not found"}), 404
     
-    customer_data = request.json
-    for key, value in customer_data.items():
-        setattr(customer, key, value)
-    
-    db.session.commit()
-    return customer_schema.jsonify(customer), 200
+    failed = precondition_failed(customer)
+    if failed is not None:
+        return failed
+
+    error = apply_updates(customer, updates, setters={
+        'password': lambda c, val: setattr(c, 'password', password_hasher.hash(val))
+    })
+    if error:
+        return jsonify({"error": error}), 400
+
+    response_cache.invalidate('customers')
+    conflict = commit_versioned()
+    if conflict is not None:
+        return conflict
+    resp = jsonify(dump_customer(customer))
+    resp.set_etag(etag_for(customer))
+    return resp, 200
 
 @customers_bp.route('/', methods=['DELETE'])
-@token_required
-def delete_current_customer(current_user):
+@customer_required
+def delete_current_customer(current_cust_id):
     """
     Delete Current Customer
 
@@ -254,6 +336,11 @@ def delete_current_customer(current_user):
     security:
       - bearerAuth: []
     parameters:
+      - in: header
+        name: If-Match
+        type: string
+        required: false
+        description: ETag from an earlier response; the delete is refused with 412 if the resource changed since
       - in: header
         name: Authorization
         required: true
@@ -281,11 +368,25 @@ def delete_current_customer(current_user):
         examples:
           application/json:
             error: "Customer not found"
+      409:
+        description: Another request updated the resource first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
-    customer = Customer.query.get(current_user.id)
+    customer = identity_cache.get(Customer, current_cust_id)
     if not customer:
         return jsonify({'error': 'Customer not found'}), 404
+    failed = precondition_failed(customer)
+    if failed is not None:
+        return failed
 
     db.session.delete(customer)
-    db.session.commit()
-    return jsonify({'message': 'Customer deleted successfully'}), 200
+    response_cache.invalidate('customers', 'tickets')
+    conflict = commit_versioned()
+    if conflict is not None:
+        return conflict
+    return jsonify({'message': f'deleted customer {current_cust_id}'}), 200
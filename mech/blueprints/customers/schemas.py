@@ -2,6 +2,8 @@ from marshmallow import fields
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from mech.extensions import ma
 from mech.models import Customer
+from mech.utils.fast_dump import CompiledDump
+from mech.utils.fast_load import CompiledLoad
 
 class CustomerSchema(ma.SQLAlchemyAutoSchema):
     password = fields.String(load_only=True, required=True)
@@ -11,6 +13,16 @@ class CustomerSchema(ma.SQLAlchemyAutoSchema):
         load_instance = False
         include_fk = True
         fields = ("id", "name", "email", "phone", "password")
+        dump_only = ("id",)
+
+class LoginSchema(ma.Schema):
+    email = fields.String(required=True)
+    password = fields.String(required=True)
 
 customer_schema  = CustomerSchema()
-customers_schema = CustomerSchema(many=True)
\ No newline at end of file
+customers_schema = CustomerSchema(many=True)
+dump_customer  = CompiledDump(customer_schema)
+dump_customers = CompiledDump(customers_schema)
+load_customer        = CompiledLoad(customer_schema)
+load_customer_update = CompiledLoad(customer_schema, partial=True)
+load_login           = CompiledLoad(LoginSchema())
@@ -1,7 +1,13 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify
 from mech.models import Inventory, ServiceTicket, db
-from mech.blueprints.inventory.schemas import inventory_schema, inventories_schema
+from mech.extensions import identity_cache, response_cache
+from marshmallow import ValidationError
+from mech.blueprints.inventory.schemas import dump_inventory, load_inventory, load_inventory_update, load_add_part
 from mech.utils.util import mechanic_required
+from mech.utils.catalog import inventory_catalog
+from mech.utils.fast_load import validation_failed
+from mech.utils.versioning import etag_for, precondition_failed, apply_updates, commit_versioned
 from . import inventory_bp
 
 @inventory_bp.route("/", methods=['POST'])
@@ -36,18 +42,23 @@ def create_part(mech_id):
             name: "Brake Pad"
             price: 9.99
       400:
-        description: Validation error
+        description: Unknown, missing or invalid fields
         schema:
-          $ref: "#/definitions/ErrorResponse"
+          $ref: "#/definitions/ValidationErrorResponse"
         examples:
           application/json:
-            error: "Missing required field 'name'"
+            error: "Invalid request body"
+            fields:
+              name: ["Missing data for required field."]
     """
-    data = request.get_json() or {}
+    try:
+        data = load_inventory(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
     part = Inventory(**data)
     db.session.add(part)
     db.session.commit()
-    return inventory_schema.jsonify(part), 201
+    return jsonify(dump_inventory(part)), 201
 
 @inventory_bp.route("/", methods=['GET'])
 def get_parts():
@@ -58,7 +69,37 @@ def get_parts():
     tags:
       - Inventory
     summary: Retrieve all inventory parts
-    description: Returns a list of all parts in the inventory.
+    description: >
+      Returns the whole catalog as a list, served from a pre-serialized
+      snapshot that is only rebuilt after inventory writes. Every response
+      carries an ETag and an X-Catalog-Version header; send the ETag back in
+      If-None-Match to get a 304 while nothing has changed. Pass page /
+      per_page for one page of the catalog, or since=<version> for just the
+      parts changed and deleted after that version.
+    parameters:
+      - in: header
+        name: If-None-Match
+        type: string
+        required: false
+      - in: query
+        name: page
+        type: integer
+        required: false
+        description: Page number; switches the response to a CatalogPage
+      - in: query
+        name: per_page
+        type: integer
+        required: false
+        default: 100
+        description: Parts per page
+      - in: query
+        name: since
+        type: integer
+        required: false
+        description: >
+          A catalog version from an earlier response; returns a CatalogDelta.
+          0, or a version older than the retained change log, returns every
+          part as changed with full set.
     responses:
       200:
         description: List of parts
@@ -74,9 +115,65 @@ def get_parts():
             - id: 2
               name: "Oil Filter"
               price: 5.49
+      304:
+        description: Catalog unchanged since the ETag in If-None-Match
+      400:
+        description: Invalid page, per_page or since
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+        examples:
+          application/json:
+            error: "'since' must be a version between 0 and 42"
     """
-    parts = Inventory.query.all()
-    return inventories_schema.jsonify(parts), 200
+    args = {}
+    for arg in ('page', 'per_page', 'since'):
+        value = request.args.get(arg, type=int)
+        if arg in request.args and (value is None or value < 0):
+            return jsonify({"error": f"'{arg}' must be a non-negative integer"}), 400
+        args[arg] = value
+
+    snapshot = inventory_catalog.snapshot()
+    since = args['since']
+    if since is not None:
+        if since > snapshot.version:
+            return jsonify({"error": f"'since' must be a version between 0 and {snapshot.version}"}), 400
+        etag = f'v{snapshot.version}-since{since}'
+    elif args['page'] is not None or args['per_page'] is not None:
+        page = 1 if args['page'] is None else args['page']
+        per_page = 100 if args['per_page'] is None else args['per_page']
+        if page < 1 or per_page < 1:
+            return jsonify({"error": "'page' and 'per_page' must be at least 1"}), 400
+        etag = f'v{snapshot.version}-p{page}x{per_page}'
+    else:
+        etag = f'v{snapshot.version}'
+
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    elif since is not None:
+        changed, deleted, full = inventory_catalog.delta(snapshot, since)
+        resp = Response(
+            f'{{"changed":[{",".join(changed)}],"deleted":{json.dumps(deleted)},"full":{json.dumps(full)},'
+            f'"since":{since},"version":{snapshot.version}}}',
+            mimetype='application/json'
+        )
+    elif args['page'] is not None or args['per_page'] is not None:
+        total = len(snapshot.ids)
+        meta = {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': -(-total // per_page),
+            'version': snapshot.version
+        }
+        resp = Response(
+            f'{{"meta":{json.dumps(meta, sort_keys=True)},"parts":{snapshot.page(page, per_page)}}}',
+            mimetype='application/json'
+        )
+    else:
+        resp = Response(snapshot.body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['X-Catalog-Version'] = str(snapshot.version)
+    return resp
 
 @inventory_bp.route("/<int:id>", methods=['PUT'])
 @mechanic_required
@@ -94,6 +191,11 @@ def update_part(mech_id, id):
     consumes:
       - application/json
     parameters:
+      - in: header
+        name: If-Match
+        type: string
+        required: false
+        description: ETag from an earlier response; the update is refused with 412 if the resource changed since
       - in: path
         name: id
         required: true
@@ -115,12 +217,14 @@ def update_part(mech_id, id):
             name: "Brake Pad"
             price: 12.99
       400:
-        description: Validation error
+        description: Unknown, read-only or invalid fields
         schema:
-          $ref: "#/definitions/ErrorResponse"
+          $ref: "#/definitions/ValidationErrorResponse"
         examples:
           application/json:
-            error: "Invalid price value"
+            error: "Invalid request body"
+            fields:
+              price: ["Not a valid number."]
       404:
         description: Part not found
         schema:
@@ -128,14 +232,34 @@ def update_part(mech_id, id):
         examples:
           application/json:
             error: "Part not found"
+      409:
+        description: Another request updated the resource first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
-    part = Inventory.query.get(id)
+    try:
+        updates = load_inventory_update(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
+    part = identity_cache.get(Inventory, id)
     if not part:
         return jsonify({"error":"Part not found"}), 404
-    for k, v in request.json.items():
-        setattr(part, k, v)
-    db.session.commit()
-    return inventory_schema.jsonify(part), 200
+    failed = precondition_failed(part)
+    if failed is not None:
+        return failed
+    error = apply_updates(part, updates)
+    if error:
+        return jsonify({"error": error}), 400
+    conflict = commit_versioned()
+    if conflict is not None:
+        return conflict
+    resp = jsonify(dump_inventory(part))
+    resp.set_etag(etag_for(part))
+    return resp, 200
 
 @inventory_bp.route("/<int:id>", methods=['DELETE'])
 @mechanic_required
@@ -151,6 +275,11 @@ def delete_part(mech_id, id):
     security:
       - bearerAuth: []
     parameters:
+      - in: header
+        name: If-Match
+        type: string
+        required: false
+        description: ETag from an earlier response; the delete is refused with 412 if the resource changed since
       - in: path
         name: id
         required: true
@@ -178,12 +307,25 @@ def delete_part(mech_id, id):
         examples:
           application/json:
             error: "Part not found"
+      409:
+        description: Another request updated the resource first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
-    part = Inventory.query.get(id)
+    part = identity_cache.get(Inventory, id)
     if not part:
         return jsonify({"error":"Part not found"}), 404
+    failed = precondition_failed(part)
+    if failed is not None:
+        return failed
     db.session.delete(part)
-    db.session.commit()
+    conflict = commit_versioned()
+    if conflict is not None:
+        return conflict
     return jsonify({"message": "Deleted"}), 200
 
 @inventory_bp.route("/<int:ticket_id>/add_part", methods=['POST'])
@@ -227,6 +369,10 @@ def add_part_to_ticket(mech_id, ticket_id):
         examples:
           application/json:
             message: "Part 5 added to ticket 42"
+      400:
+        description: Missing or invalid part_id
+        schema:
+          $ref: "#/definitions/ValidationErrorResponse"
       404:
         description: Ticket or part not found
         schema:
@@ -235,14 +381,18 @@ def add_part_to_ticket(mech_id, ticket_id):
           application/json:
             error: "Ticket not found"
     """
+    try:
+        part_id = load_add_part(request.get_json() or {})['part_id']
+    except ValidationError as e:
+        return validation_failed(e)
     ticket = ServiceTicket.query.get(ticket_id)
     if not ticket:
         return jsonify({"error":"Ticket not found"}), 404
-    part_id = request.json.get("part_id")
-    part = Inventory.query.get(part_id)
+    part = identity_cache.get(Inventory, part_id)
     if not part:
         return jsonify({"error":"Part not found"}), 404
     if part not in ticket.parts:
         ticket.parts.append(part)
+        response_cache.invalidate('tickets')
         db.session.commit()
     return jsonify({"message": f"Part {part_id} added to ticket {ticket_id}"}), 200
@@ -1,6 +1,9 @@
+from marshmallow import fields
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from mech.extensions import ma
 from mech.models import Inventory
+from mech.utils.fast_dump import CompiledDump
+from mech.utils.fast_load import CompiledLoad
 
 class InventorySchema(ma.SQLAlchemyAutoSchema):
     class Meta:
@@ -8,6 +11,15 @@ class InventorySchema(ma.SQLAlchemyAutoSchema):
         load_instance = False
         include_fk = True
         fields = ("id", "name", "price")
+        dump_only = ("id",)
+
+class AddPartSchema(ma.Schema):
+    part_id = fields.Integer(required=True, strict=True)
 
 inventory_schema   = InventorySchema()
 inventories_schema = InventorySchema(many=True)
+dump_inventory   = CompiledDump(inventory_schema)
+dump_inventories = CompiledDump(inventories_schema)
+load_inventory        = CompiledLoad(inventory_schema)
+load_inventory_update = CompiledLoad(inventory_schema, partial=True)
+load_add_part         = CompiledLoad(AddPartSchema())
@@ -1,8 +1,17 @@
+from datetime import date
 from flask import request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from mech.extensions import db
+from marshmallow import ValidationError
+from mech.extensions import db, identity_cache, password_hasher, response_cache
 from mech.models import Mechanic, ServiceTicket
 from mech.utils.util import mechanic_required, encode_mechanic_token
+from mech.utils.fast_load import validation_failed
+from mech.utils.ranking import rank_mechanics
+from mech.utils.rows import MechanicRow
+from mech.utils.versioning import (
+    etag_for, collection_etag, not_modified, precondition_failed, apply_updates,
+    commit_versioned, bump_version
+)
+from .schemas import load_login, load_mechanic, load_mechanic_update
 from . import mechanics_bp
 
 @mechanics_bp.route('/login', methods=['POST'])
@@ -46,16 +55,25 @@ def mechanic_login():
           application/json:
             message: "Invalid credentials"
     """
-    data = request.get_json() or {}
-    email = data.get('email')
-    password = data.get('password')
+    try:
+        data = load_login(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
+    email = data['email']
+    password = data['password']
     if not email or not password:
         return jsonify({'message': 'Email & password required'}), 400
 
     mech = Mechanic.query.filter_by(email=email).first()
-    if not mech or not check_password_hash(mech.password, password):
+    if not mech or not password_hasher.verify(mech.password, password):
         return jsonify({'message': 'Invalid credentials'}), 401
 
+    if password_hasher.needs_rehash(mech.password):
+        mech.password = password_hasher.hash(password)
+        #### best effort: a concurrent login that rehashed first wins, and the
+        #### password is already verified, so the token is issued either way
+        commit_versioned()
+
     token = encode_mechanic_token(mech.id)
     return jsonify({'auth_token': token}), 200
 
@@ -86,30 +104,29 @@ def create_mechanic():
           application/json:
             id: 42
       400:
-        description: Missing fields
+        description: Unknown, missing or invalid fields
         schema:
-          $ref: "#/definitions/ErrorResponse"
+          $ref: "#/definitions/ValidationErrorResponse"
         examples:
           application/json:
-            message: "Missing fields"
+            error: "Invalid request body"
+            fields:
+              salary: ["Missing data for required field."]
     """
-    data = request.get_json() or {}
-    required = ['name', 'email', 'phone', 'salary', 'password']
-    if not all(field in data for field in required):
-        return jsonify({'message': 'Missing fields'}), 400
+    try:
+        data = load_mechanic(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
 
-    mech = Mechanic(
-        name=data['name'],
-        email=data['email'],
-        phone=data['phone'],
-        salary=data['salary'],
-        password=generate_password_hash(data['password'])
-    )
+    data['password'] = password_hasher.hash(data['password'])
+    mech = Mechanic(**data)
     db.session.add(mech)
+    response_cache.invalidate('mechanics')
     db.session.commit()
     return jsonify({'id': mech.id}), 201
 
 @mechanics_bp.route('/', methods=['GET'])
+@response_cache.cached('mechanics')
 def get_mechanics():
     """
     List Mechanics
@@ -139,15 +156,22 @@ def get_mechanics():
               phone: "555-555-0002"
               salary: 60000
     """
-    mechs = Mechanic.query.all()
+    mechs = MechanicRow.load(MechanicRow.select())
+    etag = collection_etag(mechs)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
     result = [
         {'id': m.id, 'name': m.name, 'email': m.email, 'phone': m.phone, 'salary': m.salary}
         for m in mechs
     ]
-    return jsonify(result), 200
+    resp = jsonify(result)
+    resp.set_etag(etag)
+    return resp, 200
 
 @mechanics_bp.route('/ranked', methods=['GET'])
 @mechanic_required
+@response_cache.cached('tickets', 'mechanics')
 def get_mechanics_by_ticket_count(current_mech_id):
     """
     List Mechanics by Ticket Count
@@ -156,9 +180,45 @@ def get_mechanics_by_ticket_count(current_mech_id):
     tags:
       - Mechanics
     summary: Retrieve mechanics ranked by number of assigned tickets
-    description: Returns mechanics sorted descending by how many service tickets they have.
+    description: >
+      Returns mechanics sorted descending by how many service tickets they have.
+      Mechanics with equal counts share a rank.
     security:
       - bearerAuth: []
+    parameters:
+      - in: query
+        name: top
+        type: integer
+        required: false
+        description: Only return the first K ranks
+      - in: query
+        name: ties
+        type: boolean
+        required: false
+        default: true
+        description: Include every mechanic tied at rank K (false returns exactly K)
+      - in: query
+        name: start
+        type: string
+        format: date
+        required: false
+        description: Only count tickets with service_date on or after this day
+      - in: query
+        name: end
+        type: string
+        format: date
+        required: false
+        description: Only count tickets with service_date on or before this day
+      - in: query
+        name: page
+        type: integer
+        required: false
+        description: Page number (requires per_page)
+      - in: query
+        name: per_page
+        type: integer
+        required: false
+        description: Number of mechanics per page
     responses:
       200:
         description: Ranked list of mechanics
@@ -173,24 +233,42 @@ def get_mechanics_by_ticket_count(current_mech_id):
                 type: string
               ticket_count:
                 type: integer
+              rank:
+                type: integer
         examples:
           application/json:
             - id: 2
               name: "Ann"
               ticket_count: 10
+              rank: 1
             - id: 1
               name: "Joe"
               ticket_count: 7
+              rank: 2
+      400:
+        description: Invalid date format
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+        examples:
+          application/json:
+            error: "Invalid 'start' format (YYYY-MM-DD expected)"
     """
-    mechs = Mechanic.query.all()
-    ranked = []
-    for m in mechs:
-        ranked.append({
-            'id': m.id,
-            'name': m.name,
-            'ticket_count': m.service_tickets.count()
-        })
-    ranked.sort(key=lambda x: x['ticket_count'], reverse=True)
+    dates = {}
+    for arg in ('start', 'end'):
+        value = request.args.get(arg)
+        try:
+            dates[arg] = date.fromisoformat(value) if value else None
+        except ValueError:
+            return jsonify({'error': f"Invalid '{arg}' format (YYYY-MM-DD expected)"}), 400
+
+    ranked = rank_mechanics(
+        top=request.args.get('top', type=int),
+        ties=request.args.get('ties', 'true').lower() not in ('0', 'false', 'no'),
+        start=dates['start'],
+        end=dates['end'],
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', type=int)
+    )
     return jsonify(ranked), 200
 
 @mechanics_bp.route('/<int:mech_id>', methods=['PUT'])
@@ -209,6 +287,11 @@ def update_mechanic(current_mech_id, mech_id):
     consumes:
       - application/json
     parameters:
+      - in: header
+        name: If-Match
+        type: string
+        required: false
+        description: ETag from an earlier response; the update is refused with 412 if the resource changed since
       - in: path
         name: mech_id
         required: true
@@ -231,6 +314,10 @@ def update_mechanic(current_mech_id, mech_id):
             email: "joe@new.com"
             phone: "555-1111"
             salary: 58000
+      400:
+        description: Unknown, read-only or invalid fields
+        schema:
+          $ref: "#/definitions/ValidationErrorResponse"
       403:
         description: Forbidden (cannot modify other mechanics)
         schema:
@@ -245,28 +332,49 @@ def update_mechanic(current_mech_id, mech_id):
         examples:
           application/json:
             error: "Mechanic not found"
+      409:
+        description: Another request updated the resource first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
-    mech = Mechanic.query.get(mech_id)
+    try:
+        updates = load_mechanic_update(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
+
+    mech = identity_cache.get(Mechanic, mech_id)
     if not mech:
         return jsonify({'error': 'Mechanic not found'}), 404
     if current_mech_id != mech_id:
         return jsonify({'error': 'Forbidden'}), 403
 
-    data = request.get_json() or {}
-    for key, val in data.items():
-        if key == 'password':
-            mech.password = generate_password_hash(val)
-        else:
-            setattr(mech, key, val)
-    db.session.commit()
+    failed = precondition_failed(mech)
+    if failed is not None:
+        return failed
 
-    return jsonify({
+    error = apply_updates(mech, updates, setters={
+        'password': lambda m, val: setattr(m, 'password', password_hasher.hash(val))
+    })
+    if error:
+        return jsonify({'error': error}), 400
+    response_cache.invalidate('mechanics')
+    conflict = commit_versioned()
+    if conflict is not None:
+        return conflict
+
+    resp = jsonify({
         'id': mech.id,
         'name': mech.name,
         'email': mech.email,
         'phone': mech.phone,
         'salary': mech.salary
-    }), 200
+    })
+    resp.set_etag(etag_for(mech))
+    return resp, 200
 
 @mechanics_bp.route('/<int:mech_id>', methods=['DELETE'])
 @mechanic_required
@@ -282,6 +390,11 @@ def delete_mechanic(current_mech_id, mech_id):
     security:
       - bearerAuth: []
     parameters:
+      - in: header
+        name: If-Match
+        type: string
+        required: false
+        description: ETag from an earlier response; the delete is refused with 412 if the resource changed since
       - in: path
         name: mech_id
         required: true
@@ -309,15 +422,30 @@ def delete_mechanic(current_mech_id, mech_id):
         examples:
           application/json:
             error: "Mechanic not found"
+      409:
+        description: Another request updated the resource first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
-    mech = Mechanic.query.get(mech_id)
+    mech = identity_cache.get(Mechanic, mech_id)
     if not mech:
         return jsonify({'error': 'Mechanic not found'}), 404
     if current_mech_id != mech_id:
         return jsonify({'error': 'Forbidden'}), 403
 
+    failed = precondition_failed(mech)
+    if failed is not None:
+        return failed
+
     db.session.delete(mech)
-    db.session.commit()
+    response_cache.invalidate('mechanics')
+    conflict = commit_versioned()
+    if conflict is not None:
+        return conflict
     return jsonify({'message': 'Mechanic deleted successfully'}), 200
 
 @mechanics_bp.route('/<int:mech_id>/tickets/<int:ticket_id>', methods=['POST'])
@@ -368,7 +496,7 @@ def assign_ticket(current_mech_id, mech_id, ticket_id):
           application/json:
             error: "Mechanic not found"
     """
-    mech = Mechanic.query.get(mech_id)
+    mech = identity_cache.get(Mechanic, mech_id)
     if not mech:
         return jsonify({'error': 'Mechanic not found'}), 404
 
@@ -380,7 +508,11 @@ def assign_ticket(current_mech_id, mech_id, ticket_id):
         return jsonify({'error': 'Forbidden'}), 403
 
     if not ticket.mechanics.filter_by(id=mech_id).first():
+        conflict = bump_version(ticket)
+        if conflict:
+            return conflict
         ticket.mechanics.append(mech)
+        response_cache.invalidate('tickets')
         db.session.commit()
 
     return jsonify({
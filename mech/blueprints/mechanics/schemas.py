@@ -3,6 +3,9 @@ from marshmallow import fields, ValidationError
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from mech.extensions import ma
 from mech.models import Mechanic
+from mech.utils.fast_dump import CompiledDump
+from mech.utils.fast_load import CompiledLoad
+from mech.blueprints.customers.schemas import LoginSchema
 
 class MechanicSchema(ma.SQLAlchemyAutoSchema):
     #### Avoiding re-nest of each ticket’s mechanics to kill endless loop
@@ -12,7 +15,7 @@ class MechanicSchema(ma.SQLAlchemyAutoSchema):
         dump_only=True,
         exclude=("mechanics",)
     )
-    password = fields.String(load_only=True)
+    password = fields.String(load_only=True, required=True)
 
     class Meta:
         model = Mechanic
@@ -27,6 +30,12 @@ class MechanicSchema(ma.SQLAlchemyAutoSchema):
             "password",
             "tickets",
         )
+        dump_only = ("id",)
 
 mechanic_schema  = MechanicSchema()
 mechanics_schema = MechanicSchema(many=True)
+dump_mechanic  = CompiledDump(mechanic_schema)
+dump_mechanics = CompiledDump(mechanics_schema)
+load_mechanic        = CompiledLoad(mechanic_schema)
+load_mechanic_update = CompiledLoad(mechanic_schema, partial=True)
+load_login           = CompiledLoad(LoginSchema())
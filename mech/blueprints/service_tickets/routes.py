@@ -1,12 +1,28 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from datetime import date
-from mech.extensions import db
-from mech.models import ServiceTicket, Mechanic
-from mech.blueprints.service_tickets.schemas import service_ticket_schema, service_tickets_schema
+from mech.extensions import db, identity_cache, response_cache
+from sqlalchemy import select, insert, delete, and_
+from mech.models import ServiceTicket, Mechanic, Customer, service_mechanics
+from marshmallow import ValidationError
+from mech.blueprints.service_tickets.schemas import (
+    dump_service_ticket, dump_service_tickets, load_service_ticket, load_service_ticket_update,
+    load_bulk_ticket, load_ticket_mechanics_edit
+)
 from mech.utils.util import mechanic_required
+from mech.utils.fast_load import validation_failed
+from mech.utils.pagination import keyset_paginate, cursor_meta, row_counter, TOTAL_MODES
+from mech.utils.rows import TicketRow, paginate_rows, load_ticket_row_relations
+from mech.utils.versioning import (
+    etag_for, collection_etag, not_modified, precondition_failed, apply_updates,
+    commit_versioned, bump_version
+)
+from mech.utils.bulk import insert_ignore, insert_rows_returning_ids
+from mech.utils.export import ticket_export_query, iter_tickets, ndjson_stream, csv_stream
 from mech.blueprints.service_tickets import service_tickets_bp
 
 @service_tickets_bp.route('/', methods=['GET'])
+@response_cache.cached('tickets', 'customers', 'mechanics')
 def get_tickets():
     """
     List Service Tickets
@@ -15,7 +31,10 @@ def get_tickets():
     tags:
       - ServiceTickets
     summary: Retrieve a paginated list of service tickets
-    description: Returns service tickets along with pagination metadata.
+    description: >
+      Returns service tickets along with pagination metadata. Passing `cursor`
+      switches to keyset pagination ordered by (service_date, id), and meta
+      becomes a CursorMeta block.
     parameters:
       - in: query
         name: page
@@ -29,6 +48,20 @@ def get_tickets():
         required: false
         default: 10
         description: Number of tickets per page
+      - in: query
+        name: cursor
+        type: string
+        required: false
+        description: >
+          Switches to cursor pagination. Pass an empty value for the first
+          page, then meta.next / meta.prev from the previous response.
+      - in: query
+        name: total
+        type: string
+        enum: [none, exact, approx, counter]
+        required: false
+        default: none
+        description: Row total to include in cursor mode
     responses:
       200:
         description: A paginated list of service tickets
@@ -60,19 +93,138 @@ def get_tickets():
     """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    pagination = ServiceTicket.query.paginate(
-        page=page, per_page=per_page, error_out=False
-    )
-    items = pagination.items
-    return jsonify({
-        'tickets': service_tickets_schema.dump(items),
-        'meta': {
+
+    if 'cursor' in request.args:
+        total_mode = request.args.get('total', 'none')
+        if total_mode not in TOTAL_MODES:
+            return jsonify({'error': f"Invalid 'total', expected one of {', '.join(TOTAL_MODES)}"}), 400
+        try:
+            keyset = keyset_paginate(
+                TicketRow.select(), [ServiceTicket.service_date, ServiceTicket.id],
+                cursor=request.args['cursor'] or None, per_page=per_page, load=TicketRow.load
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        items = load_ticket_row_relations(keyset.items)
+        meta = cursor_meta(keyset, ServiceTicket, total_mode)
+    else:
+        pagination = paginate_rows(TicketRow, page=page, per_page=per_page, error_out=False)
+        items = load_ticket_row_relations(pagination.items)
+        meta = {
             'page': pagination.page,
             'per_page': pagination.per_page,
             'total': pagination.total,
             'pages': pagination.pages
         }
-    }), 200
+
+    etag = _tickets_etag(items, meta)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+    resp = jsonify({'tickets': dump_service_tickets(items), 'meta': meta})
+    resp.set_etag(etag)
+    return resp, 200
+
+
+def _tickets_etag(tickets, meta):
+    #### the body also shows each ticket's customer and mechanics
+    customers = [t.customer for t in tickets if t.customer is not None]
+    mechanics = [m for t in tickets for m in t.mechanics]
+    return collection_etag(tickets, customers, mechanics, meta=meta)
+
+@service_tickets_bp.route('/export', methods=['GET'])
+@mechanic_required
+def export_tickets(current_mech_id):
+    """
+    Export Service Tickets
+
+    ---
+    tags:
+      - ServiceTickets
+    summary: Stream the ticket history as NDJSON or CSV
+    description: >
+      Streams every matching ticket, in id order, from a server-side cursor.
+      Memory use stays flat however many rows are exported. mechanic_ids are
+      space-separated in CSV.
+    security:
+      - bearerAuth: []
+    produces:
+      - application/x-ndjson
+      - text/csv
+    parameters:
+      - in: query
+        name: format
+        type: string
+        enum: [ndjson, csv]
+        required: false
+        default: ndjson
+      - in: query
+        name: start
+        type: string
+        format: date
+        required: false
+        description: Only tickets with service_date on or after this day
+      - in: query
+        name: end
+        type: string
+        format: date
+        required: false
+        description: Only tickets with service_date on or before this day
+      - in: query
+        name: customer_id
+        type: integer
+        required: false
+      - in: query
+        name: mechanic_id
+        type: integer
+        required: false
+        description: Only tickets this mechanic is assigned to
+    responses:
+      200:
+        description: Ticket stream
+        examples:
+          application/x-ndjson: |
+            {"id":1,"vin":"1HGCM82633A004352","service_date":"2025-05-01","service_desc":"Oil change","customer_id":1,"mechanic_ids":[2]}
+          text/csv: |
+            id,vin,service_date,service_desc,customer_id,mechanic_ids
+            1,1HGCM82633A004352,2025-05-01,Oil change,1,2
+      400:
+        description: Invalid format or filter
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+        examples:
+          application/json:
+            error: "Invalid 'start' format (YYYY-MM-DD expected)"
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': "Invalid 'format', expected ndjson or csv"}), 400
+
+    filters = {}
+    for arg in ('start', 'end'):
+        value = request.args.get(arg)
+        try:
+            filters[arg] = date.fromisoformat(value) if value else None
+        except ValueError:
+            return jsonify({'error': f"Invalid '{arg}' format (YYYY-MM-DD expected)"}), 400
+    for arg in ('customer_id', 'mechanic_id'):
+        filters[arg] = request.args.get(arg, type=int)
+        if arg in request.args and filters[arg] is None:
+            return jsonify({'error': f"'{arg}' must be an integer"}), 400
+
+    tickets = iter_tickets(
+        ticket_export_query(**filters),
+        batch_size=current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    )
+    if fmt == 'csv':
+        body, mimetype = csv_stream(tickets), 'text/csv'
+    else:
+        body, mimetype = ndjson_stream(tickets), 'application/x-ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=service_tickets.{fmt}'}
+    )
 
 @service_tickets_bp.route('/', methods=['POST'])
 @mechanic_required
@@ -104,36 +256,185 @@ def create_ticket(current_mech_id):
           application/json:
             id: 100
       400:
-        description: Validation error or missing field
+        description: Unknown, missing or invalid fields
         schema:
-          $ref: "#/definitions/ErrorResponse"
+          $ref: "#/definitions/ValidationErrorResponse"
         examples:
           application/json:
-            error: "Missing field 'vin'"
+            error: "Invalid request body"
+            fields:
+              vin: ["Missing data for required field."]
     """
-    data = request.get_json() or {}
-    for field in ('vin', 'service_date', 'service_desc', 'customer_id'):
-        if field not in data:
-            return jsonify({'error': f"Missing field '{field}'"}), 400
-
     try:
-        service_date_obj = date.fromisoformat(data['service_date'])
-    except ValueError:
-        return jsonify({'error': "Invalid 'service_date' format (YYYY-MM-DD expected)"}), 400
-
-    ticket = ServiceTicket(
-        vin=data['vin'],
-        service_date=service_date_obj,
-        service_desc=data['service_desc'],
-        customer_id=data['customer_id']
-    )
-    mech = Mechanic.query.get(current_mech_id)
+        data = load_service_ticket(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
+
+    ticket = ServiceTicket(**data)
+    mech = identity_cache.get(Mechanic, current_mech_id)
     ticket.mechanics.append(mech)
 
     db.session.add(ticket)
+    response_cache.invalidate('tickets')
     db.session.commit()
     return jsonify({'id': ticket.id}), 201
 
+def _parse_bulk_item(item, default_mechanic_id):
+    """Validate one bulk ticket: (row, mechanic ids, None) or (None, None, field errors)."""
+    try:
+        row = load_bulk_ticket(item)
+    except ValidationError as e:
+        return None, None, e.messages
+    mechanic_ids = row.pop('mechanic_ids', [default_mechanic_id])
+    return row, sorted(set(mechanic_ids)), None
+
+def _bulk_items():
+    """Tickets from a JSON array body, or one per line from an NDJSON stream."""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield ValueError('Invalid JSON line')
+        return
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of tickets')
+    yield from data
+
+@service_tickets_bp.route('/bulk', methods=['POST'])
+@mechanic_required
+def create_tickets_bulk(current_mech_id):
+    """
+    Bulk Create Service Tickets
+
+    ---
+    tags:
+      - ServiceTickets
+    summary: Create many service tickets in one transaction
+    description: >
+      Accepts a JSON array of tickets, or NDJSON (one ticket per line,
+      Content-Type application/x-ndjson) streamed in the body. Every item is
+      validated first; valid tickets and their mechanic links are then
+      inserted with executemany in a single transaction. `mechanic_ids`
+      defaults to the requesting mechanic. With `atomic=true` nothing is
+      inserted unless every item is valid.
+    security:
+      - bearerAuth: []
+    consumes:
+      - application/json
+      - application/x-ndjson
+    parameters:
+      - in: query
+        name: atomic
+        type: boolean
+        required: false
+        default: false
+        description: Reject the whole batch if any item is invalid
+      - in: body
+        name: tickets
+        required: true
+        schema:
+          type: array
+          items:
+            $ref: "#/definitions/ServiceTicketBulkItem"
+    responses:
+      201:
+        description: All tickets created
+        schema:
+          $ref: "#/definitions/BulkResult"
+        examples:
+          application/json:
+            created: 2
+            failed: 0
+            results:
+              - index: 0
+                status: 201
+                id: 101
+              - index: 1
+                status: 201
+                id: 102
+      207:
+        description: Some tickets created, per-item results say which
+        schema:
+          $ref: "#/definitions/BulkResult"
+      400:
+        description: Nothing created
+        schema:
+          $ref: "#/definitions/BulkResult"
+      413:
+        description: More than BULK_MAX_ITEMS tickets
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+    """
+    max_items = current_app.config.get('BULK_MAX_ITEMS', 1000)
+    atomic = request.args.get('atomic', 'false').lower() in ('1', 'true', 'yes')
+
+    parsed, results = [], []
+    try:
+        for index, item in enumerate(_bulk_items()):
+            if index >= max_items:
+                return jsonify({'error': f'At most {max_items} tickets per request'}), 413
+            if isinstance(item, ValueError):
+                row, mechanic_ids, error = None, None, str(item)
+            else:
+                row, mechanic_ids, error = _parse_bulk_item(item, current_mech_id)
+            parsed.append((index, row, mechanic_ids))
+            results.append({'index': index, 'status': 400, 'error': error})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not parsed:
+        return jsonify({'error': 'No tickets supplied'}), 400
+
+    #### referenced customers and mechanics, resolved in one query each
+    valid = [(i, row, mids) for i, row, mids in parsed if row is not None]
+    customers = set(db.session.scalars(
+        select(Customer.id).where(Customer.id.in_({row['customer_id'] for _, row, _ in valid}))
+    )) if valid else set()
+    mechanics = set(db.session.scalars(
+        select(Mechanic.id).where(Mechanic.id.in_({m for _, _, mids in valid for m in mids}))
+    )) if valid else set()
+
+    accepted = []
+    for index, row, mechanic_ids in valid:
+        missing = [m for m in mechanic_ids if m not in mechanics]
+        if row['customer_id'] not in customers:
+            results[index]['error'] = f"Customer {row['customer_id']} not found"
+        elif missing:
+            results[index]['error'] = f'Mechanics not found: {missing}'
+        else:
+            accepted.append((index, row, mechanic_ids))
+
+    if accepted and not (atomic and len(accepted) < len(parsed)):
+        tickets = ServiceTicket.__table__
+        ids = insert_rows_returning_ids(tickets, [row for _, row, _ in accepted])
+        links = [
+            {'ticket_id': ticket_id, 'mechanic_id': m}
+            for ticket_id, (_, _, mechanic_ids) in zip(ids, accepted)
+            for m in mechanic_ids
+        ]
+        if links:
+            db.session.execute(insert(service_mechanics), links)
+        row_counter.adjust(db.session, ServiceTicket, len(ids))
+        response_cache.invalidate('tickets')
+        db.session.commit()
+        for ticket_id, (index, _, _) in zip(ids, accepted):
+            results[index] = {'index': index, 'status': 201, 'id': ticket_id}
+    elif atomic:
+        for index, _, _ in accepted:
+            results[index]['error'] = 'Not created: batch rejected (atomic)'
+
+    created = sum(1 for r in results if r['status'] == 201)
+    status = 201 if created == len(results) else 207 if created else 400
+    return jsonify({
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    }), status
+
 @service_tickets_bp.route('/<int:ticket_id>', methods=['PUT'])
 @mechanic_required
 def update_ticket(current_mech_id, ticket_id):
@@ -150,6 +451,11 @@ def update_ticket(current_mech_id, ticket_id):
     consumes:
       - application/json
     parameters:
+      - in: header
+        name: If-Match
+        type: string
+        required: false
+        description: ETag from an earlier response; the update is refused with 412 if the resource changed since
       - in: path
         name: ticket_id
         required: true
@@ -176,12 +482,14 @@ def update_ticket(current_mech_id, ticket_id):
               - id: 3
                 name: "Carol Lee"
       400:
-        description: Invalid data or date format
+        description: Unknown, read-only or invalid fields
         schema:
-          $ref: "#/definitions/ErrorResponse"
+          $ref: "#/definitions/ValidationErrorResponse"
         examples:
           application/json:
-            error: "Invalid 'service_date' format (YYYY-MM-DD expected)"
+            error: "Invalid request body"
+            fields:
+              service_date: ["Invalid date string, expected YYYY-MM-DD."]
       404:
         description: Ticket not found
         schema:
@@ -189,24 +497,39 @@ def update_ticket(current_mech_id, ticket_id):
         examples:
           application/json:
             error: "ServiceTicket not found"
+      409:
+        description: Another request updated the resource first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
+    try:
+        updates = load_service_ticket_update(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
+
     ticket = ServiceTicket.query.get(ticket_id)
     if not ticket:
         return jsonify({'error': 'ServiceTicket not found'}), 404
 
-    updates = request.get_json() or {}
-
-    if 'service_date' in updates:
-        try:
-            updates['service_date'] = date.fromisoformat(updates['service_date'])
-        except ValueError:
-            return jsonify({'error': "Invalid 'service_date' format (YYYY-MM-DD expected)"}), 400
+    failed = precondition_failed(ticket)
+    if failed is not None:
+        return failed
 
-    for key, val in updates.items():
-        setattr(ticket, key, val)
+    error = apply_updates(ticket, updates)
+    if error:
+        return jsonify({'error': error}), 400
 
-    db.session.commit()
-    return jsonify(service_ticket_schema.dump(ticket)), 200
+    response_cache.invalidate('tickets')
+    conflict = commit_versioned()
+    if conflict is not None:
+        return conflict
+    resp = jsonify(dump_service_ticket(ticket))
+    resp.set_etag(etag_for(ticket))
+    return resp, 200
 
 @service_tickets_bp.route('/<int:ticket_id>/edit', methods=['PUT'])
 @mechanic_required
@@ -247,12 +570,28 @@ def edit_ticket_mechanics(current_mech_id, ticket_id):
               description: List of mechanic IDs to remove
     responses:
       200:
-        description: Ticket mechanics updated successfully
+        description: >
+          Ticket mechanics updated. Each requested id is reported in exactly
+          one of added / already_present / removed / not_assigned / unknown.
         schema:
-          $ref: "#/definitions/MessageResponse"
+          $ref: "#/definitions/TicketMechanicsEdit"
         examples:
           application/json:
             message: "Ticket mechanics updated successfully"
+            added: [3]
+            already_present: [1]
+            removed: [2]
+            not_assigned: []
+            unknown: [99]
+      400:
+        description: add_ids / remove_ids are not lists of integers, or other fields were sent
+        schema:
+          $ref: "#/definitions/ValidationErrorResponse"
+        examples:
+          application/json:
+            error: "Invalid request body"
+            fields:
+              add_ids: {"0": ["Not a valid integer."]}
       404:
         description: Ticket not found
         schema:
@@ -260,27 +599,76 @@ def edit_ticket_mechanics(current_mech_id, ticket_id):
         examples:
           application/json:
             error: "ServiceTicket not found"
+      409:
+        description: Another request updated the ticket first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
+    try:
+        data = load_ticket_mechanics_edit(request.get_json() or {})
+    except ValidationError as e:
+        return validation_failed(e)
+
     ticket = ServiceTicket.query.get(ticket_id)
     if not ticket:
         return jsonify({'error': 'ServiceTicket not found'}), 404
+    failed = precondition_failed(ticket)
+    if failed:
+        return failed
 
-    data = request.get_json() or {}
-    add_ids = data.get('add_ids', [])
-    remove_ids = data.get('remove_ids', [])
+    add_ids, remove_ids = set(data.get('add_ids', [])), set(data.get('remove_ids', []))
+    requested = add_ids | remove_ids
 
-    for m_id in add_ids:
-        mech = Mechanic.query.get(m_id)
-        if mech and not ticket.mechanics.filter_by(id=m_id).first():
-            ticket.mechanics.append(mech)
+    #### one query resolves every id and whether it is already on the ticket
+    known, assigned = set(), set()
+    if requested:
+        rows = db.session.execute(
+            select(Mechanic.id, service_mechanics.c.ticket_id)
+            .outerjoin(service_mechanics, and_(
+                service_mechanics.c.mechanic_id == Mechanic.id,
+                service_mechanics.c.ticket_id == ticket_id
+            ))
+            .where(Mechanic.id.in_(requested))
+        )
+        for mech_id, linked in rows:
+            known.add(mech_id)
+            if linked is not None:
+                assigned.add(mech_id)
 
-    for m_id in remove_ids:
-        mech = Mechanic.query.get(m_id)
-        if mech and ticket.mechanics.filter_by(id=m_id).first():
-            ticket.mechanics.remove(mech)
+    #### removal wins for ids in both lists, as when adds ran before removes
+    to_add = (add_ids & known) - assigned - remove_ids
+    to_remove = remove_ids & assigned
 
+    if to_add or to_remove:
+        #### the mechanics list is part of the ticket's representation, so its ETag moves too
+        conflict = bump_version(ticket)
+        if conflict:
+            return conflict
+    if to_add:
+        db.session.execute(insert_ignore(service_mechanics).values([
+            {'ticket_id': ticket_id, 'mechanic_id': m_id} for m_id in sorted(to_add)
+        ]))
+    if to_remove:
+        db.session.execute(
+            delete(service_mechanics)
+            .where(service_mechanics.c.ticket_id == ticket_id)
+            .where(service_mechanics.c.mechanic_id.in_(to_remove))
+        )
+    response_cache.invalidate('tickets')
     db.session.commit()
-    return jsonify({'message': 'Ticket mechanics updated successfully'}), 200
+
+    return jsonify({
+        'message': 'Ticket mechanics updated successfully',
+        'added': sorted(to_add),
+        'already_present': sorted((add_ids & assigned) - remove_ids),
+        'removed': sorted(to_remove),
+        'not_assigned': sorted((remove_ids & known) - assigned),
+        'unknown': sorted(requested - known)
+    }), 200
 
 @service_tickets_bp.route('/<int:ticket_id>', methods=['DELETE'])
 @mechanic_required
@@ -296,6 +684,11 @@ def delete_ticket(current_mech_id, ticket_id):
     security:
       - bearerAuth: []
     parameters:
+      - in: header
+        name: If-Match
+        type: string
+        required: false
+        description: ETag from an earlier response; the delete is refused with 412 if the resource changed since
       - in: path
         name: ticket_id
         required: true
@@ -316,11 +709,25 @@ def delete_ticket(current_mech_id, ticket_id):
         examples:
           application/json:
             error: "ServiceTicket not found"
+      409:
+        description: Another request updated the resource first
+        schema:
+          $ref: "#/definitions/ErrorResponse"
+      412:
+        description: If-Match does not match the current version
+        schema:
+          $ref: "#/definitions/ErrorResponse"
     """
     ticket = ServiceTicket.query.get(ticket_id)
     if not ticket:
         return jsonify({'error': 'ServiceTicket not found'}), 404
+    failed = precondition_failed(ticket)
+    if failed is not None:
+        return failed
 
     db.session.delete(ticket)
-    db.session.commit()
+    response_cache.invalidate('tickets')
+    conflict = commit_versioned()
+    if conflict is not None:
+        return conflict
     return jsonify({'message': 'ServiceTicket deleted successfully'}), 200
@@ -1,9 +1,11 @@
 from datetime import date
-from marshmallow import fields, ValidationError
+from marshmallow import Schema, fields, ValidationError
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from mech.models import ServiceTicket
 from mech.blueprints.mechanics.schemas import MechanicSchema
 from mech.blueprints.customers.schemas import CustomerSchema
+from mech.utils.fast_dump import CompiledDump
+from mech.utils.fast_load import CompiledLoad
 
 class ServiceDateField(fields.Field):
     def _deserialize(self, value, attr, data, **kwargs):
@@ -50,6 +52,24 @@ class ServiceTicketSchema(SQLAlchemyAutoSchema):
             "customer",
             "mechanics",
         )
+        dump_only = ("id",)
+
+class BulkTicketSchema(ServiceTicketSchema):
+    #### defaults to the requesting mechanic when absent
+    mechanic_ids = fields.List(fields.Integer(strict=True))
+
+    class Meta(ServiceTicketSchema.Meta):
+        fields = ServiceTicketSchema.Meta.fields + ("mechanic_ids",)
+
+class TicketMechanicsEditSchema(Schema):
+    add_ids = fields.List(fields.Integer(strict=True))
+    remove_ids = fields.List(fields.Integer(strict=True))
 
 service_ticket_schema  = ServiceTicketSchema()
-service_tickets_schema = ServiceTicketSchema(many=True)
\ No newline at end of file
+service_tickets_schema = ServiceTicketSchema(many=True)
+dump_service_ticket  = CompiledDump(service_ticket_schema)
+dump_service_tickets = CompiledDump(service_tickets_schema)
+load_service_ticket        = CompiledLoad(service_ticket_schema)
+load_service_ticket_update = CompiledLoad(service_ticket_schema, partial=True)
+load_bulk_ticket           = CompiledLoad(BulkTicketSchema())
+load_ticket_mechanics_edit = CompiledLoad(TicketMechanicsEditSchema())
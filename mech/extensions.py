@@ -1,13 +1,44 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_marshmallow import Marshmallow
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_caching import Cache
+from mech.utils.token_cache import TokenCache
+from mech.utils.hashing import PasswordHasher
+from mech.utils.response_cache import ResponseCache
+from mech.utils.identity_cache import IdentityCache
+from mech.utils.sql_stats import SQLStats
+from mech.utils.metrics import Metrics
+from mech.utils.profiling import Profiler
+from mech.utils.read_router import ReadRouter, RoutingSession
+from mech.utils.warmup import Warmup
+#### also registers the sqlite:// limiter storage
+from mech.utils.ratelimit import application_limit, no_application_limit, request_cost
 
-db = SQLAlchemy()
-migrate = Migrate()
+#### RoutingSession only reroutes when read_router is configured with replicas
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 ma = Marshmallow()
 
-limiter = Limiter(key_func=get_remote_address)
-cache = Cache(config={'CACHE-TYPE': 'SimpleCache'})
\ No newline at end of file
+limiter = Limiter(
+    key_func=get_remote_address,
+    application_limits=[application_limit],
+    application_limits_exempt_when=no_application_limit,
+    application_limits_cost=request_cost,
+    headers_enabled=True
+)
+#### backend comes from CACHE_TYPE in the app config; constructor config would override it
+cache = Cache()
+response_cache = ResponseCache(cache)
+read_router = ReadRouter(cache)
+identity_cache = IdentityCache(response_cache)
+token_cache = TokenCache(response_cache)
+password_hasher = PasswordHasher()
+sql_stats = SQLStats()
+metrics = Metrics()
+profiler = Profiler()
+warmup = Warmup()
+
+def init_migrate(app):
+    #### alembic costs ~100ms to import and only the `flask db` commands need it
+    from flask_migrate import Migrate
+    Migrate(app, db)
@@ -1,5 +1,5 @@
 from .extensions import db
-from sqlalchemy import Table, Column, Integer, ForeignKey, String, Date
+from sqlalchemy import Table, Column, Integer, ForeignKey, String, Date, DDL, event, insert_sentinel
 from sqlalchemy.orm import relationship
 from datetime import date
 
@@ -23,6 +23,9 @@ class Inventory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
+    # optimistic concurrency: every ORM UPDATE/DELETE checks and bumps it (same on the models below)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
 
     tickets = relationship(
         "ServiceTicket",
@@ -31,6 +34,33 @@ class Inventory(db.Model):
         lazy="dynamic"
     )
 
+class InventoryChange(db.Model):
+    """Log of inventory writes, each tagged with the catalog version that committed it."""
+    __tablename__ = "inventory_changes"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # no FK: the row outlives the part when it records a delete
+    part_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, index=True)
+
+class CatalogVersion(db.Model):
+    """Single-row catalog version counter.
+
+    Writers bump it inside their transaction and hold its row lock until
+    commit, so versions are handed out in commit order.
+    """
+    __tablename__ = "catalog_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    # InventoryChange rows up to this version have been pruned
+    pruned_through = db.Column(db.Integer, nullable=False, default=0)
+
+event.listen(
+    CatalogVersion.__table__, "after_create",
+    DDL("INSERT INTO catalog_version (id, value, pruned_through) VALUES (1, 0, 0)")
+)
+
 class Customer(db.Model):
     __tablename__ = "customers"
 
@@ -39,6 +69,8 @@ class Customer(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False)
     phone = db.Column(db.String(20), nullable=False)
     password = db.Column(db.String(255), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
 
     tickets = relationship(
         "ServiceTicket",
@@ -55,6 +87,17 @@ class ServiceTicket(db.Model):
     service_date = db.Column(db.Date, nullable=False)
     service_desc = db.Column(db.String(255), nullable=False)
     customer_id = db.Column(db.Integer, ForeignKey("customers.id"), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
+    # Lets a bulk INSERT ... RETURNING match ids to rows in one batched
+    # statement on SQLite, which can't order RETURNING by itself
+    _sentinel = insert_sentinel("_sentinel")
+
+    # Keyset pagination walks tickets in (service_date, id) order
+    __table_args__ = (
+        db.Index("ix_service_tickets_service_date_id", "service_date", "id"),
+    )
 
     customer = relationship("Customer", back_populates="tickets")
 
@@ -81,6 +124,8 @@ class Mechanic(db.Model):
     password = db.Column(db.String(255), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
     salary = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
 
     # Renamed relationship to service_tickets to match route logic
     service_tickets = relationship(
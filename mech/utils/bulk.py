@@ -0,0 +1,40 @@
+from sqlalchemy import insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from mech.extensions import db
+
+
+def insert_ignore(table):
+    """INSERT that silently skips rows hitting a unique/primary key conflict.
+
+    ON CONFLICT DO NOTHING on SQLite and PostgreSQL, INSERT IGNORE on MySQL.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect in ('mysql', 'mariadb'):
+        return mysql.insert(table).prefix_with('IGNORE')
+    return insert(table)
+
+
+def insert_rows_returning_ids(table, rows):
+    """INSERT of ``rows`` into ``table``; new primary keys in row order.
+
+    With RETURNING (SQLite 3.35+, PostgreSQL) SQLAlchemy batches the rows into
+    multi-VALUES statements, but only when it can match the returned ids back
+    to the rows: on SQLite that needs an insert sentinel column
+    (``insert_sentinel()``, as ``ServiceTicket`` has), and without one it
+    sends one INSERT per row. Backends without RETURNING (MySQL) run one
+    INSERT per row inside the same transaction, reading back lastrowid.
+    """
+    pk = table.primary_key.columns.values()[0]
+    dialect = db.session.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        stmt = insert(table).returning(pk, sort_by_parameter_order=True)
+        return list(db.session.scalars(stmt, rows))
+    return [
+        db.session.execute(insert(table), row).inserted_primary_key[0]
+        for row in rows
+    ]
+
@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.orm import Session
+from mech.extensions import db
+from mech.models import CatalogVersion, Inventory, InventoryChange
+from mech.utils.rows import InventoryRow
+
+
+def _serialize(parts):
+    """Part id -> JSON text for each of ``parts``."""
+    #### imported here: the inventory blueprint's routes import this module
+    from mech.blueprints.inventory.schemas import dump_inventory
+    return {p.id: json.dumps(dump_inventory(p), separators=(',', ':'), sort_keys=True) for p in parts}
+
+
+class CatalogSnapshot:
+    """The inventory at one version, each part already serialized, in id order."""
+
+    def __init__(self, version, parts_json, built_at):
+        self.version = version
+        self.parts_json = parts_json                  # part id -> JSON text
+        self.ids = sorted(parts_json)
+        self.body = ('[' + ','.join(parts_json[i] for i in self.ids) + ']').encode()
+        self.built_at = built_at
+
+    def page(self, page, per_page):
+        start = (page - 1) * per_page
+        ids = self.ids[start:start + per_page]
+        return '[' + ','.join(self.parts_json[i] for i in ids) + ']'
+
+
+class InventoryCatalog:
+    """Versioned, pre-serialized snapshot of the inventory, kept per app.
+
+    Every ORM write to ``Inventory`` bumps the ``CatalogVersion`` counter and
+    logs the parts it touched as ``InventoryChange`` rows tagged with the new
+    version, all in the same transaction. The counter's row lock is held
+    until commit, so versions are handed out in commit order. Once version V
+    is visible, every change up to V has committed, and a ``since`` delta
+    can never miss one. ``snapshot()`` costs one primary-key lookup while
+    nothing has changed. Once the version moves, only the parts named in the
+    new log rows are re-read and re-serialized. Writes that bypass the ORM
+    are not logged, so the snapshot is also rebuilt from scratch every
+    ``CATALOG_REBUILD_SECONDS``.
+
+    The log keeps the last ``CATALOG_CHANGE_LOG_VERSIONS`` versions. A
+    ``since`` older than that gets the whole catalog, flagged as full.
+
+    Catalog reads go to the primary even on a GET: a lagging replica would
+    report an older version than clients already hold, and the shared
+    snapshot would be rebuilt backwards to it.
+    """
+
+    def _state(self):
+        return current_app.extensions.setdefault(
+            'inventory_catalog', {'snapshot': None, 'lock': threading.Lock()}
+        )
+
+    @staticmethod
+    def current_version():
+        return db.session.scalar(select(CatalogVersion.value).where(CatalogVersion.id == 1)) or 0
+
+    @staticmethod
+    def pruned_through():
+        return db.session.scalar(select(CatalogVersion.pruned_through).where(CatalogVersion.id == 1)) or 0
+
+    def snapshot(self):
+        from mech.extensions import read_router
+        read_router.use_primary()
+        state = self._state()
+        version = self.current_version()
+        snap = state['snapshot']
+        if snap is not None and snap.version == version and not self._expired(snap):
+            return snap
+        with state['lock']:
+            snap = state['snapshot']
+            if snap is None or self._expired(snap) or version < snap.version:
+                snap = self._build(version)
+            elif snap.version != version:
+                snap = self._apply(snap, version)
+            state['snapshot'] = snap
+        return snap
+
+    def _expired(self, snap):
+        return time.monotonic() - snap.built_at > current_app.config.get('CATALOG_REBUILD_SECONDS', 300)
+
+    def _build(self, version):
+        parts = InventoryRow.load(InventoryRow.select())
+        return CatalogSnapshot(version, _serialize(parts), time.monotonic())
+
+    def _apply(self, snap, version):
+        touched = self.changed_ids(snap.version, version)
+        parts_json = dict(snap.parts_json)
+        for part_id in touched:
+            parts_json.pop(part_id, None)
+        if touched:
+            parts_json.update(_serialize(InventoryRow.load(InventoryRow.select().where(Inventory.id.in_(touched)))))
+        return CatalogSnapshot(version, parts_json, snap.built_at)
+
+    @staticmethod
+    def changed_ids(since, until):
+        return set(db.session.scalars(
+            select(InventoryChange.part_id)
+            .where(InventoryChange.version > since, InventoryChange.version <= until)
+            .distinct()
+        ))
+
+    def delta(self, snap, since):
+        """(changed parts, deleted ids, full) between version ``since`` and ``snap``.
+
+        ``full`` means the log no longer reaches back to ``since``: every part
+        is returned and the client should replace its copy.
+        """
+        if since > 0:
+            touched = sorted(self.changed_ids(since, snap.version))
+            #### read after the log, so a prune that raced the read is seen
+            if since >= self.pruned_through():
+                changed = [snap.parts_json[i] for i in touched if i in snap.parts_json]
+                deleted = [i for i in touched if i not in snap.parts_json]
+                return changed, deleted, False
+        return [snap.parts_json[i] for i in snap.ids], [], True
+
+    def _after_flush(self, session, flush_context):
+        rows = [{'part_id': obj.id} for obj in (*session.new, *session.deleted)
+                if isinstance(obj, Inventory)]
+        rows += [{'part_id': obj.id} for obj in session.dirty
+                 if isinstance(obj, Inventory) and session.is_modified(obj, include_collections=False)]
+        if not rows:
+            return
+        conn = session.connection()
+        #### the UPDATE takes the counter's row lock until this transaction ends
+        counter = CatalogVersion.__table__
+        conn.execute(update(counter).where(counter.c.id == 1).values(value=counter.c.value + 1))
+        version, pruned = conn.execute(
+            select(counter.c.value, counter.c.pruned_through).where(counter.c.id == 1)
+        ).one()
+        conn.execute(insert(InventoryChange), [dict(row, version=version) for row in rows])
+
+        keep = current_app.config.get('CATALOG_CHANGE_LOG_VERSIONS') if has_app_context() else None
+        if keep and version - keep > pruned:
+            conn.execute(delete(InventoryChange).where(InventoryChange.version <= version - keep))
+            conn.execute(update(counter).where(counter.c.id == 1).values(pruned_through=version - keep))
+
+    def listen(self):
+        event.listen(Session, 'after_flush', self._after_flush)
+
+
+inventory_catalog = InventoryCatalog()
+inventory_catalog.listen()
@@ -0,0 +1,44 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class OnCommit:
+    """Items gathered during a session's transaction, handed to ``apply`` once it commits.
+
+    Items wait in ``session.info[key]``, in a ``factory()`` container (a set
+    by default; a ``Counter`` sums deltas), so a rollback just drops them and
+    nothing acts on a write that never happened. ``collect(session)``, if
+    given, runs after every flush and returns what that flush produced (e.g.
+    the rows it wrote); ``add`` queues items directly.
+    """
+
+    def __init__(self, key, apply, collect=None, factory=set):
+        self.key = key
+        self.apply = apply
+        self.collect = collect
+        self.factory = factory
+
+    def add(self, session, items):
+        session.info.setdefault(self.key, self.factory()).update(items)
+
+    def listen(self):
+        """Install the session hooks; calling it again (e.g. from every ``init_app``) is a no-op."""
+        if event.contains(Session, 'after_commit', self._after_commit):
+            return
+        if self.collect is not None:
+            event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        items = self.collect(session)
+        if items:
+            self.add(session, items)
+
+    def _after_commit(self, session):
+        items = session.info.pop(self.key, None)
+        if items:
+            self.apply(items)
+
+    def _after_rollback(self, session):
+        session.info.pop(self.key, None)
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from itertools import groupby
+from sqlalchemy import select, exists
+from mech.extensions import db
+from mech.models import ServiceTicket, service_mechanics
+
+EXPORT_FIELDS = ('id', 'vin', 'service_date', 'service_desc', 'customer_id', 'mechanic_ids')
+
+
+def ticket_export_query(start=None, end=None, customer_id=None, mechanic_id=None):
+    """Tickets left-joined to their mechanic links, one row per (ticket, mechanic), in id order."""
+    stmt = (
+        select(
+            ServiceTicket.id,
+            ServiceTicket.vin,
+            ServiceTicket.service_date,
+            ServiceTicket.service_desc,
+            ServiceTicket.customer_id,
+            service_mechanics.c.mechanic_id
+        )
+        .outerjoin(service_mechanics, service_mechanics.c.ticket_id == ServiceTicket.id)
+        .order_by(ServiceTicket.id, service_mechanics.c.mechanic_id)
+    )
+    if start is not None:
+        stmt = stmt.where(ServiceTicket.service_date >= start)
+    if end is not None:
+        stmt = stmt.where(ServiceTicket.service_date <= end)
+    if customer_id is not None:
+        stmt = stmt.where(ServiceTicket.customer_id == customer_id)
+    if mechanic_id is not None:
+        #### filter tickets, not join rows, so the other mechanics still come through
+        assigned = service_mechanics.alias()
+        stmt = stmt.where(exists().where(
+            assigned.c.ticket_id == ServiceTicket.id,
+            assigned.c.mechanic_id == mechanic_id
+        ))
+    return stmt
+
+
+def iter_tickets(stmt, batch_size):
+    """Yield one dict per ticket from a server-side cursor, ``batch_size`` rows at a time.
+
+    A single streaming query with the links joined in means no second query
+    runs while the cursor is open (MySQL's unbuffered cursors forbid that),
+    and only the ticket being assembled is held in memory.
+    """
+    result = db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for ticket_id, rows in groupby(result, key=lambda row: row.id):
+        first = next(rows)
+        mechanic_ids = [first.mechanic_id] if first.mechanic_id is not None else []
+        mechanic_ids.extend(row.mechanic_id for row in rows)
+        yield {
+            'id': ticket_id,
+            'vin': first.vin,
+            'service_date': first.service_date.isoformat(),
+            'service_desc': first.service_desc,
+            'customer_id': first.customer_id,
+            'mechanic_ids': mechanic_ids
+        }
+
+
+def _chunks(lines, chunk_lines):
+    #### batch many small lines per write so the WSGI server isn't flushed per row
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk_lines:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def ndjson_stream(tickets, chunk_lines=500):
+    return _chunks(
+        (json.dumps(t, separators=(',', ':')) + '\n' for t in tickets),
+        chunk_lines
+    )
+
+
+def csv_stream(tickets, chunk_lines=500):
+    def lines():
+        out = io.StringIO()
+        writer = csv.writer(out)
+
+        def render(values):
+            out.seek(0)
+            out.truncate()
+            writer.writerow(values)
+            return out.getvalue()
+
+        yield render(EXPORT_FIELDS)
+        for t in tickets:
+            yield render([
+                t['id'], t['vin'], t['service_date'], t['service_desc'], t['customer_id'],
+                ' '.join(map(str, t['mechanic_ids']))
+            ])
+    return _chunks(lines(), chunk_lines)
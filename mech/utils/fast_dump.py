@@ -0,0 +1,109 @@
+import weakref
+from marshmallow import Schema, fields, missing
+from marshmallow.schema import POST_DUMP, PRE_DUMP
+from marshmallow.utils import ensure_text_type
+
+#### value expressions for the field types the blueprints' schemas use; anything
+#### else goes through the field's own serialize(), so the output never differs
+_NUMBERS = (fields.Integer, fields.Float)
+
+
+def _value_expr(field, nested):
+    kind = type(field)
+    if kind in _NUMBERS and not field.as_string:
+        return f'None if value is None else {field.num_type.__name__}(value)'
+    if kind is fields.String:
+        return 'None if value is None else (value if value.__class__ is str else ensure_text_type(value))'
+    if isinstance(field, fields.Nested) and kind._serialize is fields.Nested._serialize:
+        return f'None if value is None else {nested}(value, many={bool(field.schema.many or field.many)})'
+    if kind._serialize is fields.Field._serialize:
+        return 'value'
+    return None
+
+
+def _compile(schema):
+    """Source-generate ``dump(obj, many)`` for ``schema``; None if it has dump hooks or a custom dict class."""
+    if schema._hooks[PRE_DUMP] or schema._hooks[POST_DUMP] or schema.dict_class is not dict:
+        return None
+    custom_accessor = type(schema).get_attribute is not Schema.get_attribute
+    namespace = {'missing': missing, 'ensure_text_type': ensure_text_type, 'reference': schema.dump,
+                 'get_attribute': schema.get_attribute}
+    lines = ['def dump_one(obj):']
+    if not custom_accessor:
+        #### marshmallow tries obj[key] first on anything subscriptable; leave those to it
+        lines += ["    if hasattr(obj, '__getitem__'):", '        return reference(obj, many=False)']
+    lines.append('    out = {}')
+    for i, (attr_name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key if field.data_key is not None else attr_name
+        name, nested = f'field_{i}', f'nested_{i}'
+        namespace[name] = field
+        if isinstance(field, fields.Nested):
+            namespace[nested] = CompiledDump(field.schema)
+        expr = _value_expr(field, nested)
+        source = field.attribute or attr_name
+        if expr is not None and field._CHECK_ATTRIBUTE and field.dump_default is missing and '.' not in source:
+            if type(field).get_value is not fields.Field.get_value:
+                get = f'{name}.get_value(obj, {attr_name!r}, accessor=get_attribute)'
+            elif custom_accessor:
+                get = f'get_attribute(obj, {source!r}, missing)'
+            else:
+                get = f'getattr(obj, {source!r}, missing)'
+            lines += [f'    value = {get}',
+                      '    if value is not missing:',
+                      f'        out[{key!r}] = {expr}']
+        else:
+            lines += [f'    value = {name}.serialize({attr_name!r}, obj, accessor=get_attribute)',
+                      '    if value is not missing:',
+                      f'        out[{key!r}] = value']
+    lines += ['    return out',
+              '',
+              'def dump(obj, many):',
+              '    if many and obj is not None:',
+              '        return [dump_one(o) for o in obj]',
+              '    return dump_one(obj)']
+    exec(compile('\n'.join(lines), f'<fast_dump {type(schema).__name__}>', 'exec'), namespace)
+    return namespace['dump']
+
+
+class CompiledDump:
+    """``schema.dump`` compiled into one generated function, with the same output.
+
+    Marshmallow resolves accessors, defaults and per-field ``serialize``
+    calls for every field of every row. The generated function reads each
+    attribute straight off the object and converts it inline. Integer,
+    Float, String, Nested and pass-through fields such as
+    ``ServiceDateField`` are handled this way. Any other field keeps its own
+    ``serialize``. Overrides are still called: a field's own ``get_value``
+    and a schema's ``get_attribute``. Subscriptable objects, and schemas
+    with dump hooks, go to marshmallow.
+    The function is built on the first call, once nested schemas named by
+    string resolve, or earlier by ``compile_all`` (worker warmup).
+
+    Each blueprint's schemas module wraps its schemas as ``dump_<name>``,
+    which views call instead of ``<name>_schema.dump``.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._dump = None
+        _instances.add(self)
+
+    def compile(self):
+        if self._dump is None:
+            self._dump = _compile(self.schema) or (lambda obj, many: self.schema.dump(obj, many=many))
+        return self._dump
+
+    def __call__(self, obj, *, many=None):
+        dump = self._dump or self.compile()
+        return dump(obj, self.schema.many if many is None else bool(many))
+
+
+_instances = weakref.WeakSet()
+
+
+def compile_all():
+    """Build every ``CompiledDump``'s function now; returns how many there are."""
+    instances = list(_instances)
+    for dump in instances:
+        dump.compile()
+    return len(instances)
@@ -0,0 +1,127 @@
+from flask import jsonify
+from marshmallow import RAISE, ValidationError, fields, missing, validate
+from marshmallow.decorators import POST_LOAD, PRE_LOAD, VALIDATES, VALIDATES_SCHEMA
+
+#### conditions under which the field's own deserialize() would hand the value
+#### back unchanged; anything else goes through deserialize() for the real
+#### conversion or error, so the result never differs from marshmallow's
+_EXACT = {
+    fields.Integer: 'value.__class__ is int',
+    fields.String: 'value.__class__ is str',
+}
+
+
+def _condition(field):
+    kind = type(field)
+    if kind is fields.Float:
+        check = 'value.__class__ is float'
+        if not field.allow_nan:
+            check += ' and value - value == 0.0'
+    elif kind is fields.List and type(field.inner) is fields.Integer:
+        check = 'value.__class__ is list and all(v.__class__ is int for v in value)'
+    elif kind in _EXACT:
+        check = _EXACT[kind]
+    else:
+        return None
+    for validator in field.validators:
+        if type(validator) is not validate.Length:
+            return None
+        if validator.equal is not None:
+            check += f' and len(value) == {validator.equal}'
+        if validator.min is not None:
+            check += f' and len(value) >= {validator.min}'
+        if validator.max is not None:
+            check += f' and len(value) <= {validator.max}'
+    return check
+
+
+def _plain(schema):
+    """True if ``schema.load`` is just its fields: no hooks, defaults or dotted attributes."""
+    hooks = schema._hooks
+    post_load = [name for name, *_ in hooks[POST_LOAD]]
+    #### marshmallow-sqlalchemy's make_instance passes the dict through without load_instance
+    if post_load and (post_load != ['make_instance'] or getattr(schema, '_load_instance', True)):
+        return False
+    if hooks[PRE_LOAD] or hooks[VALIDATES] or hooks[VALIDATES_SCHEMA]:
+        return False
+    if schema.many or schema.unknown != RAISE or schema.dict_class is not dict:
+        return False
+    return all(field.load_default is missing and '.' not in (field.attribute or name)
+               for name, field in schema.load_fields.items())
+
+
+def _compile(schema, partial):
+    """Source-generate ``load(data)`` for ``schema``; None if it needs marshmallow's full load."""
+    if not _plain(schema):
+        return None
+    namespace = {'missing': missing, 'ValidationError': ValidationError,
+                 'reference': lambda data: schema.load(data, partial=partial),
+                 'unknown': schema.error_messages['unknown']}
+    known = []
+    lines = ['def load(data):',
+             '    if data.__class__ is not dict:',
+             '        return reference(data)',
+             '    out = {}',
+             '    errors = {}']
+    for i, (attr_name, field) in enumerate(schema.load_fields.items()):
+        key = field.data_key if field.data_key is not None else attr_name
+        target = field.attribute or attr_name
+        name = f'field_{i}'
+        namespace[name] = field
+        known.append(key)
+        lines += [f'    value = data.get({key!r}, missing)',
+                  '    if value is missing:']
+        if field.required and not partial:
+            namespace[f'required_{i}'] = field.error_messages['required']
+            lines.append(f'        errors[{key!r}] = [required_{i}]')
+        else:
+            lines.append('        pass')
+        check = _condition(field)
+        if check is not None:
+            lines += [f'    elif {check}:',
+                      f'        out[{target!r}] = value']
+        lines += ['    else:',
+                  '        try:',
+                  f'            out[{target!r}] = {name}.deserialize(value, {key!r}, data)',
+                  '        except ValidationError as error:',
+                  f'            errors[{key!r}] = error.messages']
+    namespace['known'] = frozenset(known)
+    lines += ['    if not known.issuperset(data):',
+              '        for key in data:',
+              '            if key not in known:',
+              '                errors[key] = [unknown]',
+              '    if errors:',
+              '        raise ValidationError(errors, data=data, valid_data=out)',
+              '    return out']
+    exec(compile('\n'.join(lines), f'<fast_load {type(schema).__name__}>', 'exec'), namespace)
+    return namespace['load']
+
+
+class CompiledLoad:
+    """``schema.load(data, partial=partial)`` compiled into one generated function.
+
+    Same result and same ``ValidationError.messages`` as marshmallow for
+    every input. Unknown keys (dump-only fields included) are rejected, and
+    so are missing required fields unless ``partial``. A value that is
+    already exactly what its field would return (an int for ``Integer``, a
+    ``str`` within its ``Length`` for ``String``, and so on) is taken as it
+    is. Any other value goes through the field's ``deserialize``. Schemas
+    with load hooks, load defaults or ``many`` use marshmallow. Built when
+    the schema module is imported, so requests never pay for it.
+
+    Each blueprint's schemas module wraps the schemas its write endpoints
+    accept as ``load_<name>``, which views call to validate request bodies.
+    """
+
+    def __init__(self, schema, partial=False):
+        self.schema = schema
+        self.partial = partial
+        self._load = _compile(schema, partial) or (lambda data: schema.load(data, partial=partial))
+
+    def __call__(self, data):
+        return self._load(data)
+
+
+def validation_failed(error):
+    """400 response for a ``ValidationError`` raised while loading a request body."""
+    return jsonify({'error': 'Invalid request body', 'fields': error.messages}), 400
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, jsonify
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+DEFAULT_SCRYPT = (2 ** 15, 8, 1)
+
+
+class HashingBusy(Exception):
+    """Every hashing slot stayed busy for longer than PASSWORD_HASH_QUEUE_TIMEOUT."""
+
+
+def canonical_method(method):
+    """Spell out werkzeug's defaults so a method compares equal to a stored hash prefix."""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else DEFAULT_SCRYPT
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f"Invalid hash method '{method}'.")
+
+
+class _HasherState:
+    def __init__(self, method, pool_size, max_concurrency, queue_timeout):
+        self.method = canonical_method(method)
+        self.pool_size = pool_size
+        self.queue_timeout = queue_timeout
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def executor(self):
+        #### pools don't survive fork: each gunicorn worker builds its own on first use
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+            self._pid = os.getpid()
+        return self._executor
+
+    def run(self, fn, *args, **kwargs):
+        with self._lock:
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+        started = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            self.wait_seconds += time.perf_counter() - started
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+        if not acquired:
+            raise HashingBusy()
+
+        try:
+            if self.pool_size:
+                return self.executor().submit(fn, *args, **kwargs).result()
+            return fn(*args, **kwargs)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+
+class PasswordHasher:
+    """Password hashing off the request thread, with a cap on concurrent hashes.
+
+    With ``PASSWORD_HASH_POOL_SIZE`` > 0 hashes run in a process pool, so a
+    login burst burns pool CPU instead of holding the GIL in the worker. At
+    most ``PASSWORD_HASH_MAX_CONCURRENCY`` hashes run at once; callers queue
+    for a slot up to ``PASSWORD_HASH_QUEUE_TIMEOUT`` seconds and then get a
+    503. ``PASSWORD_HASH_METHOD`` sets the cost for new hashes, and
+    ``needs_rehash`` flags stored hashes made with anything else.
+    """
+
+    def init_app(self, app):
+        pool_size = app.config.get('PASSWORD_HASH_POOL_SIZE', 0)
+        app.extensions['password_hasher'] = _HasherState(
+            method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+            pool_size=pool_size,
+            max_concurrency=app.config.get('PASSWORD_HASH_MAX_CONCURRENCY', pool_size or 4),
+            queue_timeout=app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5)
+        )
+        app.register_error_handler(HashingBusy, self._busy)
+
+    @staticmethod
+    def _busy(e):
+        return jsonify({'error': 'Server busy, retry shortly'}), 503, {'Retry-After': '1'}
+
+    @property
+    def _state(self):
+        return current_app.extensions['password_hasher']
+
+    def hash(self, password):
+        state = self._state
+        return state.run(generate_password_hash, password, method=state.method)
+
+    def verify(self, pwhash, password):
+        return self._state.run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self._state.method
+
+    def stats(self):
+        state = self._state
+        return {
+            'waiting': state.waiting,
+            'peak_waiting': state.peak_waiting,
+            'in_flight': state.in_flight,
+            'max_concurrency': state.max_concurrency,
+            'completed': state.completed,
+            'rejected': state.rejected,
+            'wait_seconds': state.wait_seconds
+        }
@@ -0,0 +1,124 @@
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+from mech.utils.deferred import OnCommit
+from mech.utils.lru import ExpiringLRU
+
+#### model name -> (max rows, seconds); IDENTITY_CACHE in the config overrides it
+DEFAULT_LIMITS = {
+    'Mechanic': (1024, 60),
+    'Customer': (4096, 60),
+    'Inventory': (4096, 300),
+}
+
+
+class IdentityCache:
+    """Per-app LRU/TTL cache of rows by primary key, for ``Mechanic``, ``Customer`` and ``Inventory``.
+
+    ``get(Model, id)`` stands in for ``Model.query.get(id)``: on a hit the
+    instance is rebuilt from the cached column values and attached to the
+    session as persistent, with no SELECT. Rows are kept in each worker's
+    memory, but every row also has a version token in the shared app cache
+    (the response cache's tags), and an entry is only served while its token
+    is current. Committed ORM writes (collected in ``after_flush``, applied in
+    ``after_commit``) drop the local entry and move the token on, so a write in
+    any worker reaches them all. ``version`` is cached with the row, so an
+    update built on a row that went stale anyway still fails its version check
+    rather than overwriting. Limits per model come from ``IDENTITY_CACHE``
+    (``{'Mechanic': (size, ttl), ...}``); a size of 0 or ``IDENTITY_CACHE = {}``
+    turns caching off.
+    """
+
+    SESSION_KEY = 'identity_cache_rows'
+
+    def __init__(self, response_cache):
+        self.tags = response_cache
+        self._written = OnCommit(self.SESSION_KEY, self._drop, collect=self._collect)
+
+    def init_app(self, app):
+        limits = app.config.get('IDENTITY_CACHE', DEFAULT_LIMITS)
+        app.extensions['identity_cache'] = {
+            name: ExpiringLRU(size, ttl) for name, (size, ttl) in limits.items() if size
+        }
+        self._written.listen()
+
+    @staticmethod
+    def _tag(table, id):
+        return f'row:{table}:{id}'
+
+    def get(self, model, id, session=None):
+        """The ``model`` row with primary key ``id``, or None."""
+        if session is None:
+            from mech.extensions import db
+            session = db.session()
+        lru = current_app.extensions['identity_cache'].get(model.__name__)
+        if lru is None or not isinstance(id, int):
+            return session.get(model, id)
+
+        #### rows this session already holds win: they may carry its own changes
+        obj = session.identity_map.get(identity_key(model, id))
+        if obj is not None:
+            return obj
+
+        tag = self._tag(model.__tablename__, id)
+        entry = lru.get(id, time.monotonic())
+        if entry is not None:
+            row, token = entry
+            if self.tags.versions([tag])[0] == token:
+                lru.hits += 1
+                obj = model(**row)
+                make_transient_to_detached(obj)
+                session.add(obj)
+                return obj
+            lru.discard(id)
+
+        lru.misses += 1
+        #### read the token before the row: a write committing in between
+        #### leaves the entry under the old token, never the new one
+        token = self.tags.versions([tag])[0]
+        from mech.extensions import read_router
+        read_router.use_primary_if_changed([token])
+        obj = session.get(model, id)
+        if obj is not None:
+            state = inspect(obj)
+            row = {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs}
+            lru.put(id, (row, token), time.monotonic() + lru.ttl)
+        return obj
+
+    @staticmethod
+    def _collect(session):
+        if not has_app_context() or 'identity_cache' not in current_app.extensions:
+            return None
+        cached = current_app.extensions['identity_cache']
+        written = [obj for obj in session.deleted if type(obj).__name__ in cached]
+        written += [obj for obj in session.dirty if type(obj).__name__ in cached
+                    and session.is_modified(obj, include_collections=False)]
+        return [(type(obj).__name__, obj.__tablename__, obj.id) for obj in written]
+
+    def _drop(self, rows):
+        if not has_app_context() or 'identity_cache' not in current_app.extensions:
+            return
+        cached = current_app.extensions['identity_cache']
+        for name, _, id in rows:
+            cached[name].discard(id)
+        self.tags.bump([self._tag(table, id) for _, table, id in rows])
+
+    def clear(self):
+        for lru in current_app.extensions['identity_cache'].values():
+            lru.clear()
+
+    def stats(self):
+        stats = {}
+        for name, lru in current_app.extensions['identity_cache'].items():
+            lookups = lru.hits + lru.misses
+            stats[name] = {
+                'hits': lru.hits,
+                'misses': lru.misses,
+                'hit_rate': lru.hits / lookups if lookups else 0.0,
+                'size': len(lru),
+                'maxsize': lru.maxsize,
+                'ttl': lru.ttl
+            }
+        return stats
@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+
+
+class ExpiringLRU:
+    """Thread-safe LRU of at most ``maxsize`` entries, each also dropped once past its expiry.
+
+    Expiry is a ``time.monotonic()`` deadline given to ``put`` (``ttl`` seconds
+    from now unless the caller knows better). ``hits`` and ``misses`` are left
+    for the owner to count, since it decides what a hit is.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now):
+        """The live value for ``key``, or None; an expired entry is removed."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires_at)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
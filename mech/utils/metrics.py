@@ -0,0 +1,299 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from flask import Response, current_app, g, has_app_context, request, request_finished, request_started
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#### name -> (type, help)
+METRICS = {
+    'mech_http_requests_total': ('counter', 'Finished requests by route, method and status.'),
+    'mech_http_request_duration_seconds': ('histogram', 'Request latency by route; sum by blueprint for per-blueprint figures.'),
+    'mech_http_requests_in_flight': ('gauge', 'Requests being handled right now.'),
+    'mech_db_pool_checkouts_total': ('counter', 'Connections handed out by the pool.'),
+    'mech_db_pool_wait_seconds': ('histogram', 'Time a session waited for its connection.'),
+    'mech_db_pool_checked_out': ('gauge', 'Connections currently checked out.'),
+    'mech_db_pool_overflow': ('gauge', 'Connections open beyond pool_size.'),
+    'mech_db_pool_size': ('gauge', 'Configured pool_size.'),
+    'mech_cache_hits_total': ('counter', 'Cache hits by cache.'),
+    'mech_cache_misses_total': ('counter', 'Cache misses by cache.'),
+    'mech_cache_evictions_total': ('counter', 'Entries evicted from the shared-memory cache.'),
+    'mech_cache_rejected_total': ('counter', 'Values too large for any shared-memory cache slot.'),
+    'mech_password_hash_total': ('counter', 'Password hashes by outcome.'),
+    'mech_password_hash_wait_seconds_total': ('counter', 'Time spent queueing for a password hash slot.'),
+    'mech_password_hash_waiting': ('gauge', 'Requests queueing for a password hash slot.'),
+}
+
+
+def _labels(**labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Registry:
+    """One process's samples: counters, gauges and histograms keyed by (name, labels)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counters = defaultdict(float)
+        self.gauges = defaultdict(float)
+        self.histograms = {}     # key -> [per-bucket counts (last one is +Inf), sum, count]
+        self.lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1.0):
+        with self.lock:
+            self.counters[(name, labels)] += amount
+
+    def add(self, name, labels, amount):
+        with self.lock:
+            self.gauges[(name, labels)] += amount
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            hist = self.histograms.get((name, labels))
+            if hist is None:
+                hist = self.histograms[(name, labels)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            hist[0][bisect_left(self.buckets, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[n, list(l), v] for (n, l), v in self.counters.items()],
+                'gauges': [[n, list(l), v] for (n, l), v in self.gauges.items()],
+                'histograms': [[n, list(l), list(h[0]), h[1], h[2]] for (n, l), h in self.histograms.items()],
+            }
+
+
+class Metrics:
+    """Prometheus text metrics at ``/metrics``: per-route latency, status, pool and cache figures.
+
+    Each request costs a lock-guarded dict update and a bisect. Figures read
+    off other components (pool state, cache hit counters) are only gathered
+    when a snapshot is taken.
+
+    Under gunicorn every worker keeps its own samples, so set ``METRICS_DIR``
+    to a directory shared by the workers (clear it when the server starts):
+    each worker writes its snapshot there at most every
+    ``METRICS_FLUSH_SECONDS``, and whichever worker answers the scrape sums
+    the files. Counters and histograms of workers that have exited are kept,
+    so totals never go backwards. Their gauges are dropped. Without
+    ``METRICS_DIR`` the endpoint reports the answering process only.
+    ``METRICS_ENABLED = False`` turns it all off.
+    """
+
+    def __init__(self):
+        self.registry = _Registry(DEFAULT_BUCKETS)
+        self._file = None
+        self._next_flush = 0.0
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        #### a forked worker starts from zero, not from what the master counted before forking
+        self.registry = _Registry(self.registry.buckets)
+        self._file = None
+        self._next_flush = 0.0
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self.registry.buckets = tuple(app.config.get('METRICS_BUCKETS', DEFAULT_BUCKETS))
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        request_started.connect(self._request_started, app)
+        request_finished.connect(self._request_finished, app)
+        if not event.contains(Session, 'after_transaction_create', self._transaction_created):
+            event.listen(Session, 'after_transaction_create', self._transaction_created)
+            event.listen(Session, 'after_begin', self._connection_acquired)
+        with app.app_context():
+            from mech.extensions import db
+            for bind, engine in db.engines.items():
+                labels = _labels(bind=bind or 'default')
+                event.listen(engine, 'checkout',
+                             lambda *args, labels=labels: self.registry.inc('mech_db_pool_checkouts_total', labels))
+
+    #### requests
+
+    def _request_started(self, sender, **extra):
+        g._metrics_started = time.perf_counter()
+        self.registry.add('mech_http_requests_in_flight', (), 1)
+
+    def _request_finished(self, sender, response, **extra):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        registry = self.registry
+        endpoint = request.endpoint or 'none'
+        blueprint = request.blueprint or ''
+        registry.add('mech_http_requests_in_flight', (), -1)
+        registry.observe('mech_http_request_duration_seconds',
+                         _labels(blueprint=blueprint, endpoint=endpoint), time.perf_counter() - started)
+        registry.inc('mech_http_requests_total', _labels(
+            blueprint=blueprint, endpoint=endpoint, method=request.method, status=response.status_code))
+        if current_app.config.get('METRICS_DIR') and time.monotonic() >= self._next_flush:
+            self.flush()
+
+    #### connection waits: a session's outermost transaction is created right
+    #### before it asks the pool for a connection, and after_begin fires once it has one
+
+    @staticmethod
+    def _transaction_created(session, transaction):
+        if transaction.parent is None:
+            session.info['metrics_begin'] = time.perf_counter()
+
+    def _connection_acquired(self, session, transaction, connection):
+        started = session.info.pop('metrics_begin', None)
+        if started is not None:
+            self.registry.observe('mech_db_pool_wait_seconds', (), time.perf_counter() - started)
+
+    #### snapshots
+
+    def _collect(self):
+        """Samples read off other components: (counters, gauges) as [name, labels, value] lists."""
+        from mech.extensions import cache, db, identity_cache, password_hasher, response_cache, token_cache
+        counters, gauges = [], []
+
+        for bind, engine in db.engines.items():
+            labels = list(_labels(bind=bind or 'default'))
+            pool = engine.pool
+            for name, method in (('mech_db_pool_checked_out', 'checkedout'),
+                                 ('mech_db_pool_overflow', 'overflow'),
+                                 ('mech_db_pool_size', 'size')):
+                if hasattr(pool, method):
+                    gauges.append([name, labels, getattr(pool, method)()])
+
+        def hit_miss(name, stats, **labels):
+            labels = list(_labels(cache=name, **labels))
+            counters.append(['mech_cache_hits_total', labels, stats['hits']])
+            counters.append(['mech_cache_misses_total', labels, stats['misses']])
+
+        for endpoint, stats in response_cache.stats()['endpoints'].items():
+            hit_miss('response', stats, endpoint=endpoint)
+        hit_miss('token', token_cache.stats())
+        for model, stats in identity_cache.stats().items():
+            hit_miss('identity', stats, model=model)
+        backend = cache.cache
+        if hasattr(backend, 'stats'):
+            stats = backend.stats()
+            hit_miss('shared', stats)
+            counters.append(['mech_cache_evictions_total', [], stats['evictions']])
+            counters.append(['mech_cache_rejected_total', [], stats['rejected']])
+
+        stats = password_hasher.stats()
+        counters.append(['mech_password_hash_total', list(_labels(outcome='completed')), stats['completed']])
+        counters.append(['mech_password_hash_total', list(_labels(outcome='rejected')), stats['rejected']])
+        counters.append(['mech_password_hash_wait_seconds_total', [], stats['wait_seconds']])
+        gauges.append(['mech_password_hash_waiting', [], stats['waiting']])
+        return counters, gauges
+
+    def snapshot(self):
+        snap = self.registry.snapshot()
+        if has_app_context():
+            counters, gauges = self._collect()
+            snap['counters'] += counters
+            snap['gauges'] += gauges
+        snap['pid'] = os.getpid()
+        snap['buckets'] = list(self.registry.buckets)
+        return snap
+
+    def flush(self):
+        """Write this process's snapshot to ``METRICS_DIR``."""
+        directory = current_app.config['METRICS_DIR']
+        self._next_flush = time.monotonic() + current_app.config.get('METRICS_FLUSH_SECONDS', 1.0)
+        if self._file is None:
+            os.makedirs(directory, exist_ok=True)
+            self._file = os.path.join(directory, f'metrics-{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, self._file)
+
+    def _snapshots(self):
+        directory = current_app.config.get('METRICS_DIR')
+        if not directory:
+            return [self.snapshot()]
+        self.flush()
+        snaps = []
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snaps.append(json.load(f))
+            except (OSError, ValueError):
+                continue                      # removed or half-written by a worker shutting down
+        return snaps
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def render(self):
+        counters, gauges, histograms = defaultdict(float), defaultdict(float), {}
+        buckets = list(self.registry.buckets)
+        for snap in self._snapshots():
+            alive = self._alive(snap['pid'])
+            for name, labels, value in snap['counters']:
+                counters[(name, tuple(map(tuple, labels)))] += value
+            if alive:
+                for name, labels, value in snap['gauges']:
+                    gauges[(name, tuple(map(tuple, labels)))] += value
+            if snap['buckets'] != buckets:
+                continue                      # a worker from before a bucket change
+            for name, labels, counts, total, count in snap['histograms']:
+                hist = histograms.setdefault((name, tuple(map(tuple, labels))), [[0] * len(counts), 0.0, 0])
+                hist[0] = [a + b for a, b in zip(hist[0], counts)]
+                hist[1] += total
+                hist[2] += count
+
+        by_name = defaultdict(list)
+        for (name, labels), value in counters.items():
+            by_name[name].append((labels, value))
+        for (name, labels), value in gauges.items():
+            by_name[name].append((labels, value))
+        for (name, labels), hist in histograms.items():
+            by_name[name].append((labels, hist))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text = METRICS[name]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(by_name[name]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, n in zip([*buckets, '+Inf'], counts):
+                    cumulative += n
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
@@ -0,0 +1,210 @@
+import base64
+import binascii
+import json
+from collections import Counter
+from datetime import date
+from sqlalchemy import and_, or_, func, select, text
+from flask import current_app
+from mech.extensions import db, cache
+from mech.models import Customer, ServiceTicket
+from mech.utils.deferred import OnCommit
+
+TOTAL_MODES = ('none', 'exact', 'approx', 'counter')
+
+
+#### Opaque cursors ####
+
+def encode_cursor(values, direction):
+    payload = {
+        'k': [v.isoformat() if isinstance(v, date) else v for v in values],
+        'd': direction
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, keys):
+    """Return (values, direction) for a cursor, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values, direction = payload['k'], payload['d']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValueError('Invalid cursor')
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError('Invalid cursor')
+
+    decoded = []
+    for key, value in zip(keys, values):
+        python_type = key.type.python_type
+        try:
+            decoded.append(python_type.fromisoformat(value) if python_type is date else python_type(value))
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+    return decoded, direction
+
+
+#### Keyset pagination ####
+
+def _beyond(keys, values, descending):
+    #### row-value comparison spelled out so it works on every backend:
+    #### (a, b) > (x, y)  ==  a > x OR (a = x AND b > y)
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [k == v for k, v in zip(keys[:i], values[:i])]
+        step = key < values[i] if descending else key > values[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, next_cursor, prev_cursor):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def keyset_paginate(query, keys, cursor=None, per_page=10, load=None):
+    """Page through ``query`` ordered by ``keys`` (ascending, last key unique).
+
+    Each page is a single indexed range scan: no OFFSET and no COUNT, so the
+    cost of page N does not grow with N. ``cursor`` comes from a previous
+    page's ``next_cursor``/``prev_cursor``; ``None`` means the first page.
+    ``query`` may also be a Core ``select()``, with ``load`` turning the
+    limited statement into a list (e.g. ``Row.load``).
+    """
+    per_page = max(per_page, 1)
+    values, direction = decode_cursor(cursor, keys) if cursor else (None, 'next')
+    backwards = direction == 'prev'
+
+    if values is not None:
+        query = query.filter(_beyond(keys, values, descending=backwards))
+    query = query.order_by(*[k.desc() if backwards else k.asc() for k in keys])
+    query = query.limit(per_page + 1)
+    rows = load(query) if load is not None else query.all()
+
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+
+    def cursor_for(item, to):
+        return encode_cursor([getattr(item, k.key) for k in keys], to)
+
+    if backwards:
+        more_before, more_after = has_more, bool(items)
+    else:
+        more_before, more_after = values is not None and bool(items), has_more
+
+    return KeysetPage(
+        items,
+        per_page,
+        cursor_for(items[-1], 'next') if more_after else None,
+        cursor_for(items[0], 'prev') if more_before else None
+    )
+
+
+def cursor_meta(page, model, total_mode):
+    """The ``meta`` block returned alongside a keyset page."""
+    meta = {
+        'per_page': page.per_page,
+        'next': page.next_cursor,
+        'prev': page.prev_cursor
+    }
+    if total_mode != 'none':
+        meta['total'] = count_rows(model, total_mode)
+    return meta
+
+
+#### Totals ####
+
+def count_rows(model, mode):
+    """Row count for ``model`` according to ``mode`` (see TOTAL_MODES)."""
+    if mode == 'exact':
+        return _exact_count(model)
+    if mode == 'approx':
+        return _approx_count(model)
+    if mode == 'counter':
+        return row_counter.get(model)
+    return None
+
+
+def _exact_count(model):
+    return db.session.scalar(select(func.count()).select_from(model))
+
+
+def _approx_count(model):
+    #### planner statistics where the backend keeps them, else the maintained counter
+    table = model.__tablename__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        estimate = db.session.scalar(
+            text('SELECT reltuples::bigint FROM pg_class WHERE relname = :t'), {'t': table}
+        )
+    elif dialect in ('mysql', 'mariadb'):
+        estimate = db.session.scalar(
+            text('SELECT table_rows FROM information_schema.tables '
+                 'WHERE table_schema = DATABASE() AND table_name = :t'), {'t': table}
+        )
+    else:
+        return row_counter.get(model)
+    #### pg reports -1 for tables that have never been analyzed
+    if estimate is None or estimate < 0:
+        return row_counter.get(model)
+    return int(estimate)
+
+
+class RowCounter:
+    """Row counts kept in the app cache and adjusted as sessions commit.
+
+    The first read seeds the count with COUNT(*). After that, ORM inserts and
+    deletes of tracked models move it up and down on commit, so reads cost a
+    cache lookup. Entries expire after ``PAGINATION_COUNTER_TTL`` seconds and
+    are then re-seeded, which bounds drift from writes made outside the ORM.
+    """
+
+    def __init__(self, *models):
+        self.models = set(models)
+        self._deltas = OnCommit('rowcount_deltas', self._apply, collect=self._collect, factory=Counter)
+
+    def track(self, *models):
+        self.models.update(models)
+
+    def _key(self, model):
+        return f'rowcount:{model.__tablename__}'
+
+    def get(self, model):
+        key = self._key(model)
+        value = cache.get(key)
+        if value is None:
+            value = _exact_count(model)
+            cache.set(key, value, timeout=current_app.config.get('PAGINATION_COUNTER_TTL', 300))
+        return value
+
+    def adjust(self, session, model, delta):
+        """Record a change made outside the unit of work (e.g. Core bulk inserts)."""
+        self._deltas.add(session, {model: delta})
+
+    def _collect(self, session):
+        deltas = Counter(type(obj) for obj in session.new if type(obj) in self.models)
+        deltas.subtract(type(obj) for obj in session.deleted if type(obj) in self.models)
+        return deltas
+
+    def _apply(self, deltas):
+        for model, delta in deltas.items():
+            key = self._key(model)
+            #### only move counts that are already seeded; a missing key re-seeds exactly
+            if not delta or cache.get(key) is None:
+                continue
+            if delta > 0:
+                cache.cache.inc(key, delta)
+            else:
+                cache.cache.dec(key, -delta)
+
+    def listen(self):
+        self._deltas.listen()
+
+
+row_counter = RowCounter(Customer, ServiceTicket)
+row_counter.listen()
@@ -0,0 +1,226 @@
+import cProfile
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from flask import current_app, g, jsonify, request
+
+MODES = ('cprofile', 'sampler')
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'endpoints': [],          # empty: every endpoint
+    'rate': 1.0,              # fraction of matching requests to profile
+    'mode': 'cprofile',
+    'interval_ms': 5,         # sampler only
+    'tracemalloc': False,
+}
+
+
+def _collapse(frame):
+    """One stack as a flamegraph-ready line, outermost frame first: ``a (f.py:1);b (g.py:9)``."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of selected threads from one background thread.
+
+    The thread only runs while at least one request is being sampled, so
+    the cost lands on the sampled requests' process and nowhere else.
+    """
+
+    def __init__(self):
+        self._targets = {}         # thread ident -> (Counter of collapsed stacks, interval)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, ident, interval):
+        with self._lock:
+            self._targets[ident] = (Counter(), interval)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mech-stack-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, ident):
+        with self._lock:
+            counts, _ = self._targets.pop(ident, (Counter(), None))
+        return counts
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                interval = min(i for _, i in self._targets.values())
+                frames = sys._current_frames()
+                for ident, (counts, _) in self._targets.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counts[_collapse(frame)] += 1
+            time.sleep(interval)
+
+
+class Profiler:
+    """Profiles a sample of requests to chosen endpoints and writes the results to ``PROFILING_DIR``.
+
+    Nothing is installed unless ``PROFILING_ENABLED`` is set: no request
+    hooks and no admin route, so a disabled profiler costs nothing. When it
+    is installed, mechanics listed in ``ADMIN_MECHANIC_IDS`` switch it on and
+    off at ``/admin/profiling``, choosing the endpoints, the fraction of
+    their requests to profile, cProfile or the stack sampler, and whether to
+    take tracemalloc snapshots. The settings live in the shared app cache
+    and every worker re-reads them at most every
+    ``PROFILING_REFRESH_SECONDS``, so one call reaches all the workers.
+    Until they are switched on, each request costs a clock read.
+
+    Each profiled request writes, named ``<endpoint>-<ms>-<pid>``:
+
+    - ``.pstats`` (cProfile): load it with ``pstats.Stats`` or snakeviz;
+    - ``.collapsed`` (sampler): one ``stack count`` line per stack, ready
+      for flamegraph.pl or speedscope;
+    - ``.tracemalloc`` plus ``.tracemalloc.txt``: the snapshot after the
+      request, and its biggest growths since the request started.
+    """
+
+    CACHE_KEY = 'profiling:settings'
+
+    def __init__(self):
+        self.sampler = StackSampler()
+        self._busy = threading.Lock()      # cProfile profiles one request at a time
+
+    def init_app(self, app):
+        if not app.config.get('PROFILING_ENABLED'):
+            return
+        app.extensions['profiler'] = {'settings': dict(DEFAULT_SETTINGS), 'next_refresh': 0.0}
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+
+        from mech.utils.util import mechanic_required
+        app.add_url_rule('/admin/profiling', 'profiling', mechanic_required(self.view), methods=['GET', 'PUT'])
+
+    def _settings(self):
+        state = current_app.extensions['profiler']
+        now = time.monotonic()
+        if now >= state['next_refresh']:
+            from mech.extensions import cache
+            state['settings'] = cache.get(self.CACHE_KEY) or dict(DEFAULT_SETTINGS)
+            state['next_refresh'] = now + current_app.config.get('PROFILING_REFRESH_SECONDS', 1.0)
+            self._sync_tracemalloc(state['settings'])
+        return state['settings']
+
+    @staticmethod
+    def _sync_tracemalloc(settings):
+        wanted = settings['enabled'] and settings['tracemalloc']
+        if wanted and not tracemalloc.is_tracing():
+            tracemalloc.start(current_app.config.get('PROFILING_TRACEMALLOC_FRAMES', 10))
+        elif not wanted and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    #### request hooks
+
+    def _start(self):
+        settings = self._settings()
+        if not settings['enabled']:
+            return
+        if settings['endpoints'] and request.endpoint not in settings['endpoints']:
+            return
+        if random.random() >= settings['rate']:
+            return
+
+        if settings['mode'] == 'cprofile':
+            if not self._busy.acquire(blocking=False):
+                return
+            profile = cProfile.Profile()
+            g._profile = ('cprofile', profile)
+            profile.enable()
+        else:
+            self.sampler.start(threading.get_ident(), settings['interval_ms'] / 1000)
+            g._profile = ('sampler', None)
+        if settings['tracemalloc'] and tracemalloc.is_tracing():
+            g._profile_memory = tracemalloc.take_snapshot()
+
+    def _finish(self, exc):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return
+        mode, profiler = profile
+        base = self._output_base()
+        if mode == 'cprofile':
+            profiler.disable()
+            self._busy.release()
+            profiler.dump_stats(base + '.pstats')
+        else:
+            stacks = self.sampler.stop(threading.get_ident())
+            with open(base + '.collapsed', 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+
+        before = g.pop('_profile_memory', None)
+        if before is not None and tracemalloc.is_tracing():
+            after = tracemalloc.take_snapshot()
+            after.dump(base + '.tracemalloc')
+            with open(base + '.tracemalloc.txt', 'w') as f:
+                for stat in after.compare_to(before, 'traceback')[:25]:
+                    f.write(f'{stat}\n')
+                    f.writelines(f'    {line}\n' for line in stat.traceback.format())
+
+    @staticmethod
+    def _output_base():
+        directory = current_app.config.get('PROFILING_DIR') or os.path.join(tempfile.gettempdir(), 'mech-profiles')
+        os.makedirs(directory, exist_ok=True)
+        endpoint = (request.endpoint or 'none').replace('.', '-')
+        return os.path.join(directory, f'{endpoint}-{int(time.time() * 1000)}-{os.getpid()}')
+
+    #### admin route
+
+    def view(self, current_mech_id):
+        if current_mech_id not in current_app.config.get('ADMIN_MECHANIC_IDS', ()):
+            return jsonify({'error': 'Forbidden'}), 403
+        if request.method == 'GET':
+            return jsonify(self._settings())
+
+        from mech.extensions import cache
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        settings = dict(cache.get(self.CACHE_KEY) or DEFAULT_SETTINGS)
+        unknown = sorted(set(data) - set(DEFAULT_SETTINGS))
+        if unknown:
+            return jsonify({'error': f"Unknown field(s): {', '.join(unknown)}"}), 400
+        settings.update(data)
+        error = self._validate(settings)
+        if error:
+            return jsonify({'error': error}), 400
+        cache.set(self.CACHE_KEY, settings, timeout=0)
+        #### this worker applies it now; the others within PROFILING_REFRESH_SECONDS
+        current_app.extensions['profiler']['next_refresh'] = 0.0
+        return jsonify(self._settings())
+
+    @staticmethod
+    def _validate(settings):
+        if not isinstance(settings['enabled'], bool) or not isinstance(settings['tracemalloc'], bool):
+            return "'enabled' and 'tracemalloc' must be booleans"
+        endpoints = settings['endpoints']
+        if not isinstance(endpoints, list) or not all(isinstance(e, str) for e in endpoints):
+            return "'endpoints' must be a list of endpoint names"
+        unknown = sorted(set(endpoints) - set(current_app.view_functions))
+        if unknown:
+            return f"Unknown endpoint(s): {', '.join(unknown)}"
+        rate = settings['rate']
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 < rate <= 1:
+            return "'rate' must be a number in (0, 1]"
+        if settings['mode'] not in MODES:
+            return f"'mode' must be one of {', '.join(MODES)}"
+        interval = settings['interval_ms']
+        if isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0:
+            return "'interval_ms' must be a positive number"
+        return None
@@ -0,0 +1,58 @@
+from sqlalchemy import select, func
+from mech.extensions import db
+from mech.models import Mechanic, ServiceTicket, service_mechanics
+
+
+def ticket_counts(start=None, end=None):
+    """One GROUP BY over service_mechanics, optionally limited to a service_date range."""
+    stmt = (
+        select(
+            service_mechanics.c.mechanic_id,
+            func.count(service_mechanics.c.ticket_id).label('ticket_count')
+        )
+        .group_by(service_mechanics.c.mechanic_id)
+    )
+    if start is not None or end is not None:
+        stmt = stmt.join(ServiceTicket, ServiceTicket.id == service_mechanics.c.ticket_id)
+        if start is not None:
+            stmt = stmt.where(ServiceTicket.service_date >= start)
+        if end is not None:
+            stmt = stmt.where(ServiceTicket.service_date <= end)
+    return stmt.subquery('ticket_counts')
+
+
+def rank_mechanics(top=None, ties=True, start=None, end=None, page=None, per_page=None):
+    """Rank every mechanic by ticket count in a single round trip.
+
+    Mechanics with no tickets rank with a count of 0. Equal counts share a
+    rank (1, 2, 2, 4). ``top`` keeps the first K ranks, which includes everyone
+    tied at rank K unless ``ties`` is False, in which case exactly K rows are
+    returned. ``page``/``per_page`` slice the ranked list after ``top``.
+    """
+    counts = ticket_counts(start, end)
+    ticket_count = func.coalesce(counts.c.ticket_count, 0)
+    ranked = (
+        select(
+            Mechanic.id,
+            Mechanic.name,
+            ticket_count.label('ticket_count'),
+            func.rank().over(order_by=ticket_count.desc()).label('rank')
+        )
+        .outerjoin(counts, counts.c.mechanic_id == Mechanic.id)
+        .subquery('ranked')
+    )
+
+    stmt = select(ranked).order_by(ranked.c.rank, ranked.c.id)
+    if top is not None:
+        if ties:
+            stmt = stmt.where(ranked.c.rank <= top)
+        else:
+            stmt = stmt.limit(top)
+    if per_page:
+        page = max(page or 1, 1)
+        if top is not None and not ties:
+            top_k = stmt.subquery('top_k')
+            stmt = select(top_k).order_by(top_k.c.rank, top_k.c.id)
+        stmt = stmt.limit(per_page).offset((page - 1) * per_page)
+
+    return [dict(row._mapping) for row in db.session.execute(stmt)]
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+from flask import current_app, jsonify, request, has_request_context
+from limits.storage import Storage
+
+#### purge expired windows every this many increments
+PURGE_EVERY = 1000
+
+
+class SQLiteStorage(Storage):
+    """Fixed-window rate-limit counters in a SQLite file shared by every worker on the host.
+
+    ``sqlite:////dev/shm/mech-ratelimit.db`` (four slashes for an absolute
+    path). Each hit is a single UPSERT ... RETURNING, which SQLite runs
+    atomically under its write lock, so concurrent workers never lose an
+    increment. The database runs in WAL mode without fsync: losing the counters
+    in a crash only resets the current windows.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, timeout=5.0, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = urlparse(uri).path
+        self.path = path[1:] if path.startswith('//') else path.lstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+        self._incrs = 0
+        with self._conn() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS ratelimit ('
+                'key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires REAL NOT NULL)'
+            )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conn(self):
+        #### one connection per thread and per process; forked workers open their own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        now = time.time()
+        conn = self._conn()
+        value, = conn.execute(
+            'INSERT INTO ratelimit (key, value, expires) VALUES (:key, :amount, :expires) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            '  value = CASE WHEN expires <= :now THEN :amount ELSE value + :amount END, '
+            '  expires = CASE WHEN expires <= :now OR :elastic THEN :expires ELSE expires END '
+            'RETURNING value',
+            {'key': key, 'amount': amount, 'expires': now + expiry, 'now': now,
+             'elastic': bool(elastic_expiry)}
+        ).fetchone()
+        self._incrs += 1
+        if self._incrs % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM ratelimit WHERE expires <= ?', (now,))
+        return value
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT value FROM ratelimit WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._conn().execute(
+            'SELECT expires FROM ratelimit WHERE key = ?', (key,)
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._conn().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._conn().execute('DELETE FROM ratelimit').rowcount
+
+    def clear(self, key):
+        self._conn().execute('DELETE FROM ratelimit WHERE key = ?', (key,))
+
+
+def application_limit():
+    """The per-client budget across all endpoints, read from the current app's config.
+
+    The Limiter is a module-level singleton that keeps whatever limits the
+    first app configured, so the limit and its exemption are looked up per
+    request instead.
+    """
+    #### any valid string will do when unset: no_application_limit exempts the request
+    return current_app.config.get('RATELIMIT_APPLICATION') or '1/second'
+
+
+def no_application_limit():
+    return not current_app.config.get('RATELIMIT_APPLICATION')
+
+
+def request_cost():
+    """Tokens this request takes from the application-wide limit (``RATELIMIT_COSTS`` by endpoint)."""
+    if not has_request_context():
+        return 1
+    return current_app.config.get('RATELIMIT_COSTS', {}).get(request.endpoint, 1)
+
+
+def rate_limited(e):
+    return jsonify({'error': f'Rate limit exceeded: {e.description}'}), 429
@@ -0,0 +1,127 @@
+import hashlib
+import random
+import time
+from flask import current_app, g, has_request_context, request
+from flask_limiter.util import get_remote_address
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+from mech.utils.response_cache import issued_at
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class RoutingSession(Session):
+    """``db.session`` class that sends a request's default-bind reads to its replica, if ``ReadRouter`` gave it one.
+
+    Flushes, INSERT/UPDATE/DELETE statements and ``SELECT ... FOR UPDATE``
+    go to the primary, and so does everything after them in the same
+    request.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        route = g.get('_db_route') if has_request_context() else None
+        if route is None or bind is not None:
+            return engine
+        if self._flushing or isinstance(clause, UpdateBase):
+            route['wrote'] = True
+            route['replica'] = None
+        elif getattr(clause, '_for_update_arg', None) is not None:
+            route['replica'] = None
+        if route['replica'] is None or engine is not self._db.engines[None]:
+            return engine
+        return self._db.engines[route['replica']]
+
+
+class ReadRouter:
+    """Sends GET and HEAD requests' reads to a read replica.
+
+    ``SQLALCHEMY_REPLICAS`` names the ``SQLALCHEMY_BINDS`` keys that are
+    replicas of the default bind; each safe request picks one at random.
+    With none configured nothing is installed and every query goes to the
+    primary. A replica can lag, so reads go to the primary instead:
+
+    - for ``DB_READ_YOUR_WRITES_SECONDS`` after a client wrote anything, so
+      it sees its own writes. A client is its bearer token, or the remote
+      address for anonymous requests, so a user whose address changes
+      (mobile, behind several proxies) keeps the window. Tokens name their
+      principal's kind, so a mechanic and a customer with the same id are
+      different clients. The token is only hashed, not verified: the window
+      decides where its holder's reads go, never what they may see. It
+      lives in the shared cache so it reaches every worker;
+    - for the rest of a request once a response or identity cache tag it
+      depends on changed within that window (``use_primary_if_changed``), so
+      nothing another client just wrote is cached from a replica that
+      doesn't have it yet;
+    - after the request itself writes (see ``RoutingSession``).
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def init_app(self, app):
+        replicas = list(app.config.get('SQLALCHEMY_REPLICAS') or ())
+        unknown = sorted(set(replicas) - set(app.config.get('SQLALCHEMY_BINDS') or {}))
+        if unknown:
+            raise RuntimeError(f"SQLALCHEMY_REPLICAS not in SQLALCHEMY_BINDS: {', '.join(unknown)}")
+        app.extensions['read_router'] = replicas
+        #### Flask-SQLAlchemy gives every bind a MetaData; a replica's is empty and
+        #### would stay behind on the shared db object, so create_all/drop_all skip replicas
+        metadatas = app.extensions['sqlalchemy'].metadatas
+        for key in replicas:
+            if key in metadatas and not metadatas[key].tables:
+                del metadatas[key]
+        if replicas:
+            app.before_request(self._route)
+            app.after_request(self._remember_writes)
+            app.teardown_request(self._forget)
+
+    @staticmethod
+    def _window():
+        return current_app.config.get('DB_READ_YOUR_WRITES_SECONDS', 5)
+
+    @staticmethod
+    def _client_key():
+        from mech.utils.util import bearer_token
+        token = bearer_token()
+        if token is not None:
+            return f'ryw:token:{hashlib.sha256(token.encode()).hexdigest()}'
+        return f'ryw:addr:{get_remote_address()}'
+
+    def _route(self):
+        route = g._db_route = {'replica': None, 'wrote': False, 'client': self._client_key()}
+        if request.method not in SAFE_METHODS:
+            return
+        until = self.cache.get(route['client'])
+        if until is None or until <= time.time():
+            route['replica'] = random.choice(current_app.extensions['read_router'])
+
+    def _remember_writes(self, response):
+        route = g._db_route
+        if route['wrote']:
+            window = self._window()
+            self.cache.set(route['client'], time.time() + window, timeout=int(window) + 1)
+        return response
+
+    @staticmethod
+    def _forget(exc):
+        g.pop('_db_route', None)
+
+    def replica(self):
+        """Bind key this request is reading from, or None for the primary."""
+        route = g.get('_db_route') if has_request_context() else None
+        return route['replica'] if route else None
+
+    def use_primary(self):
+        """Read from the primary for the rest of this request."""
+        route = g.get('_db_route') if has_request_context() else None
+        if route:
+            route['replica'] = None
+
+    def use_primary_if_changed(self, versions):
+        """``use_primary`` if any of these cache tag versions was issued within the read-your-writes window."""
+        if self.replica() is None:
+            return
+        since = time.time() - self._window()
+        if any(issued_at(v) > since for v in versions):
+            self.use_primary()
@@ -0,0 +1,149 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import defaultdict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, has_app_context, request, Response
+from mech.utils.deferred import OnCommit
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, hit):
+        with self._lock:
+            (self.hits if hit else self.misses)[endpoint] += 1
+
+
+def _token():
+    return f'{time.time():.3f}:{uuid.uuid4().hex}'
+
+
+def issued_at(version):
+    """Unix time a tag version token was issued (0 for tokens without one)."""
+    stamp, sep, _ = str(version).partition(':')
+    return float(stamp) if sep else 0.0
+
+
+class ResponseCache:
+    """Cache of whole GET responses in the app's Flask-Caching backend, invalidated by tag.
+
+    Each cached view names the tags its output depends on. Every tag has a
+    version token stored in the cache, and the response key includes the
+    current version of each of its tags, so bumping a tag orphans every entry
+    built from it without having to find them. Writes call ``invalidate``;
+    the bump is deferred until the session commits so a concurrent read can't
+    re-cache the old rows under the new version. Entries also expire after
+    ``RESPONSE_CACHE_TIMEOUT`` seconds. ``RESPONSE_CACHE_ENABLED = False``
+    turns it off. Tokens carry the time they were issued, so the read router
+    can keep a freshly changed tag's reads off a lagging replica.
+    """
+
+    SESSION_KEY = 'response_cache_tags'
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._stale = OnCommit(self.SESSION_KEY, self._bump_committed)
+
+    def init_app(self, app):
+        app.extensions['response_cache'] = _Stats()
+        self._stale.listen()
+
+    @staticmethod
+    def _tag_key(tag):
+        return f'tagver:{tag}'
+
+    def versions(self, tags):
+        """Current version token of each tag, seeding missing ones."""
+        keys = [self._tag_key(t) for t in tags]
+        versions = self.cache.get_many(*keys)
+        for i, version in enumerate(versions):
+            if version is None:
+                #### a fresh random token, never a counter restarting at 0, so an
+                #### evicted version can't line up with entries cached before it
+                self.cache.add(keys[i], _token(), timeout=0)
+                versions[i] = self.cache.get(keys[i])
+        return versions
+
+    def bump(self, tags):
+        """Give each tag a new version token right away (``invalidate`` waits for the commit)."""
+        for tag in tags:
+            self.cache.set(self._tag_key(tag), _token(), timeout=0)
+
+    @staticmethod
+    def _key(versions):
+        args = urlencode(sorted(request.args.items(multi=True)))
+        versions = '.'.join(str(v) for v in versions)
+        raw = f'{request.path}?{args}|{versions}'
+        return 'view:' + hashlib.sha1(raw.encode()).hexdigest()
+
+    def cached(self, *tags):
+        """Serve the view from cache while none of ``tags`` has been invalidated."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+                    return view(*args, **kwargs)
+                stats = current_app.extensions['response_cache']
+                versions = self.versions(tags)
+                key = self._key(versions)
+                entry = self.cache.get(key)
+                if entry is not None:
+                    stats.record(request.endpoint, True)
+                    body, mimetype, etag = entry
+                    if etag and request.if_none_match.contains(etag):
+                        resp = Response(status=304)
+                    else:
+                        resp = Response(body, status=200, mimetype=mimetype)
+                    if etag:
+                        resp.set_etag(etag)
+                    resp.headers['X-Cache'] = 'HIT'
+                    return resp
+
+                stats.record(request.endpoint, False)
+                from mech.extensions import read_router
+                read_router.use_primary_if_changed(versions)
+                resp = current_app.make_response(view(*args, **kwargs))
+                if resp.status_code == 200 and not resp.is_streamed:
+                    self.cache.set(
+                        key, (resp.get_data(), resp.mimetype, resp.get_etag()[0]),
+                        timeout=current_app.config.get('RESPONSE_CACHE_TIMEOUT', 300)
+                    )
+                resp.headers['X-Cache'] = 'MISS'
+                return resp
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags, session=None):
+        """Mark ``tags`` stale once the current transaction commits."""
+        if session is None:
+            from mech.extensions import db
+            session = db.session()
+        self._stale.add(session, tags)
+
+    def _bump_committed(self, tags):
+        if has_app_context() and 'response_cache' in current_app.extensions:
+            self.bump(tags)
+
+    def stats(self):
+        stats = current_app.extensions['response_cache']
+        endpoints = {}
+        for endpoint in sorted(set(stats.hits) | set(stats.misses)):
+            hits, misses = stats.hits[endpoint], stats.misses[endpoint]
+            endpoints[endpoint] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses)
+            }
+        hits, misses = sum(stats.hits.values()), sum(stats.misses.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'endpoints': endpoints
+        }
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import func, select
+from mech.extensions import db
+from mech.models import Customer, Inventory, Mechanic, ServiceTicket, service_mechanics
+
+
+class Row:
+    """Read-only copy of one table row: plain slots, no identity map or instrumentation.
+
+    Subclasses name a model and the ``__columns__`` to read; ``__slots__``
+    holds those plus any extra attributes a loader fills in (set to None).
+    ``__tablename__``, ``id`` and ``version`` make rows usable with
+    ``collection_etag``, and having no ``__getitem__`` keeps them on the
+    compiled dump's fast path.
+    """
+
+    __slots__ = ()
+    __model__ = None
+    __columns__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.__tablename__ = cls.__model__.__tablename__
+        cls.__extra__ = tuple(name for name in cls.__slots__ if name not in cls.__columns__)
+
+    def __init__(self, *values):
+        for name, value in zip(self.__columns__, values, strict=True):
+            setattr(self, name, value)
+        for name in self.__extra__:
+            setattr(self, name, None)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.id}>'
+
+    @classmethod
+    def select(cls):
+        """``SELECT`` of this row's columns, to filter, order and page like any Core select."""
+        return select(*[getattr(cls.__model__, name) for name in cls.__columns__])
+
+    @classmethod
+    def load(cls, stmt):
+        return [cls(*values) for values in db.session.execute(stmt).tuples()]
+
+
+class CustomerRow(Row):
+    __model__ = Customer
+    __columns__ = ('id', 'name', 'email', 'phone', 'version')
+    __slots__ = __columns__
+
+
+class CustomerRef(Row):
+    __model__ = Customer
+    __columns__ = ('id', 'name', 'version')
+    __slots__ = __columns__
+
+
+class MechanicRow(Row):
+    __model__ = Mechanic
+    __columns__ = ('id', 'name', 'email', 'phone', 'salary', 'version')
+    __slots__ = __columns__
+
+
+class MechanicRef(Row):
+    __model__ = Mechanic
+    __columns__ = ('id', 'name', 'version')
+    __slots__ = __columns__
+
+
+class InventoryRow(Row):
+    __model__ = Inventory
+    __columns__ = ('id', 'name', 'price', 'version')
+    __slots__ = __columns__
+
+
+class TicketRow(Row):
+    __model__ = ServiceTicket
+    __columns__ = ('id', 'vin', 'service_date', 'service_desc', 'customer_id', 'version')
+    __slots__ = __columns__ + ('customer', 'mechanics')
+
+
+class RowPagination(Pagination):
+    """Flask-SQLAlchemy's page/per_page handling over a Core select of ``row`` columns.
+
+    Same arguments, clamping and ``total``/``pages`` as ``Model.query.paginate``.
+    """
+
+    def _query_items(self):
+        row, stmt = self._query_args['row'], self._query_args['select']
+        return row.load(stmt.limit(self.per_page).offset(self._query_offset))
+
+    def _query_count(self):
+        stmt = self._query_args['select']
+        return db.session.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+
+
+def paginate_rows(row, stmt=None, *, max_per_page=None, **kwargs):
+    """``RowPagination`` of ``stmt`` (``row.select()`` by default).
+
+    No ``max_per_page`` unless given, as with ``Model.query.paginate``.
+    """
+    return RowPagination(row=row, select=row.select() if stmt is None else stmt,
+                         max_per_page=max_per_page, **kwargs)
+
+
+def load_ticket_row_relations(tickets):
+    """Fill ``customer`` and ``mechanics`` on a page of ``TicketRow`` with two queries.
+
+    Two queries however many tickets there are, instead of two per ticket
+    when the schema walks ORM relationships. Mechanics are in id order.
+    """
+    if not tickets:
+        return tickets
+
+    mechanics = defaultdict(list)
+    stmt = (
+        select(service_mechanics.c.ticket_id, *MechanicRef.select().selected_columns)
+        .join(Mechanic, Mechanic.id == service_mechanics.c.mechanic_id)
+        .where(service_mechanics.c.ticket_id.in_({t.id for t in tickets}))
+        .order_by(service_mechanics.c.ticket_id, Mechanic.id)
+    )
+    for ticket_id, *values in db.session.execute(stmt).tuples():
+        mechanics[ticket_id].append(MechanicRef(*values))
+
+    customers = {
+        c.id: c for c in CustomerRef.load(
+            CustomerRef.select().where(Customer.id.in_({t.customer_id for t in tickets}))
+        )
+    }
+
+    for ticket in tickets:
+        ticket.customer = customers.get(ticket.customer_id)
+        ticket.mechanics = mechanics[ticket.id]
+    return tickets
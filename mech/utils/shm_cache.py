@@ -0,0 +1,356 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from flask_caching.backends.base import BaseCache
+
+log = logging.getLogger('mech.cache')
+
+MAGIC = b'MECHSHM2'
+#### magic, then buckets, ways, slot_size of the small and the large table
+FILE_HEADER = struct.Struct('<8sIIIIII')
+FILE_HEADER_SIZE = 64
+#### key hash (0 = empty slot), expires at (0 = never), last access, key length, value length
+SLOT = struct.Struct('<QddII')
+THREAD_LOCK_STRIPES = 64
+
+#### one set-associative table in the file; ``first`` numbers its buckets after the previous table's
+_Table = namedtuple('_Table', 'start first buckets ways slot_size bucket_bytes')
+
+
+def default_path():
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, f'mech-cache-{os.getuid()}')
+
+
+class SharedMemoryCache(BaseCache):
+    """A cache in a memory-mapped file shared by every worker process on the host.
+
+    The file is a set-associative hash table: a key hashes to one bucket of
+    ``ways`` fixed-size slots and is stored in one of them, evicting the
+    bucket's least recently used entry when all are live. Each bucket is
+    guarded by an ``fcntl`` byte-range lock (between processes) and a striped
+    thread lock (within one), so ``inc``/``dec``/``add`` are atomic across
+    workers. Values are pickled.
+
+    Values too big for a ``slot_size`` slot go to a second, smaller table of
+    ``large_slot_size`` slots (``large_buckets`` buckets of ``large_ways``),
+    so list responses of a few dozen KB still cache without making every slot
+    that big. A key lives in one table at a time; moving it between them is
+    not atomic against a concurrent write of the same key, which at worst
+    leaves one of the two writes cached. A value that fits neither is not
+    cached, ``set`` returns False and it is counted as ``rejected`` in
+    ``stats``. ``inc``/``dec`` counters always live in the small table.
+
+    Every process using ``path`` must use the same geometry. A file with a
+    different one is reinitialised, which drops whatever it held, but only
+    when no other process still has it open: each instance holds a shared
+    ``flock`` on the file until ``close``, and reinitialising needs it
+    exclusively. ``remove`` deletes a file nothing has open, so a server can
+    start from an empty cache instead of the last deploy's entries.
+    """
+
+    def __init__(self, path=None, buckets=1024, ways=8, slot_size=4096,
+                 large_buckets=0, large_ways=4, large_slot_size=65536, default_timeout=300):
+        BaseCache.__init__(self, default_timeout=default_timeout)
+        self.path = path or default_path()
+        self.buckets = buckets
+        self.ways = ways
+        self.slot_size = slot_size
+        small = _Table(FILE_HEADER_SIZE, 0, buckets, ways, slot_size, ways * slot_size)
+        self._tables = [small]
+        if large_buckets:
+            self._tables.append(_Table(small.start + buckets * small.bucket_bytes, buckets,
+                                       large_buckets, large_ways, large_slot_size,
+                                       large_ways * large_slot_size))
+        last = self._tables[-1]
+        self._size = last.start + last.buckets * last.bucket_bytes
+        self._thread_locks = [threading.Lock()
+                              for _ in range(min(buckets + large_buckets, THREAD_LOCK_STRIPES))]
+        self.hits = self.misses = self.evictions = self.rejected = 0
+        self._stats_lock = threading.Lock()
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        header = FILE_HEADER.pack(MAGIC, buckets, ways, slot_size,
+                                  large_buckets, large_ways if large_buckets else 0,
+                                  large_slot_size if large_buckets else 0)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if (os.fstat(self._fd).st_size != self._size
+                    or os.pread(self._fd, FILE_HEADER.size, 0) != header):
+                #### flock, unlike lockf, is held per open file, so this also
+                #### sees other instances in this process
+                try:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    fd, self._fd = self._fd, None
+                    os.close(fd)
+                    raise RuntimeError(f'{self.path} is in use with a different cache geometry') from None
+                #### truncating to 0 first zeroes every slot, i.e. marks them all empty
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, header, 0)
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+        finally:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._mm = mmap.mmap(self._fd, self._size)
+
+    @staticmethod
+    def config_kwargs(config):
+        """Constructor arguments from the ``CACHE_SHARED_*`` settings."""
+        return dict(
+            path=config.get('CACHE_SHARED_PATH'),
+            buckets=config.get('CACHE_SHARED_BUCKETS', 1024),
+            ways=config.get('CACHE_SHARED_WAYS', 8),
+            slot_size=config.get('CACHE_SHARED_SLOT_SIZE', 4096),
+            large_buckets=config.get('CACHE_SHARED_LARGE_BUCKETS', 0),
+            large_ways=config.get('CACHE_SHARED_LARGE_WAYS', 4),
+            large_slot_size=config.get('CACHE_SHARED_LARGE_SLOT_SIZE', 65536)
+        )
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(cls.config_kwargs(config))
+        return cls(*args, **kwargs)
+
+    @staticmethod
+    def remove(path=None):
+        """Delete the cache file at ``path`` unless a process has it open; True if removed."""
+        path = path or default_path()
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            os.unlink(path)
+            return True
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Unmap the table and close the file, releasing this instance's hold on it."""
+        if self._fd is None:
+            return
+        self._mm.close()
+        os.close(self._fd)
+        self._fd = None
+
+    @staticmethod
+    def _hash(key):
+        h = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+        return h or 1
+
+    @contextmanager
+    def _bucket(self, table, h):
+        bucket = h % table.buckets
+        start = table.start + bucket * table.bucket_bytes
+        #### fcntl locks belong to the process, so threads also need their own lock
+        with self._thread_locks[(table.first + bucket) % len(self._thread_locks)]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, table.bucket_bytes, start)
+            try:
+                yield start
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, table.bucket_bytes, start)
+
+    def _find(self, table, start, h, key, now):
+        """Offset and header of the live slot holding ``key``, or None. Drops it if expired."""
+        mm = self._mm
+        for way in range(table.ways):
+            offset = start + way * table.slot_size
+            slot = SLOT.unpack_from(mm, offset)
+            if slot[0] != h:
+                continue
+            key_start = offset + SLOT.size
+            if mm[key_start:key_start + slot[3]] != key:
+                continue
+            if slot[1] and slot[1] <= now:
+                SLOT.pack_into(mm, offset, 0, 0, 0, 0, 0)
+                return None
+            return offset, slot
+        return None
+
+    def _victim(self, table, start, now):
+        """The slot to overwrite: an empty or expired one, else the least recently used."""
+        mm = self._mm
+        oldest, oldest_access = None, None
+        for way in range(table.ways):
+            offset = start + way * table.slot_size
+            h, expires, last_access, _, _ = SLOT.unpack_from(mm, offset)
+            if not h or (expires and expires <= now):
+                return offset
+            if oldest is None or last_access < oldest_access:
+                oldest, oldest_access = offset, last_access
+        with self._stats_lock:
+            self.evictions += 1
+        return oldest
+
+    def _write(self, offset, h, key, payload, expires, now):
+        mm = self._mm
+        key_start = offset + SLOT.size
+        mm[key_start:key_start + len(key)] = key
+        mm[key_start + len(key):key_start + len(key) + len(payload)] = payload
+        SLOT.pack_into(mm, offset, h, expires, now, len(key), len(payload))
+
+    def _expires(self, timeout, now):
+        timeout = self._normalize_timeout(timeout)
+        return now + timeout if timeout > 0 else 0
+
+    def _table_for(self, key, payload):
+        """The first table whose slots fit ``key`` and ``payload``, or None."""
+        size = SLOT.size + len(key) + len(payload)
+        for table in self._tables:
+            if size <= table.slot_size:
+                return table
+        return None
+
+    def _discard(self, table, h, key, now):
+        with self._bucket(table, h) as start:
+            found = self._find(table, start, h, key, now)
+            if found is None:
+                return False
+            SLOT.pack_into(self._mm, found[0], 0, 0, 0, 0, 0)
+        return True
+
+    def get(self, key):
+        key = key.encode()
+        h = self._hash(key)
+        now = time.time()
+        payload = None
+        for table in self._tables:
+            with self._bucket(table, h) as start:
+                found = self._find(table, start, h, key, now)
+                if found is not None:
+                    offset, slot = found
+                    struct.pack_into('<d', self._mm, offset + 16, now)
+                    value_start = offset + SLOT.size + slot[3]
+                    payload = self._mm[value_start:value_start + slot[4]]
+                    break
+        try:
+            value = None if payload is None else pickle.loads(payload)
+        except Exception:
+            #### written by a different code version; treat as a miss
+            payload = value = None
+        with self._stats_lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def _store(self, key, value, timeout, only_if_missing):
+        key = key.encode()
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        h = self._hash(key)
+        now = time.time()
+        target = self._table_for(key, payload)
+        others = [table for table in self._tables if table is not target]
+        if only_if_missing and any(self._has(table, h, key, now) for table in others):
+            return False
+        if target is None:
+            #### drop any smaller value it had, so the key doesn't keep serving that
+            for table in others:
+                self._discard(table, h, key, now)
+            with self._stats_lock:
+                self.rejected += 1
+                first = self.rejected == 1
+            if first:
+                log.warning('%s: %d byte value for %r fits no slot; not cached (see stats()["rejected"])',
+                            self.path, len(payload), key.decode())
+            return False
+        with self._bucket(target, h) as start:
+            found = self._find(target, start, h, key, now)
+            if found is not None and only_if_missing:
+                return False
+            offset = found[0] if found is not None else self._victim(target, start, now)
+            self._write(offset, h, key, payload, self._expires(timeout, now), now)
+        for table in others:
+            self._discard(table, h, key, now)
+        return True
+
+    def set(self, key, value, timeout=None):
+        return self._store(key, value, timeout, only_if_missing=False)
+
+    def add(self, key, value, timeout=None):
+        return self._store(key, value, timeout, only_if_missing=True)
+
+    def delete(self, key):
+        key = key.encode()
+        h = self._hash(key)
+        now = time.time()
+        #### not any(): a key mid-move between tables can be in both
+        return sum(self._discard(table, h, key, now) for table in self._tables) > 0
+
+    def _has(self, table, h, key, now):
+        with self._bucket(table, h) as start:
+            return self._find(table, start, h, key, now) is not None
+
+    def has(self, key):
+        key = key.encode()
+        h = self._hash(key)
+        now = time.time()
+        return any(self._has(table, h, key, now) for table in self._tables)
+
+    def inc(self, key, delta=1):
+        key = key.encode()
+        h = self._hash(key)
+        now = time.time()
+        table = self._tables[0]
+        with self._bucket(table, h) as start:
+            found = self._find(table, start, h, key, now)
+            if found is None:
+                value, expires = 0, self._expires(None, now)
+                offset = self._victim(table, start, now)
+            else:
+                offset, slot = found
+                value_start = offset + SLOT.size + slot[3]
+                value, expires = pickle.loads(self._mm[value_start:value_start + slot[4]]), slot[1]
+            value += delta
+            self._write(offset, h, key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now)
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, -delta)
+
+    def clear(self):
+        for lock in self._thread_locks:
+            lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                #### punch the whole table back to a hole instead of touching every page
+                os.ftruncate(self._fd, FILE_HEADER_SIZE)
+                os.ftruncate(self._fd, self._size)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        finally:
+            for lock in self._thread_locks:
+                lock.release()
+        return True
+
+    def stats(self):
+        """This process's hit/miss/eviction/rejected-set counts. Scanning the tables
+        for their fill would fault in every page of them, so that isn't reported."""
+        with self._stats_lock:
+            hits, misses, evictions, rejected = self.hits, self.misses, self.evictions, self.rejected
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'evictions': evictions,
+            'rejected': rejected,
+            'capacity': sum(table.buckets * table.ways for table in self._tables)
+        }
@@ -0,0 +1,163 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger('mech.sql')
+
+#### bound-parameter lists in any DBAPI paramstyle: (?, ?), (%s, %s), (%(id_1)s, ...)
+_PARAM_LIST = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """``statement`` with whitespace collapsed and IN lists of any length folded to ``(...)``."""
+    return _PARAM_LIST.sub('(...)', _SPACE.sub(' ', statement).strip())
+
+
+def repeated_shapes(statements, times):
+    """(shape, count) for every statement shape seen at least ``times`` times, most frequent first."""
+    counts = Counter(statement_shape(s) for s in statements)
+    return [(shape, n) for shape, n in counts.most_common() if n >= times]
+
+
+class QueryCounter:
+    """Counts every statement sent to any engine while the block is active.
+
+        with QueryCounter() as q:
+            client.get('/mechanics/ranked')
+        assert q.count == 2
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
+
+
+class QueryBudget(QueryCounter):
+    """A QueryCounter that fails the test when the block goes over budget.
+
+        with assert_query_budget(max_queries=3, max_repeats=1):
+            client.get('/service_tickets/')
+
+    ``max_queries`` caps the number of statements; ``max_repeats`` caps how
+    many times one statement shape may run, which is what an N+1 loop
+    breaks first. The AssertionError lists the offending statements.
+    """
+
+    def __init__(self, max_queries=None, max_repeats=None):
+        super().__init__()
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+
+    def __exit__(self, exc_type, *exc):
+        super().__exit__(exc_type, *exc)
+        if exc_type is not None:
+            return False
+        if self.max_queries is not None and self.count > self.max_queries:
+            listing = '\n'.join(f'  {statement_shape(s)}' for s in self.statements)
+            raise AssertionError(f'{self.count} queries, budget is {self.max_queries}:\n{listing}')
+        if self.max_repeats is not None:
+            repeated = repeated_shapes(self.statements, self.max_repeats + 1)
+            if repeated:
+                listing = '\n'.join(f'  {n}x {shape}' for shape, n in repeated)
+                raise AssertionError(f'statement shapes run more than {self.max_repeats} times:\n{listing}')
+        return False
+
+
+def assert_query_budget(max_queries=None, max_repeats=None):
+    return QueryBudget(max_queries, max_repeats)
+
+
+class _RequestSQL:
+    __slots__ = ('statements', 'seconds')
+
+    def __init__(self):
+        self.statements = []
+        self.seconds = 0.0
+
+
+class SQLStats:
+    """Per-request statement count, DB time and repeated statement shapes.
+
+    Every response gets ``X-Query-Count`` and a ``Server-Timing: db`` entry.
+    A statement shape (the SQL with IN lists folded) run
+    ``SQL_STATS_REPEAT_WARN`` times or more in one request is logged as a
+    likely N+1 on the ``mech.sql`` logger (``None`` skips the check), and with ``SQL_STATS_LOG`` every
+    request is logged there as one JSON line. ``SQL_STATS_ENABLED = False``
+    turns it all off.
+    """
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._report)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @staticmethod
+    def _start():
+        if current_app.config.get('SQL_STATS_ENABLED', True):
+            g._sql_stats = _RequestSQL()
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and context is not None and '_sql_stats' in g:
+            context._sql_started = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_sql_started', None)
+        if started is None:
+            return
+        stats = g.get('_sql_stats')
+        if stats is None:
+            return
+        stats.seconds += time.perf_counter() - started
+        stats.statements.append(statement)
+
+    @staticmethod
+    def _report(response):
+        stats = g.pop('_sql_stats', None)
+        if stats is None:
+            return response
+        db_ms = stats.seconds * 1000
+        response.headers['X-Query-Count'] = str(len(stats.statements))
+        response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{len(stats.statements)} queries"')
+
+        threshold = current_app.config.get('SQL_STATS_REPEAT_WARN', 5)
+        repeated = []
+        if threshold and len(stats.statements) >= threshold:
+            repeated = repeated_shapes(stats.statements, threshold)
+        if repeated:
+            log.warning('possible N+1 in %s %s: %s', request.method, request.path,
+                        '; '.join(f'{n}x {shape}' for shape, n in repeated))
+        if current_app.config.get('SQL_STATS_LOG'):
+            log.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'queries': len(stats.statements),
+                'db_ms': round(db_ms, 2),
+                'repeated': [{'shape': shape, 'count': n} for shape, n in repeated]
+            }))
+        return response
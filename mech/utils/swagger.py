@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from flask import Flask, request, Response
+
+
+def build_spec(app):
+    """Swagger 2 spec from the route docstrings plus the static definitions."""
+    #### imported here so workers that never serve the docs never load them
+    import yaml
+    from flask_swagger import swagger
+
+    ##### Load static definitions ######
+    static_path = os.path.join(app.static_folder, "swagger.yaml")
+    with open(static_path, 'r') as f:
+        static_docs = yaml.safe_load(f)
+
+    ##### Generate spec ####
+    spec = swagger(app)
+    spec["info"]["title"] = "MechAPI"
+    spec["info"]["version"] = "1.0.0"
+
+    ### Merge components.schemas into Swagger2 definitions #####
+    spec.setdefault("definitions", {}).update(
+        static_docs.get("components", {}).get("schemas", {})
+    )
+    return spec
+
+
+class SpecDocument:
+    """The serialized spec, its gzip variant and a strong ETag for each."""
+
+    def __init__(self, body):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.gzip_etag = f'{self.etag}-gz'
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(json.dumps(spec, sort_keys=True, separators=(',', ':')).encode())
+
+
+def spec_document(app):
+    """The app's spec, built on first use (or read from SWAGGER_SPEC_FILE) and then reused."""
+    doc = app.extensions.get('swagger_spec')
+    if doc is None:
+        path = app.config.get('SWAGGER_SPEC_FILE')
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                doc = SpecDocument(f.read())
+        else:
+            doc = SpecDocument.from_spec(build_spec(app))
+        app.extensions['swagger_spec'] = doc
+    return doc
+
+
+def write_spec(app, path):
+    """Write the spec and a pre-gzipped copy (``path`` + '.gz') for serving as a static file."""
+    doc = SpecDocument.from_spec(build_spec(app))
+    with open(path, 'wb') as f:
+        f.write(doc.body)
+    with open(f'{path}.gz', 'wb') as f:
+        f.write(doc.gzipped)
+    return doc
+
+
+def spec_response(app):
+    doc = spec_document(app)
+    if request.accept_encodings['gzip']:
+        body, etag = doc.gzipped, doc.gzip_etag
+    else:
+        body, etag = doc.body, doc.etag
+
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype='application/json')
+        if body is doc.gzipped:
+            resp.headers['Content-Encoding'] = 'gzip'
+    resp.set_etag(etag)
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.cache_control.public = True
+    resp.cache_control.max_age = app.config.get('SWAGGER_MAX_AGE', 3600)
+    return resp
+
+
+class LazySwaggerUI:
+    """WSGI middleware serving the Swagger UI under ``prefix``, built on the first request there.
+
+    flask_swagger_ui is only imported, and its blueprint only registered,
+    when the docs are first opened. The blueprint goes on a small app of its
+    own because Flask refuses new blueprints once the main app has served a
+    request. UI pages and assets therefore skip the main app's request hooks.
+    """
+
+    def __init__(self, wsgi_app, prefix, api_url, config=None):
+        self.wsgi_app = wsgi_app
+        self.prefix = prefix
+        self.api_url = api_url
+        self.config = config
+        self.ui = None
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path == self.prefix or path.startswith(self.prefix + '/'):
+            return self._ui()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+    def _ui(self):
+        with self._lock:
+            if self.ui is None:
+                from flask_swagger_ui import get_swaggerui_blueprint
+                ui = Flask(__name__)
+                ui.url_map.strict_slashes = False
+                ui.register_blueprint(get_swaggerui_blueprint(self.prefix, self.api_url, config=self.config),
+                                      url_prefix=self.prefix)
+                self.ui = ui
+        return self.ui
@@ -0,0 +1,108 @@
+import hashlib
+import time
+from flask import current_app, has_app_context
+from mech.utils.deferred import OnCommit
+from mech.utils.lru import ExpiringLRU
+
+#### models whose deletion revokes their tokens -> token kind
+PRINCIPALS = {'Mechanic': 'mechanic', 'Customer': 'customer'}
+
+
+class TokenCache:
+    """Per-app LRU/TTL cache of verified bearer tokens -> principal id.
+
+    A hit skips both the JWT signature check and the principal lookup. Entries
+    live for ``AUTH_CACHE_TTL`` seconds (or until the token's own ``exp``) and
+    at most ``AUTH_CACHE_SIZE`` are kept in each worker. Every principal also
+    has a version token in the shared app cache (the response cache's tags),
+    and an entry is only served while its principal's token is current.
+    Deleting a ``Mechanic`` or ``Customer`` moves the token on once the
+    session commits, which revokes its cached tokens in every worker. Set
+    ``AUTH_CACHE_SIZE = 0`` to disable.
+    """
+
+    SESSION_KEY = 'token_cache_principals'
+
+    def __init__(self, response_cache):
+        self.tags = response_cache
+        self._deleted = OnCommit(self.SESSION_KEY, self._revoke, collect=self._collect)
+
+    def init_app(self, app):
+        #### keyed by (kind, token digest) -> (principal_id, principal version token)
+        app.extensions['token_cache'] = ExpiringLRU(
+            app.config.get('AUTH_CACHE_SIZE', 1024),
+            app.config.get('AUTH_CACHE_TTL', 60)
+        )
+        self._deleted.listen()
+
+    @property
+    def _lru(self):
+        return current_app.extensions['token_cache']
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    @staticmethod
+    def _tag(kind, principal_id):
+        return f'principal:{kind}:{principal_id}'
+
+    def get(self, kind, token):
+        lru = self._lru
+        if not lru.maxsize:
+            return None
+        key = (kind, self._digest(token))
+        entry = lru.get(key, time.monotonic())
+        if entry is not None:
+            principal_id, version = entry
+            if self.tags.versions([self._tag(kind, principal_id)])[0] == version:
+                lru.hits += 1
+                return principal_id
+            lru.discard(key)
+        lru.misses += 1
+        return None
+
+    def version(self, kind, principal_id):
+        """The principal's current version token; read it before looking the principal up."""
+        if not self._lru.maxsize:
+            return None
+        return self.tags.versions([self._tag(kind, principal_id)])[0]
+
+    def put(self, kind, token, principal_id, version, exp=None):
+        """Remember ``token`` under the ``version`` read before the principal was looked up.
+
+        A delete committing in between leaves the entry under the old token,
+        so it is never served.
+        """
+        lru = self._lru
+        if not lru.maxsize:
+            return
+        now = time.monotonic()
+        expires_at = now + lru.ttl
+        if exp is not None:
+            expires_at = min(expires_at, now + (exp - time.time()))
+        lru.put((kind, self._digest(token)), (principal_id, version), expires_at)
+
+    @staticmethod
+    def _collect(session):
+        return [(PRINCIPALS[type(obj).__name__], obj.id) for obj in session.deleted
+                if type(obj).__name__ in PRINCIPALS]
+
+    def _revoke(self, principals):
+        if not has_app_context() or 'token_cache' not in current_app.extensions:
+            return
+        self.tags.bump([self._tag(kind, id) for kind, id in principals])
+
+    def clear(self):
+        self._lru.clear()
+
+    def stats(self):
+        lru = self._lru
+        lookups = lru.hits + lru.misses
+        return {
+            'hits': lru.hits,
+            'misses': lru.misses,
+            'hit_rate': lru.hits / lookups if lookups else 0.0,
+            'size': len(lru),
+            'maxsize': lru.maxsize
+        }
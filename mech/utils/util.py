@@ -2,14 +2,58 @@ import functools
 import jwt
 from jwt import InvalidTokenError
 from flask import request, jsonify, current_app
+from mech.extensions import identity_cache, token_cache
 from mech.models import Mechanic, Customer
 from functools import wraps
 import os
 
 SECRET_KEY = os.environ.get('SECRET_KEY') or "super secret secrets"
 
+def _authenticate(kind, model):
+    """Return (principal_id, None) for a valid bearer token, else (None, error response).
+
+    Verified tokens are remembered in ``token_cache``, so a repeat token skips
+    the signature check and the ``model`` lookup entirely.
+    """
+    token = bearer_token()
+    if token is None:
+        return None, (jsonify({'error': 'Missing or invalid Authorization header'}), 401)
+
+    principal_id = token_cache.get(kind, token)
+    if principal_id is not None:
+        return principal_id, None
+
+    try:
+        data = jwt.decode(
+            token,
+            current_app.config['SECRET_KEY'],
+            algorithms=[current_app.config.get('JWT_ALGO', 'HS256')]
+        )
+    except InvalidTokenError:
+        return None, (jsonify({'error': 'Invalid token'}), 401)
+
+    sub = data.get('sub')
+    try:
+        principal_id = int(sub)
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'Invalid token payload'}), 401)
+
+    version = token_cache.version(kind, principal_id)
+    if not identity_cache.get(model, principal_id):
+        return None, (jsonify({'error': 'Invalid token payload'}), 401)
+
+    token_cache.put(kind, token, principal_id, version, exp=data.get('exp'))
+    return principal_id, None
+
+def bearer_token():
+    """The current request's bearer token, unverified, or None if it sent none."""
+    parts = request.headers.get('Authorization', '').split()
+    if len(parts) != 2 or parts[0].lower() != 'bearer':
+        return None
+    return parts[1]
+
 def encode_mechanic_token(mechanic_id):
-    payload = {'sub': str(mechanic_id)}
+    payload = {'sub': str(mechanic_id), 'kind': 'mechanic'}
     key = current_app.config['SECRET_KEY']
     algo = current_app.config.get('JWT_ALGO', 'HS256')
     return jwt.encode(payload, key, algorithm=algo)
@@ -17,36 +61,15 @@ def encode_mechanic_token(mechanic_id):
 def mechanic_required(f):
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
-        auth = request.headers.get('Authorization', '')
-        parts = auth.split()
-        if len(parts) != 2 or parts[0].lower() != 'bearer':
-            return jsonify({'error': 'Missing or invalid Authorization header'}), 401
-
-        token = parts[1]
-        try:
-            data = jwt.decode(
-                token,
-                current_app.config['SECRET_KEY'],
-                algorithms=[current_app.config.get('JWT_ALGO', 'HS256')]
-            )
-        except InvalidTokenError as e:
-            return jsonify({'error': 'Invalid token'}), 401
-        
-        sub = data.get('sub')
-        try:
-            mech_id = int(sub)
-        except (TypeError, ValueError):
-            return jsonify({'error': 'Invalid token payload'}), 401
-        
-        if not Mechanic.query.get(mech_id):
-            return jsonify({'error': 'Invalid token payload'}), 401
-
+        mech_id, error = _authenticate('mechanic', Mechanic)
+        if error:
+            return error
         return f(mech_id, *args, **kwargs)
 
     return wrapper
 
 def encode_customer_token(customer_id):
-    payload = {'sub': str(customer_id)}
+    payload = {'sub': str(customer_id), 'kind': 'customer'}
     key = current_app.config['SECRET_KEY']
     algo = current_app.config.get('JWT_ALGO', 'HS256')
     return jwt.encode(payload, key, algorithm=algo)
@@ -54,30 +77,9 @@ def encode_customer_token(customer_id):
 def customer_required(f):
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
-        auth = request.headers.get('Authorization', '')
-        parts = auth.split()
-        if len(parts) != 2 or parts[0].lower() != 'bearer':
-            return jsonify({'error': 'Missing or invalid Authorization header'}), 401
-
-        token = parts[1]
-        try:
-            data = jwt.decode(
-                token,
-                current_app.config['SECRET_KEY'],
-                algorithms=[current_app.config.get('JWT_ALGO', 'HS256')]
-            )
-        except InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-
-        sub = data.get('sub')
-        try:
-            cust_id = int(sub)
-        except (TypeError, ValueError):
-            return jsonify({'error': 'Invalid token payload'}), 401
-
-        if not Customer.query.get(cust_id):
-            return jsonify({'error': 'Invalid token payload'}), 401
-
+        cust_id, error = _authenticate('customer', Customer)
+        if error:
+            return error
         return f(cust_id, *args, **kwargs)
 
     return wrapper
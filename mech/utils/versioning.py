@@ -0,0 +1,106 @@
+import hashlib
+from flask import jsonify, request, Response
+from sqlalchemy import inspect, update
+from sqlalchemy.orm.exc import StaleDataError
+from mech.extensions import db
+
+#### never settable from a request body
+PROTECTED_FIELDS = frozenset({'id', 'version'})
+
+
+def etag_for(obj):
+    """Strong ETag of one row, from its table, id and version_id_col."""
+    return f'{obj.__tablename__}-{obj.id}-v{obj.version}'
+
+
+def collection_etag(*groups, meta=None):
+    """ETag of a list response, from the (table, id, version) of every row it shows.
+
+    Pass the listed rows and any nested rows whose fields appear in the body,
+    plus ``meta`` for the pagination block, so the tag changes exactly when
+    the serialized body would.
+    """
+    digest = hashlib.sha1()
+    for group in groups:
+        for obj in group:
+            digest.update(f'{obj.__tablename__}:{obj.id}:{obj.version};'.encode())
+    if meta is not None:
+        digest.update(repr(sorted(meta.items())).encode())
+    return digest.hexdigest()[:32]
+
+
+def not_modified(etag):
+    """304 for ``etag`` if the request's If-None-Match already has it, else None."""
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+    return None
+
+
+def precondition_failed(obj):
+    """412 if the request's If-Match doesn't name ``obj``'s current version, else None."""
+    if request.if_match and not request.if_match.contains(etag_for(obj)):
+        resp = jsonify({'error': 'Precondition failed: the resource has changed'})
+        resp.status_code = 412
+        resp.set_etag(etag_for(obj))
+        return resp
+    return None
+
+
+def apply_updates(obj, data, setters=None):
+    """Copy ``data`` onto ``obj``'s columns; an error message for unknown or protected fields.
+
+    ``setters`` maps a field to a callable(obj, value) for fields that need
+    more than setattr (e.g. hashing a password).
+    """
+    if not isinstance(data, dict):
+        return 'Request body must be a JSON object'
+    columns = set(inspect(type(obj)).columns.keys())
+    bad = sorted(k for k in data if k in PROTECTED_FIELDS or k not in columns)
+    if bad:
+        return f"Unknown or read-only field(s): {', '.join(bad)}"
+    setters = setters or {}
+    for key, value in data.items():
+        if key in setters:
+            setters[key](obj, value)
+        else:
+            setattr(obj, key, value)
+    return None
+
+
+def commit_versioned():
+    """Commit; a 409 response if a concurrent write got to a versioned row first, else None.
+
+    The ORM adds ``WHERE version = <loaded version>`` to every UPDATE and
+    DELETE of a versioned row, so a lost race surfaces as StaleDataError
+    instead of silently overwriting the other write.
+    """
+    try:
+        db.session.commit()
+    except StaleDataError:
+        return _conflict()
+    return None
+
+
+def bump_version(obj):
+    """Move a row's version on for a change stored in another table (e.g. its links).
+
+    Conditional on the version ``obj`` was loaded at, like the ORM's own
+    versioned UPDATE; a 409 response if a concurrent write moved it first, else None.
+    Call it before writing the change, so a lost race writes nothing.
+    """
+    model = type(obj)
+    result = db.session.execute(
+        update(model)
+        .where(model.id == obj.id, model.version == obj.version)
+        .values(version=model.version + 1)
+    )
+    if result.rowcount == 0:
+        return _conflict()
+    return None
+
+
+def _conflict():
+    db.session.rollback()
+    return jsonify({'error': 'Conflict: the resource was modified concurrently, reload and retry'}), 409
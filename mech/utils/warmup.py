@@ -0,0 +1,143 @@
+import glob
+import logging
+import os
+import weakref
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import StaticPool
+from mech.utils.fast_dump import compile_all
+
+log = logging.getLogger('mech.warmup')
+
+
+class Warmup:
+    """Fork safety and cold-start work for gunicorn workers.
+
+    A forked child must not reuse the parent's pooled connections: two
+    processes would share one socket. Every app's engines are disposed
+    (``close=False``, so the parent's connections stay open for the parent)
+    in the child right after any fork, which covers ``preload_app``.
+
+    ``warm(app)`` runs before a worker takes traffic (``post_worker_init`` in
+    gunicorn.conf.py): it configures the ORM mappers, compiles the schemas'
+    dump functions, opens up to ``WARMUP_CONNECTIONS`` pooled connections per
+    engine, builds the inventory catalog and starts the password hashing
+    pool. Each step that fails is logged and skipped; the worker still starts.
+
+    ``reset(config)`` runs once when the server starts (``on_starting``) and
+    clears what the previous run left on the host for ``config``: metrics
+    snapshots, the shared-memory cache and the SQLite rate-limit counters.
+    """
+
+    def __init__(self):
+        self._apps = weakref.WeakSet()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def init_app(self, app):
+        self._apps.add(app)
+
+    def _after_fork(self):
+        from mech.extensions import db
+        for app in list(self._apps):
+            with app.app_context():
+                for engine in db.engines.values():
+                    #### a StaticPool's one connection is the database (in-memory SQLite);
+                    #### the child's copy of it is already private
+                    if not isinstance(engine.pool, StaticPool):
+                        engine.dispose(close=False)
+
+    def warm(self, app):
+        """Do the first-request work of ``app`` now; returns the names of the steps that ran."""
+        if not app.config.get('WARMUP_ENABLED', True):
+            return []
+        done = []
+        with app.app_context():
+            for name, step in (('mappers', configure_mappers), ('schemas', compile_all),
+                               ('connections', self._connections), ('catalog', self._catalog),
+                               ('password_hasher', self._password_hasher)):
+                try:
+                    step()
+                except Exception:
+                    log.exception('warmup step %s failed', name)
+                else:
+                    done.append(name)
+        return done
+
+    def reset(self, config):
+        """Clear the per-host state a previous run left behind; returns the names of the steps that ran."""
+        done = []
+        for name, step in (('metrics', self._reset_metrics), ('cache', self._reset_cache),
+                           ('ratelimit', self._reset_ratelimit)):
+            try:
+                ran = step(config)
+            except Exception:
+                log.exception('reset step %s failed', name)
+            else:
+                if ran:
+                    done.append(name)
+        return done
+
+    @staticmethod
+    def _reset_metrics(config):
+        #### snapshots left by the previous run's workers would be summed into /metrics forever
+        if not config.get('METRICS_DIR'):
+            return False
+        for path in glob.glob(os.path.join(config['METRICS_DIR'], 'metrics-*.json')):
+            os.remove(path)
+        return True
+
+    @staticmethod
+    def _reset_cache(config):
+        from mech.utils.shm_cache import SharedMemoryCache
+        if config.get('CACHE_TYPE') != 'mech.utils.shm_cache.SharedMemoryCache':
+            return False
+        #### a preloaded app already has the file open, so clear it in place rather than delete it
+        shared = SharedMemoryCache(**SharedMemoryCache.config_kwargs(config))
+        try:
+            shared.clear()
+        finally:
+            shared.close()
+        return True
+
+    @staticmethod
+    def _reset_ratelimit(config):
+        from mech.utils.ratelimit import SQLiteStorage
+        uri = config.get('RATELIMIT_STORAGE_URI') or ''
+        if not config.get('RATELIMIT_ENABLED', True) or not uri.startswith('sqlite:'):
+            return False
+        SQLiteStorage(uri).reset()
+        return True
+
+    @staticmethod
+    def _connections():
+        from mech.extensions import db
+        wanted = current_app.config.get('WARMUP_CONNECTIONS', 2)
+        for engine in db.engines.values():
+            size = engine.pool.size() if hasattr(engine.pool, 'size') else 1
+            conns = []
+            try:
+                for _ in range(min(wanted, size)):
+                    conn = engine.connect()
+                    conns.append(conn)
+                    conn.execute(text('SELECT 1'))
+            finally:
+                for conn in conns:
+                    conn.close()
+
+    @staticmethod
+    def _catalog():
+        from mech.extensions import db
+        from mech.utils.catalog import inventory_catalog
+        try:
+            inventory_catalog.snapshot()
+        finally:
+            db.session.remove()
+
+    @staticmethod
+    def _password_hasher():
+        state = current_app.extensions['password_hasher']
+        if state.pool_size:
+            executor = state.executor()
+            for future in [executor.submit(os.getpid) for _ in range(state.pool_size)]:
+                future.result()
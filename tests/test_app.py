@@ -0,0 +1,25 @@
+import unittest
+from unittest import mock
+from mech import create_app
+from mech.config import TestingConfig
+
+
+class CreateAppTestCase(unittest.TestCase):
+    def test_docs_disabled(self):
+        with mock.patch.object(TestingConfig, 'DOCS_ENABLED', False, create=True):
+            app = create_app('TestingConfig')
+        client = app.test_client()
+        self.assertEqual(client.get('/swagger.json').status_code, 404)
+        self.assertEqual(client.get('/docs/').status_code, 404)
+        self.assertNotIn('swagger-export', app.cli.list_commands(None))
+
+    def test_migrate_enabled(self):
+        for enabled in (True, False):
+            with self.subTest(enabled=enabled):
+                with mock.patch.object(TestingConfig, 'MIGRATE_ENABLED', enabled, create=True):
+                    app = create_app('TestingConfig')
+                self.assertEqual('migrate' in app.extensions, enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,12 @@
 import unittest
 import json
 from datetime import date
+from unittest import mock
 from werkzeug.security import generate_password_hash
 from mech import create_app
-from mech.extensions import db
+from mech.extensions import db, password_hasher
 from mech.models import Customer
+from sqlalchemy import update
 
 class CustomerTestCase(unittest.TestCase):
     def setUp(self):
@@ -74,6 +76,67 @@ class CustomerTestCase(unittest.TestCase):
         )
         self.assertEqual(resp.status_code, 401)
 
+    def test_customer_login_rehashes_old_parameters(self):
+        payload = {'email': 'seed@example.com', 'password': 'seedpass'}
+        with self.app.app_context():
+            self.assertTrue(db.session.get(Customer, self.seed_id).password.startswith('scrypt:'))
+        resp = self.client.post(
+            '/customers/login',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 200)
+        with self.app.app_context():
+            stored = db.session.get(Customer, self.seed_id).password
+            self.assertTrue(stored.startswith('pbkdf2:sha256:1000$'))
+            self.assertFalse(password_hasher.needs_rehash(stored))
+            self.assertGreaterEqual(password_hasher.stats()['completed'], 2)
+        #### the rehashed password still logs in
+        resp = self.client.post(
+            '/customers/login',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 200)
+
+    def test_customer_login_concurrent_rehash(self):
+        hash_ = password_hasher.hash
+
+        def racing_hash(password):
+            #### another login rehashes and commits between our read and our commit
+            with db.engine.begin() as conn:
+                conn.execute(update(Customer).where(Customer.id == self.seed_id)
+                             .values(version=Customer.version + 1))
+            return hash_(password)
+
+        with mock.patch.object(password_hasher, 'hash', side_effect=racing_hash):
+            resp = self.client.post(
+                '/customers/login',
+                data=json.dumps({'email': 'seed@example.com', 'password': 'seedpass'}),
+                content_type='application/json'
+            )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()['customer'], self.seed_id)
+        self.assertIn('auth_token', resp.get_json())
+
+    def test_customer_login_busy_hasher(self):
+        self.app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = 0
+        self.app.config['PASSWORD_HASH_MAX_CONCURRENCY'] = 1
+        with self.app.app_context():
+            password_hasher.init_app(self.app)
+            state = self.app.extensions['password_hasher']
+            state._slots.acquire()
+            try:
+                resp = self.client.post(
+                    '/customers/login',
+                    data=json.dumps({'email': 'seed@example.com', 'password': 'seedpass'}),
+                    content_type='application/json'
+                )
+            finally:
+                state._slots.release()
+            self.assertEqual(resp.status_code, 503)
+            self.assertEqual(password_hasher.stats()['rejected'], 1)
+
     def test_list_customers_pagination(self):
         #### create extra to test pagination
         with self.app.app_context():
@@ -90,6 +153,51 @@ class CustomerTestCase(unittest.TestCase):
         self.assertIsInstance(body['customers'], list)
         self.assertIn('meta', body)
 
+    def test_list_customers_cursor(self):
+        with self.app.app_context():
+            for i in range(4):
+                db.session.add(Customer(
+                    name=f'Extra{i}',
+                    email=f'extra{i}@example.com',
+                    phone='555-1111',
+                    password='x'
+                ))
+            db.session.commit()
+
+        first = self.client.get('/customers/?cursor=&per_page=2&total=exact').get_json()
+        self.assertEqual(len(first['customers']), 2)
+        self.assertEqual(first['meta']['total'], 5)
+        self.assertIsNone(first['meta']['prev'])
+
+        second = self.client.get(f"/customers/?cursor={first['meta']['next']}&per_page=2").get_json()
+        third = self.client.get(f"/customers/?cursor={second['meta']['next']}&per_page=2").get_json()
+        self.assertNotIn('total', second['meta'])
+        self.assertEqual(len(third['customers']), 1)
+        self.assertIsNone(third['meta']['next'])
+
+        ids = [c['id'] for page in (first, second, third) for c in page['customers']]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 5)
+
+        back = self.client.get(f"/customers/?cursor={third['meta']['prev']}&per_page=2").get_json()
+        self.assertEqual(back['customers'], second['customers'])
+        self.assertIsNotNone(back['meta']['prev'])
+
+    def test_list_customers_cursor_counter_total(self):
+        resp = self.client.get('/customers/?cursor=&total=counter')
+        self.assertEqual(resp.get_json()['meta']['total'], 1)
+        self.client.post(
+            '/customers/',
+            data=json.dumps({'name': 'N', 'email': 'n@example.com', 'phone': '1', 'password': 'p'}),
+            content_type='application/json'
+        )
+        resp = self.client.get('/customers/?cursor=&total=counter')
+        self.assertEqual(resp.get_json()['meta']['total'], 2)
+
+    def test_list_customers_invalid_cursor(self):
+        self.assertEqual(self.client.get('/customers/?cursor=garbage').status_code, 400)
+        self.assertEqual(self.client.get('/customers/?cursor=&total=lots').status_code, 400)
+
     def test_update_customer_success(self):
         payload = {'phone': '999-9999'}
         resp = self.client.put(
@@ -101,6 +209,41 @@ class CustomerTestCase(unittest.TestCase):
         body = resp.get_json()
         self.assertEqual(body['phone'], '999-9999')
 
+    def test_update_customer_if_match(self):
+        first = self.client.put(f'/customers/{self.seed_id}', json={'phone': '1'})
+        etag = first.headers['ETag']
+        resp = self.client.put(f'/customers/{self.seed_id}', json={'phone': '2'},
+                               headers={'If-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers['ETag'], etag)
+
+        #### a second writer still holding the old ETag is refused
+        resp = self.client.put(f'/customers/{self.seed_id}', json={'phone': '3'},
+                               headers={'If-Match': etag})
+        self.assertEqual(resp.status_code, 412)
+        with self.app.app_context():
+            self.assertEqual(db.session.get(Customer, self.seed_id).phone, '2')
+
+    def test_update_customer_rejects_unknown_and_read_only_fields(self):
+        for payload in ({'version': 7}, {'id': 5}, {'nickname': 'x'}):
+            resp = self.client.put(f'/customers/{self.seed_id}', json=payload)
+            self.assertEqual(resp.status_code, 400, payload)
+
+    def test_get_customers_if_none_match(self):
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+        etag = self.client.get('/customers/').headers['ETag']
+        self.assertEqual(self.client.get('/customers/', headers={'If-None-Match': etag}).status_code, 304)
+        self.client.put(f'/customers/{self.seed_id}', json={'name': 'New name'})
+        resp = self.client.get('/customers/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers['ETag'], etag)
+
+        #### served from the response cache, the ETag still short-circuits
+        self.app.config['RESPONSE_CACHE_ENABLED'] = True
+        etag = self.client.get('/customers/').headers['ETag']
+        resp = self.client.get('/customers/', headers={'If-None-Match': etag})
+        self.assertEqual((resp.status_code, resp.headers['X-Cache']), (304, 'HIT'))
+
     def test_update_customer_not_found(self):
         resp = self.client.put(
             '/customers/999',
@@ -0,0 +1,132 @@
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from marshmallow import Schema, fields, post_dump
+from mech import create_app
+from mech.extensions import db
+from mech.models import Customer, Inventory, Mechanic, ServiceTicket
+from mech.utils.fast_dump import CompiledDump
+from mech.utils.rows import TicketRow, load_ticket_row_relations
+from mech.blueprints.customers.schemas import customer_schema, customers_schema, dump_customer, dump_customers
+from mech.blueprints.inventory.schemas import inventory_schema, inventories_schema, dump_inventory, dump_inventories
+from mech.blueprints.mechanics.schemas import mechanic_schema, mechanics_schema, dump_mechanic, dump_mechanics
+from mech.blueprints.service_tickets.schemas import (
+    service_ticket_schema, service_tickets_schema, dump_service_ticket, dump_service_tickets
+)
+
+PAIRS = [
+    (customer_schema, dump_customer), (customers_schema, dump_customers),
+    (inventory_schema, dump_inventory), (inventories_schema, dump_inventories),
+    (mechanic_schema, dump_mechanic), (mechanics_schema, dump_mechanics),
+    (service_ticket_schema, dump_service_ticket), (service_tickets_schema, dump_service_tickets),
+]
+
+
+class FastDumpTestCase(unittest.TestCase):
+    """Every compiled dump against marshmallow's own ``dump`` of the same input."""
+
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        customers = [Customer(name=f'C{i}', email=f'c{i}@ex.com', phone=f'555-{i}', password='x') for i in range(3)]
+        mechanics = [Mechanic(name=f'M{i}', email=f'm{i}@ex.com', phone='1', salary=40000 + i, password='x')
+                     for i in range(3)]
+        parts = [Inventory(name=f'P{i}', price=i + 0.25) for i in range(3)]
+        db.session.add_all(customers + mechanics + parts)
+        db.session.commit()
+        tickets = [ServiceTicket(vin=f'VIN{i}', service_date=date(2025, 4, 20 + i), service_desc='Oil',
+                                 customer_id=customers[i % 3].id) for i in range(4)]
+        db.session.add_all(tickets)
+        db.session.commit()
+        tickets[0].mechanics.append(mechanics[0])
+        tickets[0].mechanics.append(mechanics[2])
+        tickets[1].mechanics.append(mechanics[1])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _same(self, schema, compiled, obj, **kwargs):
+        self.assertEqual(compiled(obj, **kwargs), schema.dump(obj, **kwargs))
+
+    def _rows(self, schema):
+        model = schema.Meta.model
+        return db.session.scalars(db.select(model).order_by(model.id)).all()
+
+    def test_orm_rows(self):
+        for schema, compiled in PAIRS:
+            rows = self._rows(schema)
+            with self.subTest(schema=schema):
+                if schema.many:
+                    self._same(schema, compiled, rows)
+                    self._same(schema, compiled, [])
+                    self._same(schema, compiled, rows[0], many=False)
+                else:
+                    self._same(schema, compiled, rows[0])
+                    self._same(schema, compiled, rows, many=True)
+
+    def test_ticket_rows(self):
+        tickets = load_ticket_row_relations(TicketRow.load(TicketRow.select().order_by(ServiceTicket.id)))
+        self.assertEqual(dump_service_tickets(tickets)[0]['mechanics'], [{'id': 1, 'name': 'M0'}, {'id': 3, 'name': 'M2'}])
+        self._same(service_tickets_schema, dump_service_tickets, tickets)
+
+    def test_nested_only_and_dates(self):
+        ticket = self._rows(service_tickets_schema)[1]
+        out = dump_service_ticket(ticket)
+        self.assertEqual(out['customer'], {'id': ticket.customer_id, 'name': 'C1'})
+        self.assertEqual(out['mechanics'], [{'id': 2, 'name': 'M1'}])
+        self.assertIs(type(out['service_date']), date)
+
+    def test_missing_none_and_odd_values(self):
+        objects = [
+            SimpleNamespace(id=1, name='Only two'),
+            SimpleNamespace(id='7', name=b'bytes', email=None, phone=5551234, price='2.5', salary=None,
+                            vin=12, service_date='2025-01-01', customer=None, mechanics=None),
+            SimpleNamespace(id=2, customer=SimpleNamespace(id=3, name='Cust', email='hidden'),
+                            mechanics=(SimpleNamespace(id=4, name='Mech', salary=1),)),
+            {'id': 5, 'name': 'a dict', 'price': 1},
+            Customer(name=None, email='x@ex.com'),
+        ]
+        for schema, compiled in PAIRS:
+            for obj in objects:
+                with self.subTest(schema=schema, obj=obj):
+                    self._same(schema, compiled, obj, many=False)
+
+    def test_unsupported_fields_and_hooks_use_marshmallow(self):
+        class Odd(Schema):
+            renamed = fields.Integer(attribute='number', data_key='n')
+            dotted = fields.String(attribute='inner.name')
+            defaulted = fields.String(dump_default='none')
+            method = fields.Method('shout')
+            when = fields.Date()
+
+            def shout(self, obj):
+                return obj.word.upper()
+
+        class Hooked(Schema):
+            id = fields.Integer()
+
+            @post_dump
+            def wrap(self, data, **kwargs):
+                return {'wrapped': data}
+
+        class Accessor(Schema):
+            id = fields.Integer()
+            word = fields.String()
+
+            def get_attribute(self, obj, attr, default):
+                return 42 if attr == 'id' else super().get_attribute(obj, attr, default)
+
+        obj = SimpleNamespace(number='3', inner=SimpleNamespace(name='in'), word='hi', when=date(2025, 1, 2), id=1)
+        for schema in (Odd(), Odd(many=True), Hooked(), Accessor()):
+            value = [obj, obj] if schema.many else obj
+            with self.subTest(schema=schema):
+                self._same(schema, CompiledDump(schema), value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from marshmallow import Schema, ValidationError, fields, validates
+from mech import create_app
+from mech.extensions import db
+from mech.models import Customer
+from mech.utils.fast_load import CompiledLoad
+from mech.blueprints.customers.schemas import load_customer, load_customer_update, load_login
+from mech.blueprints.inventory.schemas import load_inventory, load_inventory_update, load_add_part
+from mech.blueprints.mechanics.schemas import load_mechanic, load_mechanic_update
+from mech.blueprints.service_tickets.schemas import (
+    load_service_ticket, load_service_ticket_update, load_bulk_ticket,
+    load_ticket_mechanics_edit
+)
+
+LOADERS = [
+    load_customer, load_customer_update, load_login,
+    load_inventory, load_inventory_update, load_add_part,
+    load_mechanic, load_mechanic_update,
+    load_service_ticket, load_service_ticket_update, load_bulk_ticket, load_ticket_mechanics_edit,
+]
+
+BODIES = [
+    {},
+    {'name': 'Jane', 'email': 'jane@ex.com', 'phone': '555-1234', 'password': 'pw'},
+    {'name': 'x' * 101, 'email': 5, 'phone': None, 'password': b'pw', 'nickname': 'J'},
+    {'id': 3, 'version': 2, 'name': 'Pad', 'price': 9.5},
+    {'name': 'Pad', 'price': '9.5'},
+    {'price': float('nan')},
+    {'price': 3, 'salary': '58000'},
+    {'salary': True, 'part_id': '5'},
+    {'part_id': 5},
+    {'email': 'm@ex.com', 'password': ''},
+    {'vin': '1HGCM82633A004352', 'service_date': '2025-05-01', 'service_desc': 'Oil', 'customer_id': 1},
+    {'vin': 'V' * 18, 'service_date': '05/01/2025', 'service_desc': 'Oil', 'customer_id': 1.5},
+    {'service_date': [2025, 5, 1], 'mechanic_ids': [1, 2]},
+    {'mechanic_ids': [1, '2', True], 'customer': {'id': 1}},
+    {'add_ids': [1, 2], 'remove_ids': []},
+    {'add_ids': ['1'], 'remove_ids': 3},
+    [],
+    'not an object',
+    None,
+]
+
+
+class FastLoadTestCase(unittest.TestCase):
+    """Every compiled loader against marshmallow's own ``load`` of the same body."""
+
+    def _result(self, load, body):
+        try:
+            return 'ok', load(body)
+        except ValidationError as e:
+            return 'error', e.messages
+
+    def _reference(self, loader, body):
+        return self._result(lambda data: loader.schema.load(data, partial=loader.partial), body)
+
+    def test_compiled(self):
+        for loader in LOADERS:
+            with self.subTest(schema=loader.schema):
+                self.assertNotEqual(loader._load.__name__, '<lambda>')
+
+    def test_matches_marshmallow(self):
+        for loader in LOADERS:
+            for body in BODIES:
+                with self.subTest(schema=loader.schema, partial=loader.partial, body=body):
+                    self.assertEqual(self._result(loader, body), self._reference(loader, body))
+
+    def test_messages(self):
+        with self.assertRaises(ValidationError) as caught:
+            load_inventory({'id': 1, 'price': 'cheap'})
+        self.assertEqual(caught.exception.messages, {
+            'id': ['Unknown field.'],
+            'name': ['Missing data for required field.'],
+            'price': ['Not a valid number.'],
+        })
+        self.assertEqual(load_inventory_update({'price': 2}), {'price': 2.0})
+
+    def test_hooks_use_marshmallow(self):
+        class Checked(Schema):
+            n = fields.Integer()
+
+            @validates('n')
+            def positive(self, value, **kwargs):
+                if value < 1:
+                    raise ValidationError('Must be positive.')
+
+        class Defaulted(Schema):
+            n = fields.Integer(load_default=7)
+
+        for schema, body in ((Checked(), {'n': 0}), (Defaulted(), {})):
+            loader = CompiledLoad(schema)
+            with self.subTest(schema=schema):
+                self.assertEqual(loader._load.__name__, '<lambda>')
+                self.assertEqual(self._result(loader, body), self._reference(loader, body))
+
+
+class ValidationRoutesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Customer(name='Cust', email='cust@ex.com', phone='1', password='x'))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_rejected_before_any_query(self):
+        for method, url, body in [
+            ('post', '/customers/', {'name': 'Jane', 'email': 'j@ex.com', 'phone': '1', 'password': 'x', 'admin': True}),
+            ('put', '/customers/1', {'version': 9}),
+            ('put', '/customers/1', {'phone': 5551234}),
+            ('post', '/customers/login', {'email': 'cust@ex.com'}),
+        ]:
+            with self.subTest(url=url, body=body):
+                resp = getattr(self.client, method)(url, json=body)
+                self.assertEqual(resp.status_code, 400)
+                self.assertEqual(resp.get_json()['error'], 'Invalid request body')
+                self.assertEqual(resp.headers['X-Query-Count'], '0')
+
+    def test_valid_update(self):
+        resp = self.client.put('/customers/1', json={'phone': '555-0000'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()['phone'], '555-0000')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import json
+from datetime import date
+from sqlalchemy import update
+from werkzeug.security import generate_password_hash
+from mech import create_app
+from mech.extensions import db, identity_cache, response_cache
+from mech.models import Customer, Inventory, Mechanic, ServiceTicket
+from mech.utils.sql_stats import QueryCounter
+
+
+class IdentityCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            cust = Customer(name='Cust', email='cust@ex.com', phone='555-1000', password='x')
+            mech = Mechanic(name='Mech', email='mech@ex.com', phone='555-2000', salary=40000,
+                            password=generate_password_hash('mpass'))
+            part = Inventory(name='Filter', price=9.5)
+            db.session.add_all([cust, mech, part])
+            db.session.commit()
+            tickets = [ServiceTicket(vin=f'VIN{i}', service_date=date(2025, 4, 22),
+                                     service_desc='Service', customer_id=cust.id) for i in range(2)]
+            db.session.add_all(tickets)
+            db.session.commit()
+            self.mech_id, self.part_id = mech.id, part.id
+            self.ticket_ids = [t.id for t in tickets]
+        token = self.client.post(
+            '/mechanics/login',
+            data=json.dumps({'email': 'mech@ex.com', 'password': 'mpass'}),
+            content_type='application/json'
+        ).get_json()['auth_token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def _lookup(self, model, id):
+        """One request's worth of ``identity_cache.get``: (name or None, queries)."""
+        with self.app.app_context():
+            with QueryCounter() as q:
+                obj = identity_cache.get(model, id)
+                name = obj.name if obj is not None else None
+            db.session.remove()
+        return name, q.count
+
+    def test_repeat_lookups_skip_the_select(self):
+        part_selects = []
+        for ticket_id in self.ticket_ids:
+            with QueryCounter() as q:
+                resp = self.client.post(f'/inventory/{ticket_id}/add_part',
+                                        json={'part_id': self.part_id}, headers=self.headers)
+            self.assertEqual(resp.status_code, 200)
+            part_selects.append(sum('FROM inventory \nWHERE inventory.id' in s for s in q.statements))
+        self.assertEqual(part_selects, [1, 0])
+        self.assertEqual(self._lookup(Mechanic, self.mech_id), ('Mech', 0))
+        with self.app.app_context():
+            stats = identity_cache.stats()
+        self.assertGreaterEqual(stats['Inventory']['hits'], 1)
+
+    def test_writes_invalidate(self):
+        self._lookup(Mechanic, self.mech_id)
+        resp = self.client.put(f'/mechanics/{self.mech_id}', json={'name': 'Renamed'}, headers=self.headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._lookup(Mechanic, self.mech_id), ('Renamed', 1))
+        #### the cached version is the new one, so If-Match on it still succeeds
+        resp = self.client.put(f'/mechanics/{self.mech_id}', json={'name': 'Again'},
+                               headers={**self.headers, 'If-Match': resp.headers['ETag']})
+        self.assertEqual(resp.status_code, 200)
+
+        self._lookup(Inventory, self.part_id)
+        self.assertEqual(self.client.delete(f'/inventory/{self.part_id}', headers=self.headers).status_code, 200)
+        self.assertEqual(self._lookup(Inventory, self.part_id), (None, 1))
+
+    def test_rolled_back_write_keeps_entry(self):
+        self._lookup(Mechanic, self.mech_id)
+        with self.app.app_context():
+            identity_cache.get(Mechanic, self.mech_id).name = 'Uncommitted'
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(self._lookup(Mechanic, self.mech_id), ('Mech', 0))
+
+    def test_row_token_bumped_elsewhere_forces_reload(self):
+        #### what another worker's commit looks like from here: the row changes
+        #### and its token in the shared cache moves on
+        self._lookup(Mechanic, self.mech_id)
+        with self.app.app_context():
+            db.session.execute(update(Mechanic).where(Mechanic.id == self.mech_id).values(name='Elsewhere'))
+            db.session.commit()
+        self.assertEqual(self._lookup(Mechanic, self.mech_id), ('Mech', 0))
+        with self.app.app_context():
+            response_cache.bump([f'row:mechanics:{self.mech_id}'])
+        self.assertEqual(self._lookup(Mechanic, self.mech_id), ('Elsewhere', 1))
+
+    def test_stale_row_cannot_overwrite(self):
+        self._lookup(Mechanic, self.mech_id)
+        with self.app.app_context():
+            db.session.execute(update(Mechanic).where(Mechanic.id == self.mech_id)
+                               .values(name='Elsewhere', version=Mechanic.version + 1))
+            db.session.commit()
+        resp = self.client.put(f'/mechanics/{self.mech_id}', json={'name': 'Mine'}, headers=self.headers)
+        self.assertEqual(resp.status_code, 409)
+
+    def test_stale_row_cannot_be_deleted(self):
+        self._lookup(Inventory, self.part_id)
+        with self.app.app_context():
+            db.session.execute(update(Inventory).where(Inventory.id == self.part_id)
+                               .values(price=1, version=Inventory.version + 1))
+            db.session.commit()
+        resp = self.client.delete(f'/inventory/{self.part_id}', headers=self.headers)
+        self.assertEqual(resp.status_code, 409)
+        with self.app.app_context():
+            self.assertIsNotNone(db.session.get(Inventory, self.part_id))
+
+    def test_size_and_ttl_limits(self):
+        self.app.config['IDENTITY_CACHE'] = {'Mechanic': (1, 60), 'Inventory': (10, 0)}
+        identity_cache.init_app(self.app)
+        with self.app.app_context():
+            other = Mechanic(name='Other', email='other@ex.com', phone='1', salary=1, password='x')
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+        self._lookup(Mechanic, self.mech_id)
+        self._lookup(Mechanic, other_id)
+        self.assertEqual(self._lookup(Mechanic, self.mech_id), ('Mech', 1))
+        self._lookup(Inventory, self.part_id)
+        self.assertEqual(self._lookup(Inventory, self.part_id), ('Filter', 1))
+        #### models left out of the config aren't cached at all
+        self.assertEqual(self._lookup(Customer, 1), ('Cust', 1))
+        self.assertEqual(self._lookup(Customer, 1), ('Cust', 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,9 @@ from datetime import date
 from werkzeug.security import generate_password_hash
 from mech import create_app
 from mech.extensions import db
-from mech.models import Inventory, Customer, Mechanic, ServiceTicket
+from mech.utils.sql_stats import QueryCounter
+from mech.models import Inventory, InventoryChange, Customer, Mechanic, ServiceTicket
+from mech.utils.catalog import inventory_catalog
 
 class InventoryTestCase(unittest.TestCase):
     def setUp(self):
@@ -73,6 +75,116 @@ class InventoryTestCase(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertIsInstance(resp.get_json(), list)
 
+    def _write(self, method, path, payload=None):
+        resp = self.client.open(path, method=method, json=payload,
+                                headers={'Authorization': f'Bearer {self.token}'})
+        self.assertLess(resp.status_code, 300)
+        return resp.get_json()
+
+    def test_get_parts_conditional(self):
+        self._write('POST', '/inventory/', {'name': 'Filter', 'price': 9.99})
+        first = self.client.get('/inventory/')
+        etag = first.headers['ETag']
+        self.assertEqual([p['name'] for p in first.get_json()], ['Filter'])
+
+        with QueryCounter() as q:
+            resp = self.client.get('/inventory/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 304)
+        #### only the version lookup; nothing is re-read or re-serialized
+        self.assertEqual(q.count, 1)
+
+        self._write('POST', '/inventory/', {'name': 'Pad', 'price': 1.5})
+        resp = self.client.get('/inventory/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers['ETag'], etag)
+        self.assertEqual([p['name'] for p in resp.get_json()], ['Filter', 'Pad'])
+
+    def test_get_parts_pages(self):
+        for i in range(5):
+            self._write('POST', '/inventory/', {'name': f'P{i}', 'price': i})
+        body = self.client.get('/inventory/?page=2&per_page=2').get_json()
+        self.assertEqual([p['name'] for p in body['parts']], ['P2', 'P3'])
+        self.assertEqual((body['meta']['total'], body['meta']['pages']), (5, 3))
+        self.assertEqual(self.client.get('/inventory/?page=0').status_code, 400)
+        self.assertEqual(self.client.get('/inventory/?per_page=x').status_code, 400)
+        for bad in ('page=%C2%B2', 'since=-1', 'since=', 'per_page=1.5'):
+            self.assertEqual(self.client.get(f'/inventory/?{bad}').status_code, 400, bad)
+
+    def test_get_parts_since_version(self):
+        kept = self._write('POST', '/inventory/', {'name': 'Kept', 'price': 1})
+        doomed = self._write('POST', '/inventory/', {'name': 'Doomed', 'price': 2})
+        #### so SQLite doesn't hand the deleted id straight back out
+        self._write('POST', '/inventory/', {'name': 'Last', 'price': 5})
+        version = int(self.client.get('/inventory/').headers['X-Catalog-Version'])
+
+        self._write('PUT', f"/inventory/{kept['id']}", {'price': 3})
+        self._write('DELETE', f"/inventory/{doomed['id']}")
+        added = self._write('POST', '/inventory/', {'name': 'New', 'price': 4})
+
+        body = self.client.get(f'/inventory/?since={version}').get_json()
+        self.assertEqual([(p['id'], p['price']) for p in body['changed']],
+                         [(kept['id'], 3), (added['id'], 4)])
+        self.assertEqual(body['deleted'], [doomed['id']])
+        self.assertEqual(body['version'], version + 3)
+
+        body = self.client.get(f"/inventory/?since={body['version']}").get_json()
+        self.assertEqual((body['changed'], body['deleted']), ([], []))
+        self.assertEqual(self.client.get('/inventory/?since=999').status_code, 400)
+
+    def test_get_parts_since_pruned_version_is_full(self):
+        self.app.config['CATALOG_CHANGE_LOG_VERSIONS'] = 2
+        first = self._write('POST', '/inventory/', {'name': 'A', 'price': 1})
+        version = int(self.client.get('/inventory/').headers['X-Catalog-Version'])
+        body = self.client.get(f'/inventory/?since={version}').get_json()
+        self.assertFalse(body['full'])
+        for i in range(3):
+            self._write('PUT', f"/inventory/{first['id']}", {'price': i + 2})
+
+        body = self.client.get(f'/inventory/?since={version}').get_json()
+        self.assertTrue(body['full'])
+        self.assertEqual([p['price'] for p in body['changed']], [4])
+        body = self.client.get(f"/inventory/?since={body['version'] - 1}").get_json()
+        self.assertFalse(body['full'])
+        with self.app.app_context():
+            self.assertEqual(db.session.query(InventoryChange).count(), 2)
+
+    def test_rolled_back_write_keeps_version(self):
+        with self.app.app_context():
+            before = inventory_catalog.current_version()
+            db.session.add(Inventory(name='Gone', price=1))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(inventory_catalog.current_version(), before)
+
+    def test_update_part_if_match(self):
+        part = self._write('POST', '/inventory/', {'name': 'F', 'price': 5.55})
+        headers = {'Authorization': f'Bearer {self.token}'}
+        etag = self.client.put(f"/inventory/{part['id']}", json={'price': 6}, headers=headers).headers['ETag']
+        self.client.put(f"/inventory/{part['id']}", json={'price': 7}, headers=headers)
+        resp = self.client.put(f"/inventory/{part['id']}", json={'price': 8},
+                               headers=dict(headers, **{'If-Match': etag}))
+        self.assertEqual(resp.status_code, 412)
+        resp = self.client.put(f"/inventory/{part['id']}", json={'price': 8},
+                               headers=dict(headers, **{'If-Match': resp.headers['ETag']}))
+        self.assertEqual(resp.get_json()['price'], 8)
+
+    def test_delete_part_if_match(self):
+        part = self._write('POST', '/inventory/', {'name': 'F', 'price': 5.55})
+        headers = {'Authorization': f'Bearer {self.token}'}
+        etag = self.client.put(f"/inventory/{part['id']}", json={'price': 6}, headers=headers).headers['ETag']
+        self.client.put(f"/inventory/{part['id']}", json={'price': 7}, headers=headers)
+        resp = self.client.delete(f"/inventory/{part['id']}", headers=dict(headers, **{'If-Match': etag}))
+        self.assertEqual(resp.status_code, 412)
+        resp = self.client.delete(f"/inventory/{part['id']}",
+                                  headers=dict(headers, **{'If-Match': resp.headers['ETag']}))
+        self.assertEqual(resp.status_code, 200)
+
+    def test_ticket_links_do_not_bump_catalog(self):
+        part = self._write('POST', '/inventory/', {'name': 'Z', 'price': 3.33})
+        version = self.client.get('/inventory/').headers['X-Catalog-Version']
+        self._write('POST', f'/inventory/{self.ticket_id}/add_part', {'part_id': part['id']})
+        self.assertEqual(self.client.get('/inventory/').headers['X-Catalog-Version'], version)
+
     def test_update_part_success(self):
         ###### create part first
         part = self.client.post(
@@ -3,8 +3,9 @@ import json
 from datetime import date
 from werkzeug.security import generate_password_hash
 from mech import create_app
-from mech.extensions import db
+from mech.extensions import db, token_cache
 from mech.models import Mechanic, Customer, ServiceTicket
+from mech.utils.sql_stats import QueryCounter
 
 class MechanicTestCase(unittest.TestCase):
     def setUp(self):
@@ -112,6 +113,160 @@ class MechanicTestCase(unittest.TestCase):
         self.assertIsInstance(arr, list)
         self.assertIn('ticket_count', arr[0])
 
+    def _login(self):
+        return self.client.post(
+            '/mechanics/login',
+            data=json.dumps({'email':'john@ex.com','password':'jpass'}),
+            content_type='application/json'
+        ).get_json()['auth_token']
+
+    def _seed_ranking(self, counts, service_date=date(2025, 4, 22), prefix='r'):
+        #### one mechanic per entry, each assigned to `count` fresh tickets
+        with self.app.app_context():
+            ids = []
+            for i, count in enumerate(counts):
+                m = Mechanic(
+                    name=f'{prefix}{i}',
+                    email=f'{prefix}{i}@ex.com',
+                    phone='555-0100',
+                    salary=40000,
+                    password='x'
+                )
+                for _ in range(count):
+                    m.service_tickets.append(ServiceTicket(
+                        vin='VINRANK',
+                        service_date=service_date,
+                        service_desc='Rank',
+                        customer_id=self.customer_id
+                    ))
+                db.session.add(m)
+                db.session.commit()
+                ids.append(m.id)
+            return ids
+
+    def test_ranked_mechanics_ties_and_top(self):
+        a, b, c = self._seed_ranking([3, 1, 3])
+        token = self._login()
+        resp = self.client.get(
+            '/mechanics/ranked?top=1',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        arr = resp.get_json()
+        self.assertEqual([m['id'] for m in arr], [a, c])
+        self.assertEqual([m['rank'] for m in arr], [1, 1])
+
+        resp = self.client.get(
+            '/mechanics/ranked?top=1&ties=false',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual([m['id'] for m in resp.get_json()], [a])
+
+        #### John has no tickets but still ranks, after the tied pair and b
+        resp = self.client.get(
+            '/mechanics/ranked?page=2&per_page=2',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        arr = resp.get_json()
+        self.assertEqual([m['id'] for m in arr], [b, self.mech_id])
+        self.assertEqual([m['rank'] for m in arr], [3, 4])
+        self.assertEqual(arr[1]['ticket_count'], 0)
+
+    def test_ranked_mechanics_date_range(self):
+        early, = self._seed_ranking([2], service_date=date(2024, 1, 10))
+        late, = self._seed_ranking([1], service_date=date(2025, 6, 1), prefix='late')
+        token = self._login()
+        resp = self.client.get(
+            '/mechanics/ranked?start=2025-01-01&end=2025-12-31',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        counts = {m['id']: m['ticket_count'] for m in resp.get_json()}
+        self.assertEqual(counts[late], 1)
+        self.assertEqual(counts[early], 0)
+
+        resp = self.client.get(
+            '/mechanics/ranked?start=01-01-2025',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(resp.status_code, 400)
+
+    def test_ranked_mechanics_query_count_constant(self):
+        #### measures the query itself, not the response cache in front of it
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+        token = self._login()
+
+        def ranked_queries():
+            with QueryCounter() as q:
+                resp = self.client.get(
+                    '/mechanics/ranked',
+                    headers={'Authorization': f'Bearer {token}'}
+                )
+            self.assertEqual(resp.status_code, 200)
+            return q.count, len(resp.get_json())
+
+        ranked_queries()  #### warm the token cache so both runs take the same auth path
+        small = ranked_queries()
+        self._seed_ranking([2, 1, 0, 4, 1, 1, 3, 0, 2, 5])
+        large = ranked_queries()
+        self.assertEqual(large[1], small[1] + 10)
+        self.assertEqual(large[0], small[0])
+
+    def test_token_cache_skips_auth_queries(self):
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+        token = self._login()
+        headers = {'Authorization': f'Bearer {token}'}
+        self.client.get('/mechanics/ranked', headers=headers)
+        with QueryCounter() as q:
+            resp = self.client.get('/mechanics/ranked', headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        #### only the ranking query, no Mechanic lookup
+        self.assertEqual(q.count, 1)
+        with self.app.app_context():
+            stats = token_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_concurrent_update_conflicts(self):
+        from sqlalchemy import text
+        from mech.utils.versioning import commit_versioned
+        with self.app.test_request_context():
+            mech = db.session.get(Mechanic, self.mech_id)
+            #### another worker commits in between our read and our write
+            db.session.execute(text('UPDATE mechanics SET version = version + 1 WHERE id = :id'),
+                               {'id': self.mech_id})
+            mech.name = 'Lost update'
+            body, status = commit_versioned()
+            self.assertEqual(status, 409)
+            self.assertNotEqual(db.session.get(Mechanic, self.mech_id).name, 'Lost update')
+
+    def test_token_cache_invalidated_on_delete(self):
+        token = self._login()
+        headers = {'Authorization': f'Bearer {token}'}
+        self.assertEqual(self.client.get('/mechanics/ranked', headers=headers).status_code, 200)
+        resp = self.client.delete(f'/mechanics/{self.mech_id}', headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get('/mechanics/ranked', headers=headers)
+        self.assertEqual(resp.status_code, 401)
+
+    def test_token_cache_revoked_by_other_worker(self):
+        from sqlalchemy import delete
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+        token = self._login()
+        headers = {'Authorization': f'Bearer {token}'}
+        self.assertEqual(self.client.get('/mechanics/ranked', headers=headers).status_code, 200)
+        with self.app.app_context():
+            #### a delete flushed but rolled back revokes nothing
+            db.session.delete(db.session.get(Mechanic, self.mech_id))
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(self.client.get('/mechanics/ranked', headers=headers).status_code, 200)
+        with self.app.app_context():
+            #### what another worker's committed delete leaves behind: the row
+            #### is gone and its row and principal tokens in the shared cache moved on
+            db.session.execute(delete(Mechanic).where(Mechanic.id == self.mech_id))
+            db.session.commit()
+            self.assertEqual(self.client.get('/mechanics/ranked', headers=headers).status_code, 200)
+            token_cache.tags.bump([f'row:mechanics:{self.mech_id}', f'principal:mechanic:{self.mech_id}'])
+        self.assertEqual(self.client.get('/mechanics/ranked', headers=headers).status_code, 401)
+
     def test_assign_mechanic_to_ticket_success(self):
         login = self.client.post(
             '/mechanics/login',
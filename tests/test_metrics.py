@@ -0,0 +1,92 @@
+import unittest
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+from mech import create_app
+from mech.extensions import db, metrics
+
+
+def _sample(text, name, **labels):
+    """Value of one series in Prometheus text output, 0 if it isn't there."""
+    for line in text.splitlines():
+        match = re.fullmatch(rf'{name}(?:\{{(.*)\}})? (\S+)', line)
+        if match and dict(re.findall(r'(\w+)="([^"]*)"', match.group(1) or '')) == labels:
+            return float(match.group(2))
+    return 0.0
+
+
+def _serve(app, times):
+    client = app.test_client()
+    for _ in range(times):
+        client.get('/service_tickets/')
+    with app.app_context():
+        metrics.flush()
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def _scrape(self):
+        resp = self.client.get('/metrics')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content_type.startswith('text/plain; version=0.0.4'))
+        return resp.get_data(as_text=True)
+
+    def test_routes_statuses_and_latency(self):
+        route = {'blueprint': 'service_tickets', 'endpoint': 'service_tickets.get_tickets'}
+        before = self._scrape()
+        for _ in range(3):
+            self.client.get('/service_tickets/')
+        self.client.get('/service_tickets/?cursor=bogus')
+        after = self._scrape()
+
+        def delta(name, **labels):
+            return _sample(after, name, **labels) - _sample(before, name, **labels)
+
+        self.assertEqual(delta('mech_http_requests_total', method='GET', status='200', **route), 3)
+        self.assertEqual(delta('mech_http_requests_total', method='GET', status='400', **route), 1)
+        self.assertEqual(delta('mech_http_request_duration_seconds_count', **route), 4)
+        self.assertEqual(delta('mech_http_request_duration_seconds_bucket', le='+Inf', **route), 4)
+        self.assertGreater(delta('mech_http_request_duration_seconds_sum', **route), 0)
+        self.assertGreater(delta('mech_db_pool_checkouts_total', bind='default'), 0)
+        #### the scrape itself is the one request in flight
+        self.assertEqual(_sample(after, 'mech_http_requests_in_flight'), 1)
+        self.assertIn('# TYPE mech_cache_hits_total counter', after)
+
+    def test_workers_are_summed(self):
+        route = {'blueprint': 'service_tickets', 'endpoint': 'service_tickets.get_tickets',
+                 'method': 'GET', 'status': '200'}
+        own = _sample(self._scrape(), 'mech_http_requests_total', **route)
+        with tempfile.TemporaryDirectory() as tmp:
+            self.app.config['METRICS_DIR'] = tmp
+            ctx = multiprocessing.get_context('fork')
+            workers = [ctx.Process(target=_serve, args=(self.app, 3)) for _ in range(2)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+
+            #### an exited worker's counters still count, its gauges don't
+            with open(os.path.join(tmp, 'metrics-1.json'), 'w') as f:
+                json.dump({'pid': workers[0].pid, 'buckets': [0.1],
+                           'counters': [['mech_http_requests_total', sorted(route.items()), 5]],
+                           'gauges': [['mech_http_requests_in_flight', [], 7]],
+                           'histograms': []}, f)
+            text = self._scrape()
+        self.assertEqual(_sample(text, 'mech_http_requests_total', **route), own + 3 + 3 + 5)
+        self.assertEqual(_sample(text, 'mech_http_requests_in_flight'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import glob
+import json
+import os
+import pstats
+import tempfile
+import time
+import tracemalloc
+from werkzeug.security import generate_password_hash
+from mech import create_app
+from mech.extensions import db, profiler
+from mech.models import Mechanic
+
+
+class ProfilingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app = create_app('TestingConfig')
+        self.app.config.update(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name, ADMIN_MECHANIC_IDS=[1])
+        profiler.init_app(self.app)
+
+        @self.app.route('/_slow')
+        def slow_view():
+            time.sleep(0.05)
+            return {}
+
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            for i in range(2):
+                db.session.add(Mechanic(name=f'M{i}', email=f'm{i}@ex.com', phone='1', salary=1,
+                                        password=generate_password_hash('pw')))
+            db.session.commit()
+        self.headers = [self._login(f'm{i}@ex.com') for i in range(2)]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.tmp.cleanup()
+
+    def _login(self, email):
+        token = self.client.post(
+            '/mechanics/login',
+            data=json.dumps({'email': email, 'password': 'pw'}),
+            content_type='application/json'
+        ).get_json()['auth_token']
+        return {'Authorization': f'Bearer {token}'}
+
+    def _configure(self, **settings):
+        resp = self.client.put('/admin/profiling', json=settings, headers=self.headers[0])
+        self.assertEqual(resp.status_code, 200, resp.get_data(as_text=True))
+        return resp.get_json()
+
+    def _outputs(self, suffix):
+        return glob.glob(os.path.join(self.tmp.name, f'*{suffix}'))
+
+    def test_admin_only(self):
+        self.assertEqual(self.client.get('/admin/profiling').status_code, 401)
+        self.assertEqual(self.client.get('/admin/profiling', headers=self.headers[1]).status_code, 403)
+        resp = self.client.get('/admin/profiling', headers=self.headers[0])
+        self.assertEqual(resp.get_json()['enabled'], False)
+
+    def test_validation(self):
+        for body in ({'rate': 0}, {'mode': 'perf'}, {'endpoints': ['nope']}, {'colour': 'red'}, {'enabled': 'yes'}):
+            resp = self.client.put('/admin/profiling', json=body, headers=self.headers[0])
+            self.assertEqual(resp.status_code, 400, body)
+
+    def test_cprofile_selected_endpoint(self):
+        self._configure(enabled=True, endpoints=['mechanics.get_mechanics_by_ticket_count'])
+        self.client.get('/mechanics/', headers=self.headers[0])
+        self.assertEqual(self._outputs('.pstats'), [])
+        self.client.get('/mechanics/ranked', headers=self.headers[0])
+        [path] = self._outputs('.pstats')
+        self.assertIn('mechanics-get_mechanics_by_ticket_count-', os.path.basename(path))
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertIn('rank_mechanics', functions)
+
+    def test_sampler_and_tracemalloc(self):
+        self._configure(enabled=True, endpoints=['slow_view'], mode='sampler', interval_ms=1, tracemalloc=True)
+        self.client.get('/_slow')
+        [path] = self._outputs('.collapsed')
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+        self.assertTrue(any('slow_view (test_profiling.py' in line for line in lines))
+        [snapshot] = self._outputs('.tracemalloc')
+        tracemalloc.Snapshot.load(snapshot)
+        self.assertTrue(self._outputs('.tracemalloc.txt'))
+
+    def test_switched_off(self):
+        self._configure(enabled=True, tracemalloc=True)
+        self.assertTrue(tracemalloc.is_tracing())
+        self._configure(enabled=False)
+        self.assertFalse(tracemalloc.is_tracing())
+        count = len(os.listdir(self.tmp.name))
+        self.client.get('/mechanics/', headers=self.headers[0])
+        self.assertEqual(len(os.listdir(self.tmp.name)), count)
+
+    def test_not_installed_unless_configured(self):
+        app = create_app('TestingConfig')
+        self.assertNotIn('profiling', app.view_functions)
+        self.assertNotIn(profiler._start, app.before_request_funcs.get(None, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from werkzeug.security import generate_password_hash
+from mech import create_app
+from mech.extensions import db, limiter
+from mech.models import Mechanic
+from mech.utils.ratelimit import SQLiteStorage
+
+
+def _hammer(uri, times):
+    storage = SQLiteStorage(uri)
+    for _ in range(times):
+        storage.incr('shared', 60)
+
+
+class SQLiteStorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.uri = f"sqlite:///{os.path.join(self.tmp.name, 'limits.db')}"
+        self.storage = SQLiteStorage(self.uri)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_incr_get_expiry(self):
+        self.assertEqual(self.storage.incr('k', 60), 1)
+        self.assertEqual(self.storage.incr('k', 60, amount=5), 6)
+        self.assertEqual(self.storage.get('k'), 6)
+        self.assertAlmostEqual(self.storage.get_expiry('k'), time.time() + 60, delta=2)
+        self.storage.clear('k')
+        self.assertEqual(self.storage.get('k'), 0)
+        self.assertTrue(self.storage.check())
+
+    def test_window_restarts_after_expiry(self):
+        self.storage.incr('k', 0.05, amount=3)
+        time.sleep(0.1)
+        self.assertEqual(self.storage.get('k'), 0)
+        self.assertEqual(self.storage.incr('k', 60), 1)
+
+    def test_counts_shared_between_processes(self):
+        ctx = multiprocessing.get_context('fork')
+        workers = [ctx.Process(target=_hammer, args=(self.uri, 100)) for _ in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self.assertEqual(self.storage.get('shared'), 400)
+
+
+class RateLimitTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app = create_app('TestingConfig')
+        self.app.config.update(
+            RATELIMIT_STORAGE_URI=f"sqlite:///{os.path.join(self.tmp.name, 'limits.db')}",
+            RATELIMIT_APPLICATION='30/minute',
+            RATELIMIT_COSTS={'mechanics.mechanic_login': 10}
+        )
+        limiter.init_app(self.app)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Mechanic(name='Mech', email='mech@ex.com', phone='1', salary=1,
+                                    password=generate_password_hash('mpass')))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+        #### back to per-app in-memory counters for the other test modules
+        limiter.init_app(create_app('TestingConfig'))
+        self.tmp.cleanup()
+
+    def _login(self):
+        return self.client.post(
+            '/mechanics/login',
+            data=json.dumps({'email': 'mech@ex.com', 'password': 'mpass'}),
+            content_type='application/json'
+        )
+
+    def test_expensive_endpoints_cost_more(self):
+        for _ in range(3):
+            self.assertEqual(self._login().status_code, 200)
+        resp = self.client.get('/inventory/')
+        self.assertEqual(resp.status_code, 429)
+        self.assertIn('Rate limit exceeded', resp.get_json()['error'])
+        self.assertIn('Retry-After', resp.headers)
+
+    def test_cheap_requests_cost_one(self):
+        for _ in range(30):
+            resp = self.client.get('/inventory/')
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers['X-RateLimit-Remaining'], '0')
+        self.assertEqual(self.client.get('/inventory/').status_code, 429)
+
+    def test_no_limit_without_config(self):
+        self.app.config['RATELIMIT_APPLICATION'] = None
+        for _ in range(40):
+            self.assertEqual(self.client.get('/inventory/').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
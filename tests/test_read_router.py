@@ -0,0 +1,126 @@
+import unittest
+import os
+import tempfile
+import time
+from unittest import mock
+from mech import create_app
+from mech.config import TestingConfig
+from mech.extensions import db, read_router
+from mech.models import Mechanic
+from mech.utils.util import encode_customer_token, encode_mechanic_token
+
+OTHER_CLIENT = {'REMOTE_ADDR': '10.0.0.2'}
+
+
+class ReadRouterTestCase(unittest.TestCase):
+    """Two SQLite files stand in for the primary and a replica that hasn't caught up."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        primary = os.path.join(self.tmp.name, 'primary.db')
+        replica = os.path.join(self.tmp.name, 'replica.db')
+        with mock.patch.multiple(TestingConfig, create=True,
+                                 SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary}',
+                                 SQLALCHEMY_BINDS={'replica0': f'sqlite:///{replica}'},
+                                 SQLALCHEMY_REPLICAS=['replica0']):
+            self.app = create_app('TestingConfig')
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.metadata.create_all(db.engines['replica0'])
+            for phone, engine in (('primary', db.engines[None]), ('replica', db.engines['replica0'])):
+                with engine.begin() as conn:
+                    conn.execute(Mechanic.__table__.insert(),
+                                 {'name': 'Mech', 'email': 'm@ex.com', 'phone': phone, 'salary': 1, 'password': 'x'})
+            self.headers = {'Authorization': f'Bearer {encode_mechanic_token(1)}'}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engines['replica0'].dispose()
+            db.engines[None].dispose()
+        self.tmp.cleanup()
+
+    def _phone(self, **kwargs):
+        resp = self.client.get('/mechanics/', **kwargs)
+        self.assertEqual(resp.status_code, 200)
+        return resp.get_json()[0]['phone']
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self._phone(), 'replica')
+
+    def test_writes_go_to_primary_and_writer_reads_them(self):
+        resp = self.client.put('/mechanics/1', json={'phone': 'updated'}, headers=self.headers)
+        self.assertEqual(resp.status_code, 200, resp.get_data(as_text=True))
+        with self.app.app_context():
+            with db.engines[None].connect() as conn:
+                self.assertEqual(conn.scalar(Mechanic.__table__.select().with_only_columns(Mechanic.phone)), 'updated')
+
+        self.assertEqual(self._phone(headers=self.headers), 'updated')
+        self.assertEqual(self._phone(environ_base=OTHER_CLIENT), 'replica')
+
+    def test_window_follows_the_token(self):
+        self.client.put('/mechanics/1', json={'phone': 'updated'}, headers=self.headers)
+        #### same mechanic from another address still reads its write
+        self.assertEqual(self._phone(headers=self.headers, environ_base=OTHER_CLIENT), 'updated')
+        #### an anonymous request from the writer's address is another client
+        self.assertEqual(self._phone(), 'replica')
+        #### and so is the customer with the same id
+        with self.app.app_context():
+            customer = {'Authorization': f'Bearer {encode_customer_token(1)}'}
+        self.assertEqual(self._phone(headers=customer), 'replica')
+
+    def test_read_your_writes_window_expires(self):
+        self.app.config['DB_READ_YOUR_WRITES_SECONDS'] = 0.2
+        self.client.put('/mechanics/1', json={'phone': 'updated'}, headers=self.headers)
+        self.assertEqual(self._phone(headers=self.headers), 'updated')
+        time.sleep(0.3)
+        self.assertEqual(self._phone(headers=self.headers), 'replica')
+
+    def test_recently_changed_tags_are_not_cached_from_replica(self):
+        self.app.config['RESPONSE_CACHE_ENABLED'] = True
+        self.client.put('/mechanics/1', json={'phone': 'updated'}, headers=self.headers)
+        #### another client, but the mechanics tag just changed: the page is built on the primary
+        self.assertEqual(self._phone(environ_base=OTHER_CLIENT), 'updated')
+        resp = self.client.get('/mechanics/', environ_base={'REMOTE_ADDR': '10.0.0.3'})
+        self.assertEqual(resp.headers['X-Cache'], 'HIT')
+        self.assertEqual(resp.get_json()[0]['phone'], 'updated')
+
+    def test_catalog_reads_use_primary(self):
+        resp = self.client.post('/inventory/', json={'name': 'Pad', 'price': 1}, headers=self.headers)
+        self.assertEqual(resp.status_code, 201, resp.get_data(as_text=True))
+        #### the replica is still at version 0, but the client was told 1
+        resp = self.client.get('/inventory/?since=1', environ_base=OTHER_CLIENT)
+        self.assertEqual(resp.status_code, 200, resp.get_data(as_text=True))
+        self.assertEqual(resp.get_json()['version'], 1)
+        resp = self.client.get('/inventory/', environ_base=OTHER_CLIENT)
+        self.assertEqual([p['name'] for p in resp.get_json()], ['Pad'])
+
+    def test_reads_after_a_write_in_the_same_request_use_primary(self):
+        @self.app.route('/_write_then_read')
+        def write_then_read():
+            db.session.get(Mechanic, 1).phone = 'same request'
+            db.session.flush()
+            replica = read_router.replica()
+            phone = db.session.scalar(db.select(Mechanic.phone).execution_options(populate_existing=True))
+            db.session.rollback()
+            return {'replica': replica, 'phone': phone}
+
+        self.assertEqual(self.client.get('/_write_then_read').get_json(),
+                         {'replica': None, 'phone': 'same request'})
+
+
+class NoReplicaTestCase(unittest.TestCase):
+    def test_not_installed_without_replicas(self):
+        app = create_app('TestingConfig')
+        self.assertEqual(app.extensions['read_router'], [])
+        self.assertNotIn(read_router._route, app.before_request_funcs.get(None, []))
+
+    def test_unknown_replica_bind(self):
+        with mock.patch.object(TestingConfig, 'SQLALCHEMY_REPLICAS', ['replica0'], create=True):
+            with self.assertRaises(RuntimeError):
+                create_app('TestingConfig')
+
+
+if __name__ == '__main__':
+    unittest.main()
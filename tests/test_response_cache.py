@@ -0,0 +1,162 @@
+import unittest
+import json
+from datetime import date
+from werkzeug.security import generate_password_hash
+from mech import create_app
+from mech.extensions import db, response_cache
+from mech.models import Customer, Mechanic, ServiceTicket
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            cust = Customer(name='Cust', email='cust@ex.com', phone='555-1000',
+                            password=generate_password_hash('cpass'))
+            mech = Mechanic(name='Mech', email='mech@ex.com', phone='555-2000', salary=40000,
+                            password=generate_password_hash('mpass'))
+            db.session.add_all([cust, mech])
+            db.session.commit()
+            ticket = ServiceTicket(vin='VIN001', service_date=date(2025, 4, 22),
+                                   service_desc='Initial', customer_id=cust.id)
+            db.session.add(ticket)
+            db.session.commit()
+            self.customer_id, self.mech_id, self.ticket_id = cust.id, mech.id, ticket.id
+        token = self.client.post(
+            '/mechanics/login',
+            data=json.dumps({'email': 'mech@ex.com', 'password': 'mpass'}),
+            content_type='application/json'
+        ).get_json()['auth_token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def _get(self, path):
+        resp = self.client.get(path, headers=self.headers)
+        self.assertEqual(resp.status_code, 200)
+        return resp
+
+    def assertFreshAfter(self, path, write, check):
+        """``path`` is served from cache until ``write`` runs, then reflects it."""
+        self._get(path)
+        self.assertEqual(self._get(path).headers['X-Cache'], 'HIT')
+        resp = write()
+        self.assertLess(resp.status_code, 300, resp.get_data(as_text=True))
+        resp = self._get(path)
+        self.assertEqual(resp.headers['X-Cache'], 'MISS')
+        check(resp.get_json())
+
+    def _send(self, method, path, payload=None):
+        return self.client.open(path, method=method, json=payload, headers=self.headers)
+
+    def test_customer_writes(self):
+        names = lambda body: [c['name'] for c in body['customers']]
+        self.assertFreshAfter(
+            '/customers/',
+            lambda: self._send('POST', '/customers/', {
+                'name': 'New', 'email': 'new@ex.com', 'phone': '1', 'password': 'pw'}),
+            lambda body: self.assertIn('New', names(body))
+        )
+        self.assertFreshAfter(
+            '/customers/',
+            lambda: self._send('PUT', f'/customers/{self.customer_id}', {'name': 'Renamed'}),
+            lambda body: self.assertIn('Renamed', names(body))
+        )
+        self.assertFreshAfter(
+            '/service_tickets/',
+            lambda: self._send('PUT', f'/customers/{self.customer_id}', {'name': 'Again'}),
+            lambda body: self.assertEqual(body['tickets'][0]['customer']['name'], 'Again')
+        )
+
+    def test_customer_delete_drops_their_tickets(self):
+        login = self.client.post('/customers/login', json={'email': 'cust@ex.com', 'password': 'cpass'})
+        token = login.get_json()['auth_token']
+        self.assertFreshAfter(
+            '/service_tickets/',
+            lambda: self.client.delete('/customers/', headers={'Authorization': f'Bearer {token}'}),
+            lambda body: self.assertEqual(body['tickets'], [])
+        )
+
+    def test_mechanic_writes(self):
+        self.assertFreshAfter(
+            '/mechanics/',
+            lambda: self._send('POST', '/mechanics/', {
+                'name': 'Second', 'email': 'second@ex.com', 'phone': '2', 'salary': 1, 'password': 'pw'}),
+            lambda body: self.assertEqual(len(body), 2)
+        )
+        self.assertFreshAfter(
+            '/mechanics/ranked',
+            lambda: self._send('PUT', f'/mechanics/{self.mech_id}', {'name': 'Renamed'}),
+            lambda body: self.assertIn('Renamed', [m['name'] for m in body])
+        )
+
+    def test_ticket_writes(self):
+        ticket = {'vin': 'VIN2', 'service_date': '2025-05-01', 'service_desc': 'New',
+                  'customer_id': self.customer_id}
+        self.assertFreshAfter(
+            '/service_tickets/',
+            lambda: self._send('POST', '/service_tickets/', ticket),
+            lambda body: self.assertEqual(len(body['tickets']), 2)
+        )
+        self.assertFreshAfter(
+            '/service_tickets/',
+            lambda: self._send('POST', '/service_tickets/bulk', [dict(ticket, vin='VIN3')]),
+            lambda body: self.assertEqual(len(body['tickets']), 3)
+        )
+        self.assertFreshAfter(
+            '/service_tickets/',
+            lambda: self._send('PUT', f'/service_tickets/{self.ticket_id}', {'service_desc': 'Updated'}),
+            lambda body: self.assertIn('Updated', [t['service_desc'] for t in body['tickets']])
+        )
+        self.assertFreshAfter(
+            '/service_tickets/',
+            lambda: self._send('DELETE', f'/service_tickets/{self.ticket_id}'),
+            lambda body: self.assertNotIn(self.ticket_id, [t['id'] for t in body['tickets']])
+        )
+
+    def test_ticket_mechanic_edits_refresh_ranking(self):
+        count = lambda body: body[0]['ticket_count']
+        self.assertFreshAfter(
+            '/mechanics/ranked',
+            lambda: self._send('PUT', f'/service_tickets/{self.ticket_id}/edit', {'add_ids': [self.mech_id]}),
+            lambda body: self.assertEqual(count(body), 1)
+        )
+        self.assertFreshAfter(
+            '/mechanics/ranked',
+            lambda: self._send('PUT', f'/service_tickets/{self.ticket_id}/edit', {'remove_ids': [self.mech_id]}),
+            lambda body: self.assertEqual(count(body), 0)
+        )
+        self.assertFreshAfter(
+            '/mechanics/ranked',
+            lambda: self._send('POST', f'/mechanics/{self.mech_id}/tickets/{self.ticket_id}'),
+            lambda body: self.assertEqual(count(body), 1)
+        )
+
+    def test_query_args_are_part_of_the_key(self):
+        first = self._get('/customers/?page=1&per_page=5')
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        self.assertEqual(self._get('/customers/?per_page=5&page=1').headers['X-Cache'], 'HIT')
+        self.assertEqual(self._get('/customers/?page=1&per_page=6').headers['X-Cache'], 'MISS')
+
+    def test_rolled_back_write_keeps_cache(self):
+        self._get('/mechanics/')
+        with self.app.app_context():
+            response_cache.invalidate('mechanics')
+            db.session.rollback()
+        self.assertEqual(self._get('/mechanics/').headers['X-Cache'], 'HIT')
+
+    def test_hit_rate_stats(self):
+        for _ in range(4):
+            self._get('/mechanics/')
+        with self.app.app_context():
+            stats = response_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 1))
+        self.assertEqual(stats['endpoints']['mechanics.get_mechanics']['hit_rate'], 0.75)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from datetime import date
+from mech import create_app
+from mech.extensions import db
+from mech.models import Customer, Mechanic, ServiceTicket
+from mech.utils.pagination import keyset_paginate
+from mech.utils.rows import CustomerRow, TicketRow, paginate_rows, load_ticket_row_relations
+from mech.blueprints.customers.schemas import dump_customers
+from mech.blueprints.service_tickets.schemas import dump_service_tickets, service_tickets_schema
+
+
+class RowsTestCase(unittest.TestCase):
+    """The row read path gives the same bodies and paging as the ORM queries it replaced."""
+
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        customers = [Customer(name=f'C{i}', email=f'c{i}@ex.com', phone='1', password='x') for i in range(25)]
+        mechanics = [Mechanic(name=f'M{i}', email=f'm{i}@ex.com', phone='1', salary=1, password='x') for i in range(3)]
+        db.session.add_all(customers + mechanics)
+        db.session.commit()
+        tickets = [ServiceTicket(vin=f'VIN{i}', service_date=date(2025, 5, 1 + i % 3), service_desc='Oil',
+                                 customer_id=customers[i % 4].id) for i in range(12)]
+        db.session.add_all(tickets)
+        db.session.commit()
+        tickets[0].mechanics.append(mechanics[2])
+        tickets[0].mechanics.append(mechanics[0])
+        tickets[5].mechanics.append(mechanics[1])
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_row_is_plain(self):
+        row = CustomerRow.load(CustomerRow.select().where(Customer.id == 1))[0]
+        self.assertFalse(hasattr(row, '__dict__'))
+        self.assertEqual((row.id, row.name, row.version, row.__tablename__), (1, 'C0', 1, 'customers'))
+        self.assertIsNone(TicketRow(1, 'VIN', None, '', 1, 1).mechanics)
+        with self.assertRaises(ValueError):
+            CustomerRow(1, 'C0')
+
+    def test_paginate_matches_orm(self):
+        for page, per_page in [(1, 10), (3, 10), (9, 10), (0, 0), (1, 500)]:
+            with self.subTest(page=page, per_page=per_page):
+                orm = Customer.query.paginate(page=page, per_page=per_page, error_out=False)
+                rows = paginate_rows(CustomerRow, page=page, per_page=per_page, error_out=False)
+                self.assertEqual((rows.page, rows.per_page, rows.total, rows.pages),
+                                 (orm.page, orm.per_page, orm.total, orm.pages))
+                self.assertEqual(dump_customers(rows.items), dump_customers(orm.items))
+
+    def test_ticket_relations_match_orm(self):
+        #### marshmallow walking the ORM relationships ticket by ticket
+        orm = service_tickets_schema.dump(ServiceTicket.query.order_by(ServiceTicket.id).all())
+        rows = load_ticket_row_relations(TicketRow.load(TicketRow.select().order_by(ServiceTicket.id)))
+        self.assertEqual(dump_service_tickets(rows), orm)
+        self.assertEqual([m.id for m in rows[0].mechanics], [1, 3])
+        self.assertEqual(rows[1].mechanics, [])
+
+    def test_keyset_over_rows(self):
+        keys = [ServiceTicket.service_date, ServiceTicket.id]
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(TicketRow.select(), keys, cursor=cursor, per_page=5, load=TicketRow.load)
+            seen += [t.id for t in page.items]
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        expected = [t.id for t in ServiceTicket.query.order_by(*keys)]
+        self.assertEqual(seen, expected)
+        back = keyset_paginate(TicketRow.select(), keys, cursor=page.prev_cursor, per_page=5, load=TicketRow.load)
+        self.assertEqual([t.id for t in back.items], expected[5:10])
+
+    def test_list_routes(self):
+        tickets = self.client.get('/service_tickets/?per_page=5').get_json()
+        self.assertEqual(tickets['meta'], {'page': 1, 'per_page': 5, 'total': 12, 'pages': 3})
+        self.assertEqual(tickets['tickets'][0]['mechanics'], [{'id': 1, 'name': 'M0'}, {'id': 3, 'name': 'M2'}])
+        self.assertEqual(tickets['tickets'][0]['customer'], {'id': 1, 'name': 'C0'})
+        customers = self.client.get('/customers/?cursor=&per_page=4').get_json()
+        self.assertEqual([c['id'] for c in customers['customers']], [1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
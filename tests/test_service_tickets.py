@@ -1,10 +1,14 @@
 import unittest
 import json
 from datetime import date
+from unittest import mock
+from sqlalchemy import update
 from werkzeug.security import generate_password_hash
 from mech import create_app
 from mech.extensions import db
 from mech.models import Customer, Mechanic, ServiceTicket
+from mech.utils.sql_stats import QueryCounter, assert_query_budget
+from mech.blueprints.service_tickets.schemas import service_tickets_schema
 
 class ServiceTicketTestCase(unittest.TestCase):
     def setUp(self):
@@ -77,6 +81,152 @@ class ServiceTicketTestCase(unittest.TestCase):
         self.assertEqual(resp.status_code, 201)
         self.assertIn('id', resp.get_json())
 
+    def test_bulk_create_tickets(self):
+        items = [
+            {'vin': 'B1', 'service_date': '2025-04-22', 'service_desc': 'One', 'customer_id': self.customer_id},
+            {'vin': 'B2', 'service_date': '22/04/2025', 'service_desc': 'Bad date', 'customer_id': self.customer_id},
+            {'vin': 'B3', 'service_date': '2025-04-23', 'service_desc': 'No customer', 'customer_id': 999},
+            {'vin': 'B4', 'service_date': '2025-04-24', 'service_desc': 'Two', 'customer_id': self.customer_id,
+             'mechanic_ids': []},
+        ]
+        resp = self.client.post(
+            '/service_tickets/bulk',
+            data=json.dumps(items),
+            headers={'Authorization': f'Bearer {self.token}'},
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 207)
+        body = resp.get_json()
+        self.assertEqual((body['created'], body['failed']), (2, 2))
+        self.assertEqual([r['status'] for r in body['results']], [201, 400, 400, 201])
+        self.assertIn('Customer 999', body['results'][2]['error'])
+
+        with self.app.app_context():
+            first = db.session.get(ServiceTicket, body['results'][0]['id'])
+            self.assertEqual(first.vin, 'B1')
+            self.assertEqual([m.id for m in first.mechanics], [self.mech_id])
+            last = db.session.get(ServiceTicket, body['results'][3]['id'])
+            self.assertEqual(last.mechanics.count(), 0)
+
+    def test_bulk_create_tickets_batches_insert(self):
+        items = [{'vin': f'B{i}', 'service_date': '2025-04-22', 'service_desc': 'Bulk',
+                  'customer_id': self.customer_id, 'mechanic_ids': []} for i in range(20)]
+        headers = {'Authorization': f'Bearer {self.token}'}
+        self.client.post('/service_tickets/bulk', json=items[:1], headers=headers)
+        with QueryCounter() as q:
+            resp = self.client.post('/service_tickets/bulk', json=items, headers=headers)
+        self.assertEqual(resp.get_json()['created'], 20)
+        inserts = [s for s in q.statements if s.startswith('INSERT INTO service_tickets')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_bulk_create_tickets_ndjson_atomic(self):
+        lines = [
+            json.dumps({'vin': f'N{i}', 'service_date': '2025-05-01', 'service_desc': 'Stream',
+                        'customer_id': self.customer_id})
+            for i in range(5)
+        ]
+        resp = self.client.post(
+            '/service_tickets/bulk?atomic=true',
+            data='\n'.join(lines + ['{not json']),
+            headers={'Authorization': f'Bearer {self.token}'},
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.get_json()['created'], 0)
+
+        resp = self.client.post(
+            '/service_tickets/bulk',
+            data='\n'.join(lines) + '\n',
+            headers={'Authorization': f'Bearer {self.token}'},
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(resp.status_code, 201)
+        with self.app.app_context():
+            self.assertEqual(ServiceTicket.query.filter(ServiceTicket.vin.like('N%')).count(), 5)
+
+    def test_bulk_create_tickets_limits(self):
+        self.app.config['BULK_MAX_ITEMS'] = 2
+        item = {'vin': 'L', 'service_date': '2025-04-22', 'service_desc': 'L', 'customer_id': self.customer_id}
+        resp = self.client.post(
+            '/service_tickets/bulk',
+            data=json.dumps([item] * 3),
+            headers={'Authorization': f'Bearer {self.token}'},
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 413)
+        resp = self.client.post(
+            '/service_tickets/bulk',
+            data=json.dumps({'not': 'a list'}),
+            headers={'Authorization': f'Bearer {self.token}'},
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 400)
+
+    def test_export_tickets(self):
+        with self.app.app_context():
+            other = ServiceTicket(vin='VIN002', service_date=date(2025, 5, 2),
+                                  service_desc='Brakes, rear', customer_id=self.customer_id)
+            other.mechanics.append(db.session.get(Mechanic, self.mech_id))
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+        headers = {'Authorization': f'Bearer {self.token}'}
+
+        resp = self.client.get('/service_tickets/export', headers=headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        self.assertEqual([r['id'] for r in rows], [self.ticket_id, other_id])
+        self.assertEqual(rows[0]['mechanic_ids'], [])
+        self.assertEqual(rows[1]['mechanic_ids'], [self.mech_id])
+        self.assertEqual(rows[1]['service_date'], '2025-05-02')
+
+        resp = self.client.get(f'/service_tickets/export?format=csv&mechanic_id={self.mech_id}',
+                               headers=headers)
+        lines = resp.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], 'id,vin,service_date,service_desc,customer_id,mechanic_ids')
+        self.assertEqual(lines[1:], [f'{other_id},VIN002,2025-05-02,"Brakes, rear",{self.customer_id},{self.mech_id}'])
+
+        resp = self.client.get('/service_tickets/export?end=2025-04-30', headers=headers)
+        self.assertEqual(len(resp.get_data(as_text=True).splitlines()), 1)
+
+        for query in ('format=xml', 'start=yesterday', 'customer_id=abc', 'customer_id=%C2%B2', 'mechanic_id='):
+            resp = self.client.get(f'/service_tickets/export?{query}', headers=headers)
+            self.assertEqual(resp.status_code, 400, query)
+        self.assertEqual(self.client.get('/service_tickets/export').status_code, 401)
+
+    def test_export_tickets_memory_flat(self):
+        import tracemalloc
+        from sqlalchemy import insert
+
+        def seed(n):
+            with self.app.app_context():
+                db.session.execute(insert(ServiceTicket), [
+                    {'vin': f'X{i:08d}', 'service_date': date(2025, 1, 1),
+                     'service_desc': 'Export ' * 8, 'customer_id': self.customer_id}
+                    for i in range(n)
+                ])
+                db.session.commit()
+
+        def export_peak():
+            resp = self.client.get('/service_tickets/export', headers={'Authorization': f'Bearer {self.token}'},
+                                   buffered=False)
+            tracemalloc.start()
+            lines = sum(chunk.count(b'\n') for chunk in resp.response)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            resp.close()
+            return lines, peak
+
+        self.app.config['EXPORT_BATCH_SIZE'] = 200
+        seed(2000)
+        small_lines, small_peak = export_peak()
+        seed(6000)
+        large_lines, large_peak = export_peak()
+        self.assertEqual((small_lines, large_lines), (2001, 8001))
+        # 4x the rows, roughly the same high-water mark
+        self.assertLess(large_peak, small_peak * 1.5)
+
     def test_get_tickets(self):
         resp = self.client.get('/service_tickets/')
         self.assertEqual(resp.status_code, 200)
@@ -84,6 +234,70 @@ class ServiceTicketTestCase(unittest.TestCase):
         self.assertIn('tickets', body)
         self.assertIn('meta', body)
 
+    def test_get_tickets_cursor_order(self):
+        with self.app.app_context():
+            for day in (30, 1, 15, 1):
+                db.session.add(ServiceTicket(
+                    vin='VINCUR',
+                    service_date=date(2025, 3, day),
+                    service_desc='Cursor',
+                    customer_id=self.customer_id
+                ))
+            db.session.commit()
+            expected = [
+                t.id for t in ServiceTicket.query.order_by(
+                    ServiceTicket.service_date, ServiceTicket.id
+                )
+            ]
+
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            body = self.client.get(f'/service_tickets/?cursor={cursor}&per_page=2').get_json()
+            seen.extend(t['id'] for t in body['tickets'])
+            cursor = body['meta']['next']
+        self.assertEqual(seen, expected)
+
+    def test_get_tickets_query_count_independent_of_page_size(self):
+        with self.app.app_context():
+            mechs = [
+                Mechanic(name=f'Q{i}', email=f'q{i}@ex.com', phone='1', salary=1, password='x')
+                for i in range(3)
+            ]
+            for i in range(12):
+                ticket = ServiceTicket(
+                    vin=f'VINQ{i}',
+                    service_date=date(2025, 5, 1),
+                    service_desc='Batch',
+                    customer_id=self.customer_id
+                )
+                ticket.mechanics.extend(mechs[:i % 3 + 1])
+                db.session.add(ticket)
+            db.session.commit()
+
+        def page_queries(per_page):
+            #### no statement may run once per ticket
+            with assert_query_budget(max_repeats=1) as q:
+                body = self.client.get(f'/service_tickets/?per_page={per_page}').get_json()
+            self.assertEqual(len(body['tickets']), per_page)
+            self.assertTrue(all('name' in t['customer'] for t in body['tickets']))
+            return q.count
+
+        self.assertEqual(page_queries(2), page_queries(12))
+
+        #### batched output matches walking the relationships row by row
+        body = self.client.get('/service_tickets/?per_page=13').get_json()
+        with self.app.app_context():
+            lazy = json.loads(json.dumps(
+                service_tickets_schema.dump(ServiceTicket.query.all()), default=str
+            ))
+        self.assertEqual(
+            [(t['id'], t['customer'], t['mechanics']) for t in body['tickets']],
+            [(t['id'], t['customer'], t['mechanics']) for t in lazy]
+        )
+        by_vin = {t['vin']: t for t in body['tickets']}
+        self.assertEqual([m['name'] for m in by_vin['VINQ5']['mechanics']], ['Q0', 'Q1', 'Q2'])
+
     def test_update_ticket_success(self):
         payload = {'service_desc': 'Updated'}
         resp = self.client.put(
@@ -137,6 +351,134 @@ class ServiceTicketTestCase(unittest.TestCase):
         )
         self.assertEqual(resp2.status_code, 200)
 
+    def test_edit_ticket_mechanics_reports_each_id(self):
+        with self.app.app_context():
+            ids = []
+            for i in range(3):
+                m = Mechanic(name=f'E{i}', email=f'e{i}@ex.com', phone='1', salary=1, password='x')
+                db.session.add(m)
+                db.session.commit()
+                ids.append(m.id)
+            ticket = db.session.get(ServiceTicket, self.ticket_id)
+            ticket.mechanics.append(db.session.get(Mechanic, ids[0]))
+            db.session.commit()
+
+        resp = self.client.put(
+            f'/service_tickets/{self.ticket_id}/edit',
+            data=json.dumps({'add_ids': [ids[0], ids[1], 999], 'remove_ids': [ids[0], ids[2]]}),
+            headers={'Authorization': f'Bearer {self.token}'},
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 200)
+        body = resp.get_json()
+        self.assertEqual(body['added'], [ids[1]])
+        self.assertEqual(body['removed'], [ids[0]])
+        self.assertEqual(body['not_assigned'], [ids[2]])
+        self.assertEqual(body['unknown'], [999])
+        self.assertEqual(body['already_present'], [])
+        with self.app.app_context():
+            ticket = db.session.get(ServiceTicket, self.ticket_id)
+            self.assertEqual([m.id for m in ticket.mechanics], [ids[1]])
+
+        resp = self.client.put(
+            f'/service_tickets/{self.ticket_id}/edit',
+            data=json.dumps({'add_ids': [ids[1]]}),
+            headers={'Authorization': f'Bearer {self.token}'},
+            content_type='application/json'
+        )
+        self.assertEqual(resp.get_json()['already_present'], [ids[1]])
+
+    def test_edit_ticket_mechanics_query_count_constant(self):
+        with self.app.app_context():
+            ids = []
+            for i in range(40):
+                m = Mechanic(name=f'B{i}', email=f'b{i}@ex.com', phone='1', salary=1, password='x')
+                db.session.add(m)
+                ids.append(m)
+            db.session.commit()
+            ids = [m.id for m in ids]
+
+        def edit_queries(payload):
+            with QueryCounter() as q:
+                resp = self.client.put(
+                    f'/service_tickets/{self.ticket_id}/edit',
+                    data=json.dumps(payload),
+                    headers={'Authorization': f'Bearer {self.token}'},
+                    content_type='application/json'
+                )
+            self.assertEqual(resp.status_code, 200)
+            return q.count
+
+        edit_queries({})  #### warm the token cache
+        #### ticket lookup + id resolution + one INSERT and/or one DELETE + version bump
+        self.assertEqual(edit_queries({'add_ids': ids[:2]}), 4)
+        self.assertEqual(edit_queries({'add_ids': ids[2:], 'remove_ids': ids[:2]}), 5)
+        self.assertEqual(edit_queries({'remove_ids': ids[2:]}), 4)
+
+    def test_edit_ticket_mechanics_changes_ticket_etag(self):
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+        headers = {'Authorization': f'Bearer {self.token}'}
+        etag = self.client.get('/service_tickets/').headers['ETag']
+        self.client.put(f'/service_tickets/{self.ticket_id}/edit', json={'add_ids': [self.mech_id]},
+                        headers=headers)
+        resp = self.client.get('/service_tickets/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.client.get('/service_tickets/', headers={
+            'If-None-Match': resp.headers['ETag']}).status_code, 304)
+
+        stale = self.client.put(f'/service_tickets/{self.ticket_id}', json={'service_desc': 'A'},
+                                headers=headers).headers['ETag']
+        self.client.put(f'/service_tickets/{self.ticket_id}/edit', json={'remove_ids': [self.mech_id]},
+                        headers=headers)
+        resp = self.client.put(f'/service_tickets/{self.ticket_id}', json={'service_desc': 'B'},
+                               headers=dict(headers, **{'If-Match': stale}))
+        self.assertEqual(resp.status_code, 412)
+
+    def _ticket_mechanics(self):
+        with self.app.app_context():
+            return [m.id for m in db.session.get(ServiceTicket, self.ticket_id).mechanics]
+
+    def test_edit_ticket_mechanics_if_match(self):
+        headers = {'Authorization': f'Bearer {self.token}'}
+        stale = self.client.put(f'/service_tickets/{self.ticket_id}', json={'service_desc': 'A'},
+                                headers=headers).headers['ETag']
+        current = self.client.put(f'/service_tickets/{self.ticket_id}', json={'service_desc': 'B'},
+                                  headers=headers).headers['ETag']
+        resp = self.client.put(f'/service_tickets/{self.ticket_id}/edit', json={'add_ids': [self.mech_id]},
+                               headers=dict(headers, **{'If-Match': stale}))
+        self.assertEqual(resp.status_code, 412)
+        self.assertEqual(self._ticket_mechanics(), [])
+
+        resp = self.client.put(f'/service_tickets/{self.ticket_id}/edit', json={'add_ids': [self.mech_id]},
+                               headers=dict(headers, **{'If-Match': current}))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._ticket_mechanics(), [self.mech_id])
+
+    def test_edit_ticket_mechanics_concurrent_write_conflicts(self):
+        def racing_check(ticket):
+            #### another request updates the ticket after this one loaded it
+            with db.engine.begin() as conn:
+                conn.execute(update(ServiceTicket).where(ServiceTicket.id == self.ticket_id)
+                             .values(version=ServiceTicket.version + 1))
+            return None
+
+        with mock.patch('mech.blueprints.service_tickets.routes.precondition_failed',
+                        side_effect=racing_check):
+            resp = self.client.put(f'/service_tickets/{self.ticket_id}/edit',
+                                   json={'add_ids': [self.mech_id]},
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(self._ticket_mechanics(), [])
+
+    def test_edit_ticket_mechanics_rejects_bad_ids(self):
+        resp = self.client.put(
+            f'/service_tickets/{self.ticket_id}/edit',
+            data=json.dumps({'add_ids': ['1']}),
+            headers={'Authorization': f'Bearer {self.token}'},
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 400)
+
     def test_edit_ticket_mechanics_not_found_ticket(self):
         resp = self.client.put(
             '/service_tickets/999/edit',
@@ -0,0 +1,191 @@
+import unittest
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from mech import create_app
+from mech.config import ProductionConfig
+from mech.extensions import cache, db
+from mech.models import Mechanic
+from mech.utils.shm_cache import SharedMemoryCache
+
+
+def _bump(path, times):
+    shared = SharedMemoryCache(path, buckets=4, ways=2, slot_size=256)
+    for _ in range(times):
+        shared.inc('hits')
+
+
+def _publish(path):
+    SharedMemoryCache(path, buckets=4, ways=2, slot_size=256).set('from_child', {'pid': os.getpid()})
+
+
+class SharedMemoryCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache')
+        self.cache = SharedMemoryCache(self.path, buckets=4, ways=2, slot_size=256)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_get_set_add_delete(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.assertTrue(self.cache.set('a', [1, 'two']))
+        self.assertEqual(self.cache.get('a'), [1, 'two'])
+        self.assertFalse(self.cache.add('a', 'other'))
+        self.assertTrue(self.cache.add('b', 'new'))
+        self.assertTrue(self.cache.delete('a'))
+        self.assertFalse(self.cache.has('a'))
+        self.assertEqual(self.cache.get_many('a', 'b'), [None, 'new'])
+
+    def test_timeout(self):
+        self.cache.set('short', 1, timeout=0.05)
+        self.cache.set('forever', 1, timeout=0)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('forever'), 1)
+
+    def test_inc_dec(self):
+        self.assertEqual(self.cache.inc('n', 5), 5)
+        self.assertEqual(self.cache.dec('n', 2), 3)
+        self.assertEqual(self.cache.get('n'), 3)
+
+    def test_lru_eviction_within_bucket(self):
+        #### one bucket, two ways: the third key evicts the least recently read
+        small = SharedMemoryCache(os.path.join(self.tmp.name, 'small'), buckets=1, ways=2, slot_size=256)
+        small.set('a', 1)
+        small.set('b', 2)
+        small.get('a')
+        small.set('c', 3)
+        self.assertEqual((small.get('a'), small.get('b'), small.get('c')), (1, None, 3))
+        self.assertEqual(small.stats()['evictions'], 1)
+
+    def test_oversized_value_not_cached(self):
+        self.assertFalse(self.cache.set('big', 'x' * 1000))
+        self.assertIsNone(self.cache.get('big'))
+        self.assertEqual(self.cache.stats()['rejected'], 1)
+
+    def test_large_values_use_large_table(self):
+        self.cache.close()
+        os.unlink(self.path)
+        self.cache = SharedMemoryCache(self.path, buckets=4, ways=2, slot_size=256,
+                                       large_buckets=1, large_ways=2, large_slot_size=4096)
+        self.assertTrue(self.cache.set('k', 'x' * 1000))
+        self.assertEqual(self.cache.get('k'), 'x' * 1000)
+        #### shrinking moves it back to the small table, leaving no stale copy behind
+        self.assertTrue(self.cache.set('k', 'small'))
+        self.assertFalse(self.cache.add('k', 'x' * 1000))
+        self.assertTrue(self.cache.delete('k'))
+        self.assertFalse(self.cache.has('k'))
+
+        self.cache.set('k', 'small')
+        self.assertFalse(self.cache.set('k', 'x' * 5000))
+        self.assertIsNone(self.cache.get('k'))
+        self.assertEqual(self.cache.stats()['rejected'], 1)
+        self.assertEqual(self.cache.stats()['capacity'], 10)
+
+    def test_clear(self):
+        self.cache.set('a', 1)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', 2)
+        self.assertEqual(self.cache.get('a'), 2)
+
+    def test_geometry_change_refused_while_open(self):
+        self.cache.set('a', 1)
+        with self.assertRaises(RuntimeError):
+            SharedMemoryCache(self.path, buckets=8, ways=2, slot_size=256)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.cache.close()
+        self.cache = SharedMemoryCache(self.path, buckets=8, ways=2, slot_size=256)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_remove_only_when_unused(self):
+        self.cache.set('a', 1)
+        self.assertFalse(SharedMemoryCache.remove(self.path))
+        self.cache.close()
+        self.cache.close()
+        self.assertTrue(SharedMemoryCache.remove(self.path))
+        self.assertFalse(SharedMemoryCache.remove(self.path))
+        self.cache = SharedMemoryCache(self.path, buckets=4, ways=2, slot_size=256)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_stats_under_threads(self):
+        def read():
+            for _ in range(2000):
+                self.cache.get('missing')
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.cache.stats()['misses'], 16000)
+
+    def test_shared_between_processes(self):
+        ctx = multiprocessing.get_context('fork')
+        child = ctx.Process(target=_publish, args=(self.path,))
+        child.start()
+        child.join()
+        self.assertEqual(self.cache.get('from_child'), {'pid': child.pid})
+
+        workers = [ctx.Process(target=_bump, args=(self.path, 200)) for _ in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self.assertEqual(self.cache.get('hits'), 800)
+
+    def test_plugs_into_flask_caching(self):
+        app = create_app('TestingConfig')
+        app.config.update(
+            CACHE_TYPE='mech.utils.shm_cache.SharedMemoryCache',
+            CACHE_SHARED_PATH=self.path,
+            CACHE_SHARED_BUCKETS=4,
+            CACHE_SHARED_WAYS=2,
+            CACHE_SHARED_SLOT_SIZE=256
+        )
+        cache.init_app(app)
+        with app.app_context():
+            self.assertIsInstance(cache.cache, SharedMemoryCache)
+            cache.set('k', 'v')
+        self.assertEqual(self.cache.get('k'), 'v')
+
+
+    def test_caches_realistic_mechanics_list(self):
+        #### production slot sizes, with only a few buckets of each
+        app = create_app('TestingConfig')
+        app.config.update(
+            CACHE_TYPE='mech.utils.shm_cache.SharedMemoryCache',
+            CACHE_SHARED_PATH=os.path.join(self.tmp.name, 'app'),
+            CACHE_SHARED_BUCKETS=4,
+            CACHE_SHARED_SLOT_SIZE=ProductionConfig.CACHE_SHARED_SLOT_SIZE,
+            CACHE_SHARED_LARGE_BUCKETS=2,
+            CACHE_SHARED_LARGE_SLOT_SIZE=ProductionConfig.CACHE_SHARED_LARGE_SLOT_SIZE
+        )
+        cache.init_app(app)
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            try:
+                db.session.add_all([
+                    Mechanic(name=f'Mechanic {i}', email=f'mechanic{i}@example.com',
+                             phone=f'555-{i:04d}', salary=50000 + i, password='x')
+                    for i in range(200)
+                ])
+                db.session.commit()
+                first = client.get('/mechanics/')
+                self.assertGreater(len(first.data), ProductionConfig.CACHE_SHARED_SLOT_SIZE)
+                self.assertEqual(first.headers['X-Cache'], 'MISS')
+                second = client.get('/mechanics/')
+                self.assertEqual(second.headers['X-Cache'], 'HIT')
+                self.assertEqual(second.data, first.data)
+                self.assertEqual(cache.cache.stats()['rejected'], 0)
+            finally:
+                cache.cache.close()
+                db.drop_all()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import json
+from datetime import date
+from sqlalchemy import select
+from mech import create_app
+from mech.extensions import db
+from mech.models import Customer, Mechanic, ServiceTicket
+from mech.utils.sql_stats import assert_query_budget, statement_shape
+
+
+class SQLStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+
+        @self.app.route('/_one_by_one')
+        def one_by_one():
+            #### the N+1 pattern: one SELECT per id
+            names = [db.session.scalar(select(Mechanic.name).where(Mechanic.id == i)) for i in range(1, 7)]
+            return {'names': names}
+
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            cust = Customer(name='Cust', email='cust@ex.com', phone='1', password='x')
+            db.session.add(cust)
+            db.session.add_all([Mechanic(name=f'M{i}', email=f'm{i}@ex.com', phone='1', salary=1, password='x')
+                                for i in range(6)])
+            db.session.commit()
+            db.session.add_all([ServiceTicket(vin=f'VIN{i}', service_date=date(2025, 1, 1),
+                                              service_desc='x', customer_id=cust.id) for i in range(5)])
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_headers_report_queries_and_db_time(self):
+        resp = self.client.get('/service_tickets/')
+        self.assertEqual(resp.status_code, 200)
+        count = int(resp.headers['X-Query-Count'])
+        self.assertGreater(count, 0)
+        self.assertRegex(resp.headers['Server-Timing'], rf'^db;dur=\d+\.\d\d;desc="{count} queries"$')
+
+    def test_repeated_shape_is_logged(self):
+        with self.assertLogs('mech.sql', level='WARNING') as logs:
+            resp = self.client.get('/_one_by_one')
+        self.assertEqual(resp.headers['X-Query-Count'], '6')
+        self.assertIn('possible N+1 in GET /_one_by_one: 6x SELECT mechanics.name', logs.output[0])
+
+    def test_structured_log(self):
+        self.app.config['SQL_STATS_LOG'] = True
+        with self.assertLogs('mech.sql', level='INFO') as logs:
+            self.client.get('/service_tickets/')
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['method'], line['path'], line['status']), ('GET', '/service_tickets/', 200))
+        self.assertEqual(line['endpoint'], 'service_tickets.get_tickets')
+        self.assertEqual(line['repeated'], [])
+
+    def test_disabled(self):
+        self.app.config['SQL_STATS_ENABLED'] = False
+        resp = self.client.get('/service_tickets/')
+        self.assertNotIn('X-Query-Count', resp.headers)
+        self.assertNotIn('Server-Timing', resp.headers)
+
+    def test_query_budget(self):
+        with assert_query_budget(max_queries=4, max_repeats=1):
+            self.client.get('/service_tickets/')
+        with self.assertRaisesRegex(AssertionError, r'6 queries, budget is 5'):
+            with assert_query_budget(max_queries=5):
+                self.client.get('/_one_by_one')
+        with self.assertRaisesRegex(AssertionError, r'more than 2 times:\n  6x SELECT mechanics.name'):
+            with assert_query_budget(max_repeats=2):
+                self.client.get('/_one_by_one')
+
+    def test_in_lists_share_a_shape(self):
+        self.assertEqual(
+            statement_shape('SELECT id FROM t\nWHERE id IN (?, ?, ?)'),
+            statement_shape('SELECT id FROM t WHERE id IN (?)')
+        )
+        self.assertNotEqual(statement_shape('SELECT a FROM t'), statement_shape('SELECT b FROM t'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from mech import create_app
+
+
+class SwaggerSpecTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('TestingConfig')
+        self.client = self.app.test_client()
+
+    def test_spec_is_built_once(self):
+        first = self.client.get('/swagger.json')
+        self.assertEqual(first.status_code, 200)
+        spec = first.get_json()
+        self.assertEqual(spec['info']['title'], 'MechAPI')
+        self.assertIn('/customers/', spec['paths'])
+        self.assertIn('CursorMeta', spec['definitions'])
+
+        doc = self.app.extensions['swagger_spec']
+        self.client.get('/swagger.json')
+        self.assertIs(self.app.extensions['swagger_spec'], doc)
+
+    def test_spec_etag_and_not_modified(self):
+        resp = self.client.get('/swagger.json')
+        etag = resp.headers['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        resp = self.client.get('/swagger.json', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.data, b'')
+
+    def test_spec_gzip_variant(self):
+        plain = self.client.get('/swagger.json')
+        resp = self.client.get('/swagger.json', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resp.headers['Vary'])
+        self.assertNotEqual(resp.headers['ETag'], plain.headers['ETag'])
+        self.assertEqual(gzip.decompress(resp.data), plain.data)
+
+    def test_export_and_serve_prebuilt_spec(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'swagger.json')
+            result = self.app.test_cli_runner().invoke(args=['swagger-export', path])
+            self.assertEqual(result.exit_code, 0, result.output)
+            with open(path) as f:
+                exported = json.load(f)
+            self.assertTrue(os.path.exists(f'{path}.gz'))
+
+            app = create_app('TestingConfig')
+            app.config['SWAGGER_SPEC_FILE'] = path
+            resp = app.test_client().get('/swagger.json')
+            self.assertEqual(resp.get_json(), exported)
+
+
+class SwaggerUITestCase(unittest.TestCase):
+    def test_built_on_first_docs_hit(self):
+        app = create_app('TestingConfig')
+        client = app.test_client()
+        self.assertIsNone(app.wsgi_app.ui)
+        client.get('/swagger.json')
+        self.assertIsNone(app.wsgi_app.ui)
+
+        resp = client.get('/docs/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b'/swagger.json', resp.data)
+        self.assertIsNotNone(app.wsgi_app.ui)
+        self.assertEqual(client.get('/docs/swagger-ui.css').status_code, 200)
+        self.assertEqual(client.get('/swagger.json').status_code, 200)
+
+    def test_not_imported_by_create_app(self):
+        code = ("import sys; from mech import create_app; create_app('TestingConfig'); "
+                "print('flask_swagger_ui' in sys.modules)")
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), 'False')
+
+if __name__ == '__main__':
+    unittest.main()
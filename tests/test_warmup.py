@@ -0,0 +1,99 @@
+import unittest
+import multiprocessing
+import os
+import tempfile
+from unittest import mock
+from mech import create_app
+from mech.config import TestingConfig
+from mech.extensions import db
+from mech.models import Inventory
+
+
+def _pool_replaced(app, parent_pool):
+    with app.app_context():
+        os._exit(0 if db.engine.pool is not parent_pool else 1)
+
+
+class WarmupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'app.db')
+        with mock.patch.multiple(TestingConfig, SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}',
+                                 SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 3, 'max_overflow': 0}):
+            self.app = create_app('TestingConfig')
+        self.app.config['WARMUP_CONNECTIONS'] = 2
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Inventory(name='Filter', price=9.5))
+            db.session.commit()
+            db.engine.dispose()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+            db.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_warm(self):
+        from mech.extensions import warmup
+        from mech.blueprints.inventory.schemas import dump_inventory
+        dump_inventory._dump = None
+        self.assertEqual(warmup.warm(self.app),
+                         ['mappers', 'schemas', 'connections', 'catalog', 'password_hasher'])
+        with self.app.app_context():
+            self.assertEqual(db.engine.pool.checkedin(), 2)
+        snapshot = self.app.extensions['inventory_catalog']['snapshot']
+        self.assertEqual(len(snapshot.ids), 1)
+        self.assertIsNotNone(dump_inventory._dump)
+
+    def test_reset_host_state(self):
+        from mech.extensions import warmup
+        from mech.utils.ratelimit import SQLiteStorage
+        from mech.utils.shm_cache import SharedMemoryCache
+        config = {
+            'METRICS_DIR': self.tmp.name,
+            'CACHE_TYPE': 'mech.utils.shm_cache.SharedMemoryCache',
+            'CACHE_SHARED_PATH': os.path.join(self.tmp.name, 'cache'),
+            'CACHE_SHARED_BUCKETS': 4,
+            'CACHE_SHARED_SLOT_SIZE': 256,
+            'RATELIMIT_STORAGE_URI': f"sqlite:///{os.path.join(self.tmp.name, 'ratelimit.db')}",
+        }
+        snapshot = os.path.join(self.tmp.name, 'metrics-123.json')
+        open(snapshot, 'w').close()
+        #### what a preloaded master already holds open
+        shared = SharedMemoryCache(**SharedMemoryCache.config_kwargs(config))
+        shared.set('stale', 1)
+        limits = SQLiteStorage(config['RATELIMIT_STORAGE_URI'])
+        limits.incr('client', 60)
+
+        self.assertEqual(warmup.reset(config), ['metrics', 'cache', 'ratelimit'])
+        self.assertFalse(os.path.exists(snapshot))
+        self.assertIsNone(shared.get('stale'))
+        self.assertEqual(limits.get('client'), 0)
+        shared.close()
+        self.assertEqual(warmup.reset({'CACHE_TYPE': 'SimpleCache', 'RATELIMIT_ENABLED': False}), [])
+
+    def test_failed_step_is_skipped(self):
+        from mech.extensions import warmup
+        with mock.patch('mech.utils.catalog.inventory_catalog.snapshot', side_effect=RuntimeError('down')):
+            with self.assertLogs('mech.warmup', 'ERROR'):
+                steps = warmup.warm(self.app)
+        self.assertNotIn('catalog', steps)
+        self.assertIn('connections', steps)
+
+    def test_forked_child_gets_fresh_pool(self):
+        with self.app.app_context():
+            db.session.get(Inventory, 1)
+            db.session.remove()
+            parent_pool = db.engine.pool
+            child = multiprocessing.get_context('fork').Process(target=_pool_replaced, args=(self.app, parent_pool))
+            child.start()
+            child.join()
+            self.assertEqual(child.exitcode, 0)
+            #### the parent keeps its pool and its open connection
+            self.assertIs(db.engine.pool, parent_pool)
+            self.assertEqual(parent_pool.checkedin(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()